@@ -1,6 +1,5 @@
 import streamlit as st
 import sys
-from io import StringIO
 import os
 # --- NEW IMPORT ---
 from dotenv import load_dotenv
@@ -16,14 +15,29 @@ try:
     if project_root not in sys.path:
         sys.path.append(project_root)
         
-    from core_agents.root_orchestrator import RootAgent
-    from utils.state_manager import ALL_USER_STATES, get_active_state, set_active_state
+    from core_agents.root_orchestrator import RootAgent, RootAgentStream
+    from utils.state_manager import LearnerSession, get_state_store
+    from utils.gemini_client import get_pool_stats
+    from utils.response_cache import get_cache_stats
+    from utils.tracing import latency_summary
+    from utils.fast_grader import get_fast_grading_stats
+    from utils.single_flight import get_single_flight_stats
+    from utils.prefetch import cancel_prefetch, get_prefetch_stats
+    from utils.agent_jobs import submit, get_job, get_job_stats, JobQueueFull, LearnerBusy
+    from utils.cohort_analytics import get_cohort_analytics
+    from utils.model_router import get_router_stats
+    from utils.concept_index import get_concept_index_stats
+    from utils.revision_planner import get_planner_stats
+    from utils.lazy import warm_up
     
 except Exception as e:
     st.error(f"Initialization Error: Could not load core modules. Details: {e}")
     st.stop()
 
 
+# Stream lessons into the chat as the agents produce them (set EDUINDIA_STREAMING=0 to disable)
+STREAMING_ENABLED = os.getenv("EDUINDIA_STREAMING", "1") == "1"
+
 # --- Streamlit Setup ---
 st.set_page_config(page_title="EduIndia: Multi-Agent Learning Demo", layout="wide")
 
@@ -33,41 +47,213 @@ if "messages" not in st.session_state:
 if "log_content" not in st.session_state:
     st.session_state.log_content = "Run a query to see the multi-agent delegation trace."
 
-# --- Custom Function to Run Agent and Capture Log ---
-def run_agent_workflow(user_query):
-    """Runs the RootAgent and captures both the log (print output) and the final response."""
-    
-    # 1. Capture the log output (the delegation trace)
-    old_stdout = sys.stdout
-    redirected_output = StringIO()
-    sys.stdout = redirected_output
-    
-    # 2. Run the agent logic
-    try:
-        final_output = RootAgent(user_query)
-    except Exception as e:
-        final_output = f"An unhandled error occurred in the agent workflow: {e}"
-        print(f"UNHANDLED ERROR: {e}")
-    
-    # 3. Restore stdout and get the log
-    sys.stdout = old_stdout
-    log_content = redirected_output.getvalue()
-    
-    return log_content, final_output
+# Only the most recent messages are kept in session memory and redrawn on each run; older
+# ones are spilled to the state store and loaded a page at a time on request
+CHAT_WINDOW = int(os.getenv("EDUINDIA_CHAT_WINDOW", "20"))
+HISTORY_PAGE_SIZE = int(os.getenv("EDUINDIA_HISTORY_PAGE_SIZE", "10"))
+
+# The learner selector lists at most this many matches for the current search and filters
+LEARNER_OPTIONS_LIMIT = int(os.getenv("EDUINDIA_LEARNER_OPTIONS", "200"))
+
+# How often the pending job's output is redrawn (seconds)
+JOB_POLL_SECONDS = float(os.getenv("EDUINDIA_JOB_POLL_SECONDS", "0.25"))
+
+def add_message(session, role, content):
+    """Appends a chat message, spilling the oldest ones to the state store beyond CHAT_WINDOW."""
+    messages = st.session_state.messages
+    messages.append({"role": role, "content": content})
+    if len(messages) > CHAT_WINDOW:
+        overflow = len(messages) - CHAT_WINDOW
+        # The greeting is redrawn for every new session, so it is dropped rather than kept in history
+        spilled = [message for message in messages[:overflow] if not message.get("greeting")]
+        if spilled:
+            session.store.append_messages(session.learner_key, spilled)
+        del messages[:overflow]
 
-# Function to run when the user selection changes
-def handle_user_switch():
-    # 1. Get the selected user KEY (the full string name) from the session state
-    selected_key = st.session_state.user_selector
+# --- Agent workflows run as background jobs (see utils/agent_jobs.py) ---
+def make_workflow(user_query, session):
+    """Returns the job body for a request: the streamed lesson, or the complete response as one chunk."""
+    if STREAMING_ENABLED:
+        return lambda: RootAgentStream(user_query, session)
+    def respond():
+        yield RootAgent(user_query, session)
+    return respond
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def render_pending_job(job_id):
+    """Redraws the unfinished job's output on a timer without blocking the script run; reruns the app once it finishes."""
+    job = get_job(job_id)
+    if job is None or job.finished:
+        st.rerun()
+    with st.chat_message("assistant"):
+        if job.chunks:
+            st.markdown(job.text + " ▌", unsafe_allow_html=True)
+        else:
+            st.markdown("_Processing request... Agents are collaborating..._")
+
+def record_job(job, session):
+    """Shows the finished job's response and records it and its delegation log in the session."""
+    with st.chat_message("assistant"):
+        st.markdown(job.text, unsafe_allow_html=True)
+    st.session_state.log_content = job.log
+    add_message(session, "assistant", job.text)
+    st.session_state.pop("pending_job", None)
+
+# Function to run when the selected learner changes (picked directly, or because a new search or
+# filter no longer lists the previous one); it runs before the chat is drawn, so no rerun is needed
+def handle_user_switch(previous_key, selected_key, store):
+    # Work prefetched for the previous learner will not be used by this session
+    cancel_prefetch(previous_key)
     
-    # 2. Set this KEY as the globally active state in utils/state_manager.py
-    set_active_state(selected_key)
+    # Keep the previous learner's conversation: the chat window goes to their history, and their
+    # pending job (still running or not yet shown) is recorded there once it finishes
+    window = [message for message in st.session_state.messages if not message.get("greeting")]
+    if window:
+        store.append_messages(previous_key, window)
+    background_jobs = st.session_state.setdefault("background_jobs", {})
+    if "pending_job" in st.session_state:
+        background_jobs[previous_key] = st.session_state.pop("pending_job")
+    # Switching back to a learner whose job has not been recorded yet shows it again
+    if selected_key in background_jobs:
+        st.session_state.pending_job = background_jobs.pop(selected_key)
     
-    # 3. Clear chat history and log for the new user session
+    # Clear chat history and log for the new user session
+    st.session_state.pop("history_pages", None)
     st.session_state.messages = []
     st.session_state.log_content = f"Switched user to {selected_key}. Ready for new queries."
-    # Rerun is crucial to update the UI immediately with the new profile data
-    st.rerun() 
+
+def record_background_jobs(store):
+    """Appends the responses of finished jobs left behind by a learner switch to their learner's history."""
+    background_jobs = st.session_state.get("background_jobs", {})
+    for learner_key, job_id in list(background_jobs.items()):
+        job = get_job(job_id)
+        if job is not None and not job.finished:
+            continue
+        del background_jobs[learner_key]
+        if job is not None:
+            store.append_messages(learner_key, [{"role": "assistant", "content": job.text}])
+
+def render_sidebar_status(session):
+    """Draws the learner's profile, the last delegation log and the runtime stats."""
+    active_user_state = session.get_state()
+    
+    st.header("Active Learner Context")
+    profile_html = (
+        f"**Profile:** {active_user_state['name']}<br>"
+        f"**Location:** {active_user_state['location']}<br>"
+        f"**Background:** {active_user_state['background']}<br>"
+        f"**Language:** {active_user_state['language']}<br>"
+        f"**Mastery:** {active_user_state['mastery_score']}/5 | "
+        f"**Next Level:** {active_user_state['mastery_increment']}/3"
+    )
+    st.markdown(profile_html, unsafe_allow_html=True)
+    
+    st.subheader("Agent Delegation Log")
+    # Log content is built from the spans recorded for the last request
+    st.code(st.session_state.log_content, language='text')
+
+    with st.expander("Gemini Connection Pool"):
+        pool_stats = get_pool_stats()
+        st.markdown(
+            f"**Calls:** {pool_stats['calls']} | **In flight:** {pool_stats['in_flight_calls']}<br>"
+            f"**Client reuse rate:** {pool_stats['reuse_rate']:.0%}<br>"
+            f"**Open connections:** {pool_stats['open_connections']}/{pool_stats['pool_size']}",
+            unsafe_allow_html=True
+        )
+
+    with st.expander("Agent Latency (p50 / p95)"):
+        latency = latency_summary()
+        if not latency:
+            st.caption("No agent calls recorded yet.")
+        for span_name, span_stats in sorted(latency.items()):
+            st.markdown(
+                f"**{span_name}:** {span_stats['p50_ms']:.0f} ms / {span_stats['p95_ms']:.0f} ms "
+                f"({span_stats['count']} calls)"
+            )
+
+    with st.expander("Fast-path Grading"):
+        grading_stats = get_fast_grading_stats()
+        st.markdown(
+            f"**Graded locally:** {grading_stats['fast_path_rate']:.0%} "
+            f"({grading_stats['fast_pass']} pass, {grading_stats['fast_fail']} fail, "
+            f"{grading_stats['escalated']} sent to the LLM)"
+        )
+
+    with st.expander("Model Tiers"):
+        router_stats = get_router_stats()
+        for tier, tier_stats in router_stats["tiers"].items():
+            st.markdown(
+                f"**{tier}** ({tier_stats['model']}): {tier_stats['calls']} calls, "
+                f"mean {tier_stats['mean_ms']:.0f} ms, "
+                f"{tier_stats['prompt_tokens'] + tier_stats['response_tokens']} tokens"
+            )
+        st.caption(
+            f"{router_stats['mastery_upgrades']} upgraded for advanced learners, "
+            f"{router_stats['latency_downgrades']} downgraded to fit a latency budget"
+        )
+
+    with st.expander("Concept Index"):
+        concept_stats = get_concept_index_stats()
+        st.markdown(
+            f"**Resolved to known concepts:** {concept_stats['hit_rate']:.0%} of {concept_stats['lookups']} topics "
+            f"({concept_stats['exact']} exact, {concept_stats['fuzzy']} fuzzy)"
+        )
+        st.caption(f"{concept_stats['names']} known names, mean lookup {concept_stats['mean_lookup_us']:.0f} µs")
+
+    with st.expander("Response Cache"):
+        cache_stats = get_cache_stats()
+        if not cache_stats:
+            st.caption("No cache lookups yet.")
+        for agent_name, agent_stats in cache_stats.items():
+            st.markdown(
+                f"**{agent_name}:** {agent_stats['hit_rate']:.0%} hit rate "
+                f"({agent_stats['memory_hits']} memory, {agent_stats['disk_hits']} disk, {agent_stats['misses']} misses)"
+            )
+        for agent_name, flight_stats in get_single_flight_stats().items():
+            st.markdown(
+                f"**{agent_name} coalescing:** {flight_stats['collapsed']} of {flight_stats['calls']} calls "
+                f"joined an identical in-flight request"
+            )
+
+    with st.expander("Speculative Prefetch"):
+        prefetch_stats = get_prefetch_stats()
+        st.markdown(
+            f"**Hit rate:** {prefetch_stats['hit_rate']:.0%} "
+            f"({prefetch_stats['hits']} of {prefetch_stats['completed']} prefetches used)<br>"
+            f"**Cancelled:** {prefetch_stats['cancelled']} | **Over budget:** {prefetch_stats['over_budget']} | "
+            f"**Skipped (quota floor):** {prefetch_stats['quota_floor']}",
+            unsafe_allow_html=True
+        )
+
+    with st.expander("Agent Job Pool"):
+        job_stats = get_job_stats()
+        st.markdown(
+            f"**Running:** {job_stats['running']}/{job_stats['workers']} | **Queued:** {job_stats['queued']}<br>"
+            f"**Mean queue wait:** {job_stats['mean_queue_wait_ms']:.0f} ms<br>"
+            f"**Rejected (busy):** {job_stats['rejected_full'] + job_stats['rejected_busy']}",
+            unsafe_allow_html=True
+        )
+
+    with st.expander("Cohort Analytics"):
+        # Columnar view of every learner in the store, refreshed incrementally
+        cohort = get_cohort_analytics(session.store)
+        summary = cohort.summary()
+        st.markdown(
+            f"**Learners:** {summary['learners']} | **Concepts tracked:** {summary['concepts']}<br>"
+            f"**Mastery 0-5:** {' / '.join(str(n) for n in cohort.mastery_distribution()['all'])}",
+            unsafe_allow_html=True
+        )
+        location = active_user_state['location']
+        weak = cohort.weak_concepts(group_by="location", min_graded=1).get(location, [])
+        if not weak:
+            st.caption(f"No graded concepts in {location} yet.")
+        for concept, mean_score, graded in weak:
+            st.markdown(f"**{concept}** ({location}): mean grade {mean_score}/3 over {graded} learners")
+        planner_stats = get_planner_stats()
+        st.caption(
+            f"'Study next' served from precomputed plans: {planner_stats['plan_hit_rate']:.0%} "
+            f"({planner_stats['stale']} stale, {planner_stats['missing']} without a plan)"
+        )
 
 # --- UI Layout ---
 
@@ -78,44 +264,46 @@ with st.sidebar:
     st.title("Agent Architecture Demo")
     
     # --- User Selector Setup ---
-    user_options = list(ALL_USER_STATES.keys()) 
-    
-    # Determine the currently active key for the selector's default index
-    current_active_key = user_options[0] # Default to the first user
-    
-    # Set the active state explicitly before the selectbox runs
-    set_active_state(current_active_key)
-    initial_index = 0
+    # The selected learner lives in this browser session only; all sessions share one state store
+    state_store = get_state_store()
+    directory = state_store.directory
+
+    # Search and filter the learner directory (indexed by location, language and background)
+    search_text = st.text_input("Search learners", placeholder="Name or profile key")
+    filter_columns = st.columns(2)
+    location_filter = filter_columns[0].selectbox("Location", ["Any"] + list(directory.values("location")))
+    language_filter = filter_columns[1].selectbox("Language", ["Any"] + list(directory.values("language")))
+    user_options = directory.find(
+        text=search_text,
+        location=None if location_filter == "Any" else location_filter,
+        language=None if language_filter == "Any" else language_filter,
+        limit=LEARNER_OPTIONS_LIMIT
+    )
+    active_learner = st.session_state.get("active_learner")
+    if not user_options:
+        # Nothing matches: stay with the current learner
+        st.caption("No learners match this search.")
+        user_options = [active_learner or directory.keys()[0]]
+    # Keep the current learner selected while they are among the matches
+    initial_index = user_options.index(active_learner) if active_learner in user_options else 0
 
     # Streamlit Selectbox
     selected_profile_name = st.selectbox(
-        "Select Active Learner Profile",
+        f"Select Active Learner Profile ({len(user_options)} of {len(directory)} shown)",
         options=user_options,
         index=initial_index,
-        key="user_selector",
-        on_change=handle_user_switch
     )
+    if active_learner is not None and active_learner != selected_profile_name:
+        handle_user_switch(active_learner, selected_profile_name, state_store)
+    record_background_jobs(state_store)
     
-    # Re-set active state based on the final selection (in case of startup or RERUN)
-    set_active_state(selected_profile_name) 
-
-    # Get the active state (dynamically set by the selectbox/startup logic)
-    active_user_state = get_active_state()
+    # Bind this browser session to the selected learner
+    learner_session = LearnerSession(state_store, selected_profile_name)
+    st.session_state.active_learner = selected_profile_name
     
-    st.header("Active Learner Context")
-    profile_html = (
-        f"**Profile:** {active_user_state['name']}<br>"
-        f"**Location:** {active_user_state['location']}<br>"
-        f"**Background:** {active_user_state['background']}<br>"
-        f"**Language:** {active_user_state['language']}<br>"
-        f"**Mastery:** {active_user_state['mastery_score']}/5 | "
-        f"**Next Level:** {active_user_state['mastery_increment']}/3"
-    )
-    st.markdown(profile_html, unsafe_allow_html=True)
-    
-    st.subheader("Agent Delegation Log")
-    # Log content displays the print statements from the agent workflow
-    st.code(st.session_state.log_content, language='text')
+    # Profile, log and stats are drawn at the end of the run, after this run's request (if any)
+    # has been handled, so they are current without an extra rerun
+    status_container = st.container()
 
 # Initial greeting and instructions
 if not st.session_state.messages:
@@ -127,9 +315,21 @@ if not st.session_state.messages:
         "2. `test me on inflation` (To start a test)<br>"
         "3. **Submit the answer** to the question above (To verify grading and mastery update)"
     )
-    st.session_state.messages.append({"role": "assistant", "content": initial_message})
+    st.session_state.messages.append({"role": "assistant", "content": initial_message, "greeting": True})
 
-# Display chat messages from history on app rerun
+# Earlier (spilled) messages are only loaded when asked for, a page at a time
+spilled_count = state_store.count_messages(learner_session.learner_key)
+history_pages = st.session_state.get("history_pages", 0)
+if history_pages * HISTORY_PAGE_SIZE < spilled_count:
+    st.button(
+        f"Show earlier messages ({spilled_count - history_pages * HISTORY_PAGE_SIZE} more)",
+        on_click=lambda: st.session_state.update(history_pages=history_pages + 1)
+    )
+for message in state_store.load_messages(learner_session.learner_key, 0, history_pages * HISTORY_PAGE_SIZE):
+    with st.chat_message(message["role"]):
+        st.markdown(message["content"], unsafe_allow_html=True)
+
+# Display the recent messages kept in session memory
 for message in st.session_state.messages:
     with st.chat_message(message["role"]):
         st.markdown(message["content"], unsafe_allow_html=True)
@@ -138,23 +338,33 @@ for message in st.session_state.messages:
 if user_query := st.chat_input("Enter your learning query here..."):
     
     # 1. Add user message to chat history and display
-    st.session_state.messages.append({"role": "user", "content": user_query})
+    add_message(learner_session, "user", user_query)
     with st.chat_message("user"):
         st.markdown(user_query)
     
-    # 2. Run the agent workflow and capture the log
-    with st.spinner("Processing request... Agents are collaborating..."):
-        log_content, final_response = run_agent_workflow(user_query)
-    
-    # 3. Store log for sidebar display
-    st.session_state.log_content = log_content
-    
-    # 4. Add assistant response to chat history
-    st.session_state.messages.append({"role": "assistant", "content": final_response})
-    
-    # 5. Display assistant response
-    with st.chat_message("assistant"):
-        st.markdown(final_response, unsafe_allow_html=True)
-        
-    # Force rerun to update log and state immediately (e.g., mastery score)
-    st.rerun()
\ No newline at end of file
+    # 2. Hand the workflow to the job pool; the script run only waits for its output
+    try:
+        job = submit(learner_session.learner_key, user_query, make_workflow(user_query, learner_session))
+        st.session_state.pending_job = job.job_id
+    except (JobQueueFull, LearnerBusy) as e:
+        add_message(learner_session, "assistant", str(e))
+        with st.chat_message("assistant"):
+            st.markdown(str(e))
+
+# 3. Show the pending job's output. The script run does not wait for it: until it finishes,
+#    a fragment redraws it on a timer and then reruns the app to record it. The job keeps
+#    running if the learner navigates away or closes the tab.
+pending_job = get_job(st.session_state["pending_job"]) if "pending_job" in st.session_state else None
+if pending_job is not None and pending_job.finished:
+    record_job(pending_job, learner_session)
+elif pending_job is not None:
+    render_pending_job(pending_job.job_id)
+elif "pending_job" in st.session_state:
+    st.session_state.pop("pending_job")
+
+# 4. Draw the sidebar status last, so it reflects this run's request (e.g., mastery score)
+with status_container:
+    render_sidebar_status(learner_session)
+
+# 5. The page is up: load the agents and the Gemini SDK in the background (once per process)
+warm_up()
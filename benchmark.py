@@ -0,0 +1,491 @@
+"""
+Offline benchmark and load test for the agent workflow.
+
+Drives RootAgent with synthetic learners at N concurrent sessions against the local
+fake Gemini backend (utils/fake_gemini.py) and reports throughput and p50/p95/p99
+latency per command type. Results are written as JSON so runs can be diffed between
+releases.
+
+With --startup it instead measures cold start: each run starts a fresh process and
+times the imports and the first few requests (help text, "study next", the first
+lesson and the first answer).
+
+With --cohort N it instead measures bulk provisioning of N learners from a CSV file
+(utils/learner_profiles.py) and cohort analytics (utils/cohort_analytics.py) over N
+synthetic learners with random study and grade histories: the full load, an incremental
+refresh after some learners change, and each cohort query.
+
+Usage:
+    python benchmark.py --sessions 20 --rounds 3 --output bench_results.json
+    python benchmark.py --startup --startup-runs 5 --output startup_results.json
+    python benchmark.py --cohort 100000 --output cohort_results.json
+"""
+import argparse
+import csv
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+TOPICS = [
+    "inflation", "photosynthesis", "gdp", "interest rates", "cloud computing",
+    "crop rotation", "supply and demand", "compound interest", "water cycle", "digital payments",
+]
+BACKGROUNDS = [
+    ("Retail/Service Industry", "Bengaluru, Karnataka", "Kannada"),
+    ("Agriculture/Farming", "Pune, Maharashtra", "Marathi"),
+    ("Construction", "Lucknow, Uttar Pradesh", "Hindi"),
+    ("Textiles", "Surat, Gujarat", "Gujarati"),
+    ("Fisheries", "Kochi, Kerala", "Malayalam"),
+]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the EduIndia agent workflow against a fake Gemini backend.")
+    parser.add_argument("--sessions", type=int, default=10, help="Concurrent learner sessions.")
+    parser.add_argument("--rounds", type=int, default=2, help="Scripted rounds per session.")
+    parser.add_argument("--latency", type=float, default=0.8, help="Fake backend latency per call (seconds).")
+    parser.add_argument("--jitter", type=float, default=0.3, help="Fake backend latency jitter (seconds).")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of fake backend calls that fail.")
+    parser.add_argument("--rpm", type=float, default=100000, help="Client-side Gemini rate limit (requests/minute).")
+    parser.add_argument("--seed", type=int, default=42, help="Seed for the fake backend and synthetic learners.")
+    parser.add_argument("--cache", action="store_true", help="Keep the response cache enabled (fresh, temporary).")
+    parser.add_argument("--lesson-mode", choices=("multi", "fused"), default="multi",
+                        help="Lesson path to measure: three agent calls, or one fused call.")
+    parser.add_argument("--model-routing", choices=("on", "off"), default="on",
+                        help="Route agent calls to model tiers, or send every call to the default model.")
+    parser.add_argument("--output", default="bench_results.json", help="Where to write the JSON results.")
+    parser.add_argument("--startup", action="store_true", help="Measure cold start (imports and first requests) instead.")
+    parser.add_argument("--startup-runs", type=int, default=5, help="Fresh processes to start with --startup.")
+    parser.add_argument("--startup-probe", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--cohort", type=int, default=0, metavar="N",
+                        help="Measure cohort analytics over N synthetic learners instead.")
+    return parser.parse_args(argv)
+
+
+def configure_environment(args, workdir: str):
+    """Points every backend at local, temporary resources. Must run before the agents are imported."""
+    os.environ.update({
+        "EDUINDIA_FAKE_GEMINI": "1",
+        "FAKE_GEMINI_LATENCY": str(args.latency),
+        "FAKE_GEMINI_JITTER": str(args.jitter),
+        "FAKE_GEMINI_ERROR_RATE": str(args.error_rate),
+        "FAKE_GEMINI_SEED": str(args.seed),
+        "GEMINI_RPM": str(args.rpm),
+        "GEMINI_BURST": str(max(10, int(args.rpm / 60))),
+        "EDUINDIA_LESSON_MODE": args.lesson_mode,
+        "EDUINDIA_MODEL_ROUTING": "1" if args.model_routing == "on" else "0",
+        "EDUINDIA_STATE_BACKEND": "memory",
+        "EDUINDIA_CACHE_PATH": os.path.join(workdir, "bench_cache.sqlite3"),
+        "EDUINDIA_CACHE_DISABLED": "0" if args.cache else "1",
+        "EDUINDIA_QUESTION_BANK_PATH": os.path.join(workdir, "bench_question_bank.sqlite3"),
+        "EDUINDIA_CONCEPT_INDEX_PATH": os.path.join(workdir, "bench_concepts.sqlite3"),
+        "EDUINDIA_PLAN_PATH": os.path.join(workdir, "bench_plans.sqlite3"),
+    })
+    os.environ.pop("EDUINDIA_TRACE_PATH", None)
+    os.environ.pop("EDUINDIA_REVISION_LOG", None)
+
+
+def synthetic_profiles(count: int) -> dict:
+    profiles = {}
+    for i in range(count):
+        background, location, language = BACKGROUNDS[i % len(BACKGROUNDS)]
+        profiles[f"Synthetic Learner {i:04d}"] = {
+            "name": f"Synthetic Learner {i:04d}",
+            "location": location,
+            "background": background,
+            "language": language,
+            "mastery_score": 1 + i % 5,
+            "mastery_increment": 0,
+            "revision_history": {},
+            "pending_answer": None,
+            "pending_quiz": None,
+        }
+    return profiles
+
+
+def synthetic_history(profiles: dict, seed: int, now: float):
+    """Gives each profile a random study and grade history over the last 60 days, in place."""
+    rng = random.Random(seed)
+    for profile in profiles.values():
+        for topic in rng.sample(TOPICS, rng.randint(0, 6)):
+            last = now - rng.random() * 60 * 24 * 60 * 60
+            record = {"count": rng.randint(1, 5), "first": last, "last": last, "recent": [last], "head": 0,
+                      "ease": 2.5, "interval": 1, "reps": 0, "due": last + 24 * 60 * 60}
+            if rng.random() < 0.8:
+                record["last_score"] = rng.randint(0, 3)
+            profile["revision_history"][topic] = record
+
+
+def synthetic_answer(session, index: int) -> str:
+    """Mixes blank, verbatim and paraphrased answers so both grading paths are exercised."""
+    pending = session.get_state().get("pending_answer") or {}
+    expected = pending.get("expected_answer", "")
+    return ["I don't know", expected, "It is about the main idea with an example."][index % 3]
+
+
+def synthetic_quiz_answer(session, index: int) -> str:
+    quiz = session.get_state().get("pending_quiz") or {"questions": [], "answers": []}
+    position = len(quiz["answers"])
+    expected = quiz["questions"][position]["expected_answer"] if position < len(quiz["questions"]) else ""
+    return ["I don't know", expected, "It is about the main idea with an example."][index % 3]
+
+
+def spelling(topic: str, index: int) -> str:
+    """Writes a topic the way different learners do, so requests resolve to canonical concepts."""
+    return [topic, f"the {topic.title()}?", f"{topic} please"][index % 3]
+
+
+def session_script(round_index: int, learner_index: int) -> list:
+    """(command type, query) steps for one round; None queries are answers to the pending question or quiz."""
+    topic = spelling(TOPICS[(learner_index + round_index) % len(TOPICS)], learner_index)
+    other = spelling(TOPICS[(learner_index + round_index + 3) % len(TOPICS)], learner_index + 1)
+    return [
+        ("explain", f"explain {topic}"),
+        ("answer", None),
+        ("test me on", f"test me on {other}"),
+        ("answer", None),
+        ("study next", "study next"),
+        ("revision quiz", "revision quiz"),
+        ("quiz answer", None),
+    ]
+
+
+def percentile(sorted_values: list, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-pct * len(sorted_values) // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+                                       cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def run_benchmark(args) -> dict:
+    # Imported here so the environment configured above is picked up
+    from core_agents.root_orchestrator import RootAgent
+    from utils.state_manager import InMemoryStateStore, LearnerSession
+    from utils.tracing import trace_request, latency_summary, token_summary
+    from utils.fast_grader import get_fast_grading_stats
+    from utils.gemini_client import get_pool_stats
+    from utils.resilience import get_resilience_stats
+    from utils.question_bank import get_question_bank_stats
+    from utils.prefetch import get_prefetch_stats
+    from utils.model_router import get_router_stats
+    from utils.concept_index import get_concept_index_stats
+
+    store = InMemoryStateStore(synthetic_profiles(args.sessions))
+    samples = []  # (command type, latency ms, ok)
+    failed_steps = {}  # agent step or LLM call name -> failures (each fell back to a partial result)
+    samples_lock = threading.Lock()
+
+    def run_query(session, command: str, query: str):
+        start = time.perf_counter()
+        # A request fails if it raises, or if an agent step or LLM call failed and its fallback was used
+        failures = []
+        try:
+            with trace_request(query) as trace:
+                RootAgent(query, session)
+            failures = [name for name, _ in trace.failures]
+        except Exception:
+            failures = ["RootAgent"]
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with samples_lock:
+            samples.append((command, elapsed_ms, not failures))
+            for name in failures:
+                failed_steps[name] = failed_steps.get(name, 0) + 1
+
+    def run_session(learner_index: int, learner_key: str):
+        session = LearnerSession(store, learner_key)
+        answers = 0
+        for round_index in range(args.rounds):
+            for command, query in session_script(round_index, learner_index):
+                if query is None and command == "quiz answer":
+                    # Answer every quiz question in turn; the last answer triggers the batched grading
+                    while session.get_state().get("pending_quiz") is not None:
+                        run_query(session, command, synthetic_quiz_answer(session, learner_index + answers))
+                        answers += 1
+                    continue
+                if query is None:
+                    if session.get_state().get("pending_answer") is None:
+                        continue
+                    query = synthetic_answer(session, learner_index + answers)
+                    answers += 1
+                run_query(session, command, query)
+
+    threads = [threading.Thread(target=run_session, args=(i, key), name=f"bench-session-{i}")
+               for i, key in enumerate(store.learner_keys())]
+    wall_start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall_seconds = time.perf_counter() - wall_start
+
+    commands = {}
+    for command in sorted({c for c, _, _ in samples}):
+        latencies = sorted(ms for c, ms, _ in samples if c == command)
+        errors = sum(1 for c, _, ok in samples if c == command and not ok)
+        commands[command] = {
+            "count": len(latencies),
+            "errors": errors,
+            "p50_ms": round(percentile(latencies, 50), 1),
+            "p95_ms": round(percentile(latencies, 95), 1),
+            "p99_ms": round(percentile(latencies, 99), 1),
+            "mean_ms": round(sum(latencies) / len(latencies), 1),
+        }
+
+    return {
+        "meta": {
+            "git_revision": git_revision(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "config": vars(args),
+        },
+        "totals": {
+            "requests": len(samples),
+            "errors": sum(1 for _, _, ok in samples if not ok),
+            "failed_steps": dict(sorted(failed_steps.items())),
+            "wall_seconds": round(wall_seconds, 3),
+            "throughput_rps": round(len(samples) / wall_seconds, 2) if wall_seconds else 0.0,
+        },
+        "commands": commands,
+        "agents": {name: {k: round(v, 1) for k, v in stats.items()} for name, stats in latency_summary().items()},
+        "tokens": token_summary(),
+        "fast_grading": get_fast_grading_stats(),
+        "gemini_pool": get_pool_stats(),
+        "resilience": get_resilience_stats(),
+        "question_bank": get_question_bank_stats(),
+        "prefetch": get_prefetch_stats(),
+        "model_routing": get_router_stats(),
+        "concept_index": get_concept_index_stats(),
+    }
+
+
+def startup_probe() -> dict:
+    """Runs in a fresh process: times the app's imports, then its first requests."""
+    start = time.perf_counter()
+    from core_agents.root_orchestrator import RootAgent
+    from utils.state_manager import InMemoryStateStore, LearnerSession
+    timings = {"import_ms": (time.perf_counter() - start) * 1000}
+
+    from utils.tracing import trace_request
+    from utils.lazy import get_import_stats, load_module
+    store = InMemoryStateStore(synthetic_profiles(1))
+    session = LearnerSession(store, store.learner_keys()[0])
+    for name, query in (("help", "hello"), ("study_next", "study next"),
+                        ("first_lesson", "explain gdp"), ("first_answer", "I don't know")):
+        request_start = time.perf_counter()
+        with trace_request(query):
+            RootAgent(query, session)
+        timings[f"{name}_ms"] = (time.perf_counter() - request_start) * 1000
+    timings["total_ms"] = (time.perf_counter() - start) * 1000
+
+    # The fake backend never needs the SDK; time it separately to show what lazy loading defers
+    sdk_start = time.perf_counter()
+    load_module("google.genai")
+    timings["sdk_import_ms"] = (time.perf_counter() - sdk_start) * 1000
+    timings["lazy_imports"] = {name: round(ms, 1) for name, ms in get_import_stats().items()}
+    return timings
+
+
+def run_startup(args) -> dict:
+    runs = []
+    for _ in range(args.startup_runs):
+        completed = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--startup-probe"],
+            capture_output=True, text=True, check=True, env=os.environ.copy()
+        )
+        runs.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+
+    metrics = {}
+    for metric in [k for k in runs[0] if k.endswith("_ms")]:
+        values = sorted(run[metric] for run in runs)
+        metrics[metric] = {
+            "p50_ms": round(percentile(values, 50), 1),
+            "max_ms": round(values[-1], 1),
+        }
+    return {
+        "meta": {
+            "git_revision": git_revision(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "config": vars(args),
+        },
+        "startup": metrics,
+        "runs": runs,
+    }
+
+
+def write_profiles_csv(path: str, profiles: dict):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["key", "name", "location", "background", "language", "mastery_score"])
+        for key, profile in profiles.items():
+            writer.writerow([key, profile["name"], profile["location"], profile["background"],
+                             profile["language"], profile["mastery_score"]])
+
+
+def measure_provisioning(profiles: dict, workdir: str) -> dict:
+    """Times provisioning the profiles from CSV into each store backend, and the in-memory store's size."""
+    from utils.state_manager import InMemoryStateStore, SQLiteStateStore
+    from utils.learner_profiles import provision
+    path = os.path.join(workdir, "learners.csv")
+    write_profiles_csv(path, profiles)
+    timings = {}
+
+    start = time.perf_counter()
+    provision(InMemoryStateStore({}), path)
+    timings["provision_memory_ms"] = (time.perf_counter() - start) * 1000
+    store = SQLiteStateStore(os.path.join(workdir, "provision.sqlite3"), profiles={})
+    start = time.perf_counter()
+    provision(store, path)
+    timings["provision_sqlite_ms"] = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    store.learner_keys()
+    timings["sqlite_directory_load_ms"] = (time.perf_counter() - start) * 1000
+
+    tracemalloc.start()
+    store = InMemoryStateStore({})
+    provision(store, path)
+    provisioned_mb = tracemalloc.get_traced_memory()[0] / 1e6
+    tracemalloc.stop()
+    return {"timings": timings, "provisioned_memory_mb": round(provisioned_mb, 1)}
+
+
+def run_cohort(args, workdir: str) -> dict:
+    from utils.state_manager import InMemoryStateStore, LearnerSession
+    from utils.cohort_analytics import CohortAnalytics, GROUP_FIELDS
+    from utils.revision_planner import PlanStore, PLAN_TOP_K, WARM_GROUP_BY, HORIZON_HOURS
+
+    profiles = synthetic_profiles(args.cohort)
+    provisioning = measure_provisioning(profiles, workdir)
+    synthetic_history(profiles, args.seed, time.time())
+    store = InMemoryStateStore(profiles)
+    analytics = CohortAnalytics(store)
+    timings = dict(provisioning["timings"])
+
+    start = time.perf_counter()
+    analytics.refresh(force=True)
+    timings["full_load_ms"] = (time.perf_counter() - start) * 1000
+
+    queries = {"mastery_distribution": analytics.mastery_distribution, "concept_coverage": analytics.concept_coverage,
+               "weak_concepts": analytics.weak_concepts, "grade_histogram": analytics.grade_histogram,
+               "review_recency": analytics.review_recency}
+    for name, query in queries.items():
+        for group_by in (None,) + GROUP_FIELDS:
+            start = time.perf_counter()
+            query(group_by=group_by)
+            timings[f"{name}_{group_by or 'all'}_ms"] = (time.perf_counter() - start) * 1000
+
+    # The offline revision planner's steps (lesson warming needs the LLM, so it is not timed here)
+    start = time.perf_counter()
+    plans = analytics.due_plans(PLAN_TOP_K)
+    timings["revision_plans_ms"] = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    PlanStore(os.path.join(workdir, "cohort_plans.sqlite3")).save(plans, time.time())
+    timings["save_plans_ms"] = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    analytics.due_demand(time.time() + HORIZON_HOURS * 3600, group_by=WARM_GROUP_BY)
+    timings["due_demand_ms"] = (time.perf_counter() - start) * 1000
+
+    # 1% of the learners study and get graded, then the view is refreshed
+    for learner_key in store.learner_keys()[:max(1, args.cohort // 100)]:
+        session = LearnerSession(store, learner_key)
+        session.update_state(TOPICS[0])
+        session.record_grade(TOPICS[0], 1)
+    start = time.perf_counter()
+    reloaded = analytics.refresh(force=True)
+    timings["incremental_refresh_ms"] = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    analytics.weak_concepts(group_by="location")
+    timings["query_after_refresh_ms"] = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    analytics.weak_concepts(group_by="location")
+    timings["cached_query_ms"] = (time.perf_counter() - start) * 1000
+
+    return {
+        "meta": {
+            "git_revision": git_revision(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "config": vars(args),
+        },
+        "cohort": {name: round(ms, 2) for name, ms in timings.items()},
+        "incremental_learners": reloaded,
+        "provisioned_memory_mb": provisioning["provisioned_memory_mb"],
+        "summary": analytics.summary(),
+        "weak_concepts": analytics.weak_concepts(),
+        "stats": analytics.stats(),
+    }
+
+
+def print_cohort_report(results: dict):
+    print(f"Learners: {results['summary']['learners']}  Concept entries: {results['summary']['concept_entries']}  "
+          f"Incremental refresh: {results['incremental_learners']} learners  "
+          f"Provisioned store: {results['provisioned_memory_mb']} MB")
+    print(f"{'cohort step':<36}{'ms':>10}")
+    for name, ms in results["cohort"].items():
+        print(f"{name[:-3]:<36}{ms:>10}")
+
+
+def print_startup_report(results: dict):
+    print(f"{'cold start':<16}{'p50 ms':>10}{'max ms':>10}")
+    for metric, stats in results["startup"].items():
+        print(f"{metric[:-3]:<16}{stats['p50_ms']:>10}{stats['max_ms']:>10}")
+
+
+def print_report(results: dict):
+    totals = results["totals"]
+    print(f"Requests: {totals['requests']}  Errors: {totals['errors']}  "
+          f"Wall: {totals['wall_seconds']}s  Throughput: {totals['throughput_rps']} req/s")
+    print(f"{'command':<12}{'count':>7}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for command, stats in results["commands"].items():
+        print(f"{command:<12}{stats['count']:>7}{stats['errors']:>8}"
+              f"{stats['p50_ms']:>10}{stats['p95_ms']:>10}{stats['p99_ms']:>10}")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    project_root = os.path.dirname(os.path.abspath(__file__))
+    if project_root not in sys.path:
+        sys.path.append(project_root)
+
+    if args.startup_probe:
+        # Child process of --startup; the parent has configured the environment
+        print(json.dumps(startup_probe()))
+        return
+
+    with tempfile.TemporaryDirectory(prefix="eduindia-bench-") as workdir:
+        configure_environment(args, workdir)
+        if args.cohort:
+            results = run_cohort(args, workdir)
+        else:
+            results = run_startup(args) if args.startup else run_benchmark(args)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    if args.cohort:
+        print_cohort_report(results)
+    elif args.startup:
+        print_startup_report(results)
+    else:
+        print_report(results)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
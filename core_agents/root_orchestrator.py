@@ -1,100 +1,360 @@
-# Import all specialized agents
-from specialized_agents.content_generator import ContentGeneratorAgent
-from specialized_agents.subject_test import SubjectAgent, TestAgent
-from specialized_agents.scheduler import SchedulerAgent
-from specialized_agents.answer_agent import AnswerAgent 
+import os
+# Specialized agents are loaded on first use (see utils/lazy.py), so requests that never
+# reach them (help text, pending-state checks) do not pay for importing them and the SDK
+from utils.lazy import lazy
+ContentGeneratorAgent = lazy("specialized_agents.content_generator", "ContentGeneratorAgent")
+ContentGeneratorAgentStream = lazy("specialized_agents.content_generator", "ContentGeneratorAgentStream")
+SubjectAgent = lazy("specialized_agents.subject_test", "SubjectAgent")
+SubjectAgentStream = lazy("specialized_agents.subject_test", "SubjectAgentStream")
+TestAgent = lazy("specialized_agents.subject_test", "TestAgent")
+TestQuestions = lazy("specialized_agents.subject_test", "TestQuestions")
+SchedulerAgent = lazy("specialized_agents.scheduler", "SchedulerAgent")
+AnswerAgent = lazy("specialized_agents.answer_agent", "AnswerAgent")
+QuizAgent = lazy("specialized_agents.answer_agent", "QuizAgent")
+LessonAgent = lazy("specialized_agents.lesson_agent", "LessonAgent")
 
-# Import utilities for state management (CRITICAL: clear_pending_answer is needed for robustness)
-from utils.state_manager import update_state, get_active_state, set_pending_answer, clear_pending_answer
+# The learner's state is passed in explicitly as a LearnerSession (see utils/state_manager.py)
+from utils.state_manager import LearnerSession
+from utils.agent_graph import AgentStep, run_agent_graph, start_step, wait_step
+from utils.tracing import traced, span, log, current_span
+from utils.resilience import with_request_deadline
+from utils.model_router import learner_routing, with_learner_routing
+from utils.prefetch import prefetch, claim
+from utils.fast_grader import content_terms
+from utils.spaced_repetition import get_due_queue
+from utils.concept_index import canonical_concept
 
+# "multi": SubjectAgent -> ContentGeneratorAgent with TestAgent alongside (three LLM calls).
+# "fused": LessonAgent asks for all three parts in one structured call, falling back to
+# the multi-agent path if that call fails or its response does not match the schema.
+LESSON_MODE = os.getenv("EDUINDIA_LESSON_MODE", "multi")
+QUIZ_SIZE = int(os.getenv("EDUINDIA_QUIZ_SIZE", "5"))
 
-def OrchestrationAgent(concept: str) -> str:
+
+def _test_step(concept: str, session: LearnerSession) -> AgentStep:
+    """The TestAgent step of a lesson; it only needs the concept, so it runs alongside the rest."""
+    return AgentStep(
+        "test_data", lambda: TestAgent(concept, session),
+        fallback={'question': 'Could not generate a question.'}
+    )
+
+
+def _record_test(concept: str, test_data, session: LearnerSession) -> str:
+    """Stores the expected answer (if TestAgent produced one) and returns the question text."""
+    if isinstance(test_data, dict) and 'question' in test_data and 'answer' in test_data:
+        # State change: Set pending answer before responding to the user
+        session.set_pending_answer(concept, test_data['answer'])
+        return test_data['question']
+    return test_data.get('question', 'Could not generate a question.')
+
+
+def _prepare_grading(task, expected_answer: str) -> tuple:
+    """Tokenizes the expected answer ahead of time for AnswerAgent's fast-path grader."""
+    return expected_answer, content_terms(expected_answer)
+
+
+def _prefetch_next_lesson(task, concept: str, session: LearnerSession):
+    """Warms the response cache with the lesson the scheduler would recommend after `concept`."""
+    revision_history = session.get_state()['revision_history']
+    candidates = get_due_queue(session).top_k(2)
+    next_topics = [topic for _, topic in candidates if topic != concept]
+    # Two LLM calls: the core explanation and the localized analogy
+    if not next_topics or not task.spend(2):
+        return None
+    # Prefetches run on their own worker, so route by the learner's mastery as the lesson would be
+    with learner_routing(session):
+        core_explanation = SubjectAgent(next_topics[0])
+        task.check()
+        ContentGeneratorAgent(core_explanation, session)
+    return next_topics[0], True
+
+
+def _prefetch_next_steps(concept: str, session: LearnerSession, next_lesson: bool = True):
+    """While the learner reads, prepares grading for the pending question and (optionally) the next lesson."""
+    pending = session.get_state().get('pending_answer')
+    if pending is not None:
+        prefetch(session.learner_key, "grading", _prepare_grading, pending['expected_answer'])
+    if next_lesson:
+        prefetch(session.learner_key, "lesson", _prefetch_next_lesson, concept, session)
+
+
+def _claim_lesson(concept: str, session: LearnerSession):
+    if claim(session.learner_key, "lesson", concept):
+        log("⚡ OrchestrationAgent: Lesson was prefetched while the learner was reading")
+
+
+def _question_section(active_recall_q: str) -> str:
+    return (
+        f"--- Active Recall Check ---\n"
+        f"**Question (from Test Agent):**\n> {active_recall_q}"
+    )
+
+
+def _fused_lesson(concept: str, session: LearnerSession):
+    """Runs the fused single-call lesson if enabled; returns the lesson text, or None to use the multi-agent path."""
+    if LESSON_MODE != "fused":
+        return None
+    lesson = LessonAgent(concept, session)
+    if lesson is None:
+        log("⚠️ OrchestrationAgent: Fused lesson failed, falling back to the multi-agent path")
+        return None
+    active_recall_q = _record_test(concept, lesson, session)
+    return (
+        f"**Subject: {concept.title()}**\n\n"
+        f"**Core Concept (from Subject Agent):**\n> {lesson['core_explanation']}\n\n"
+        f"**Localized Analogy (from Content Generator Agent):**\n> {lesson['localized_analogy']}\n\n"
+        + _question_section(active_recall_q)
+    )
+
+
+def _finish_lesson(concept: str, session: LearnerSession):
+    """Logs the concept study to state, then warms the likely next requests."""
+    session.update_state(concept)
+    _prefetch_next_steps(concept, session)
+
+
+@traced("OrchestrationAgent")
+def OrchestrationAgent(concept: str, session: LearnerSession) -> str:
     """
     Manages the complex workflow for a lesson request:
-    1. Gets core concept (SubjectAgent).
-    2. Gets localized analogy (ContentGeneratorAgent).
-    3. Gets active recall question (TestAgent).
-    4. Combines results and updates state.
+    1. Gets core concept (SubjectAgent), then localized analogy (ContentGeneratorAgent).
+    2. Gets active recall question (TestAgent) concurrently with the chain above.
+    3. Combines results (partial if a step failed or timed out) and updates state.
     """
-    print("\n--- 🧠 OrchestrationAgent (Workflow Manager) Executing ---")
+    log("🧠 OrchestrationAgent (Workflow Manager) Executing")
+    _claim_lesson(concept, session)
     
-    # 1. Subject Agent runs (Core Concept) - Parallel step 1
-    core_explanation = SubjectAgent(concept)
+    # 0. Fused mode: one structured call for the whole lesson
+    fused = _fused_lesson(concept, session)
+    if fused is not None:
+        _finish_lesson(concept, session)
+        return fused
     
-    # 2. Content Generator Agent runs (Localization) - Parallel step 2
-    localized_analogy = ContentGeneratorAgent(core_explanation) 
+    # 1. Build the dependency graph of agent steps:
+    #    SubjectAgent -> ContentGeneratorAgent runs as one chain, TestAgent only needs the concept.
+    steps = [
+        AgentStep(
+            "core_explanation", lambda: SubjectAgent(concept),
+            fallback=lambda e: f"The core explanation could not be generated ({e})."
+        ),
+        AgentStep(
+            "localized_analogy", lambda core: ContentGeneratorAgent(core, session), depends_on=("core_explanation",),
+            fallback=lambda e: f"The localized analogy could not be generated ({e})."
+        ),
+        _test_step(concept, session),
+    ]
+    results, failures = run_agent_graph(steps)
+    for step_name, error in failures.items():
+        log(f"⚠️ OrchestrationAgent: Step '{step_name}' failed, using partial result. ({error})")
     
-    # 3. Test Agent runs (Active Recall) - Sequential step 3 (after concept is ready)
-    test_data = TestAgent(concept) 
+    core_explanation = results["core_explanation"]
+    localized_analogy = results["localized_analogy"]
+    test_data = results["test_data"]
     
-    # Check if TestAgent returned a dict (question and answer)
-    if isinstance(test_data, dict) and 'question' in test_data and 'answer' in test_data:
-        active_recall_q = test_data['question']
-        # State change: Set pending answer before responding to the user
-        set_pending_answer(concept, test_data['answer'])
-    else:
-        active_recall_q = test_data.get('question', 'Could not generate a question.')
+    # 2. Check if TestAgent returned a dict (question and answer)
+    active_recall_q = _record_test(concept, test_data, session)
     
-    # 4. Integrate and Present the full lesson experience
+    # 3. Integrate and Present the full lesson experience
     final_response = (
         f"**Subject: {concept.title()}**\n\n"
         f"**Core Concept (from Subject Agent):**\n> {core_explanation}\n\n"
         f"**Localized Analogy (from Content Generator Agent):**\n> {localized_analogy}\n\n"
-        f"--- Active Recall Check ---\n"
-        f"**Question (from Test Agent):**\n> {active_recall_q}"
+        + _question_section(active_recall_q)
     )
     
-    # 5. Log the concept study to state
-    update_state(concept)
+    # 4. Log the concept study to state, then warm the likely next requests
+    _finish_lesson(concept, session)
     
     return final_response
 
 
-def RootAgent(user_query: str) -> str:
+@traced("OrchestrationAgent")
+def OrchestrationAgentStream(concept: str, session: LearnerSession):
+    """
+    Streaming variant of OrchestrationAgent: yields the lesson section by section,
+    streaming the Subject and Content Generator output as it is produced while
+    TestAgent runs in the background.
+    """
+    log("🧠 OrchestrationAgent (Workflow Manager) Streaming")
+    _claim_lesson(concept, session)
+    
+    # 0. Fused mode returns the whole lesson from one JSON response, so it is not streamed
+    fused = _fused_lesson(concept, session)
+    if fused is not None:
+        yield fused
+        _finish_lesson(concept, session)
+        return
+    
+    # 1. TestAgent does not depend on the explanation, so start it first
+    test_step = _test_step(concept, session)
+    test_future = start_step(test_step)
+    
+    # 2. Stream the core explanation, keeping the full text for localization
+    yield f"**Subject: {concept.title()}**\n\n**Core Concept (from Subject Agent):**\n> "
+    core_chunks = []
+    for chunk in SubjectAgentStream(concept):
+        core_chunks.append(chunk)
+        yield chunk
+    
+    # 3. Stream the localized analogy
+    yield "\n\n**Localized Analogy (from Content Generator Agent):**\n> "
+    yield from ContentGeneratorAgentStream("".join(core_chunks), session)
+    
+    # 4. Collect the recall question (usually finished by now)
+    test_data, error = wait_step(test_step, test_future)
+    if error is not None:
+        log(f"⚠️ OrchestrationAgent: Step 'test_data' failed, using partial result. ({error})")
+    active_recall_q = _record_test(concept, test_data, session)
+    yield "\n\n" + _question_section(active_recall_q)
+    
+    # 5. Log the concept study to state, then warm the likely next requests
+    _finish_lesson(concept, session)
+
+
+def _quiz_topics(query: str, session: LearnerSession):
+    """Returns one concept per quiz question for 'quiz me on <topic>' / 'revision quiz', or None for other requests."""
+    if "quiz me on" in query:
+        topic = canonical_concept(query.split("quiz me on", 1)[-1])
+        return [topic] * QUIZ_SIZE if topic else []
+    if "revision quiz" in query:
+        revision_history = session.get_state()['revision_history']
+        if not revision_history:
+            return []
+        # The most overdue concepts, cycled if there are fewer than QUIZ_SIZE
+        due = [concept for _, concept in get_due_queue(session).top_k(QUIZ_SIZE)]
+        return [due[i % len(due)] for i in range(QUIZ_SIZE)]
+    return None
+
+
+def _quiz_question(quiz: dict, index: int) -> str:
+    return (
+        f"--- Quiz Question {index + 1}/{len(quiz['questions'])} ---\n"
+        f"**Question (from Test Agent):**\n> {quiz['questions'][index]['question']}"
+    )
+
+
+@traced("QuizMaster")
+def start_quiz(topics: list, session: LearnerSession) -> str:
+    """Collects distinct questions for each topic (one step per topic, concurrently) and starts the quiz."""
+    slots = {}  # topic -> number of quiz questions on it, in first-seen order
+    for topic in topics:
+        slots[topic] = slots.get(topic, 0) + 1
+    steps = [AgentStep(f"questions_{i}", lambda topic=topic, count=count: TestQuestions(topic, count, session),
+                       fallback=[])
+             for i, (topic, count) in enumerate(slots.items())]
+    results, _ = run_agent_graph(steps)
+    remaining = {topic: iter(results[f"questions_{i}"]) for i, topic in enumerate(slots)}
+    questions = [
+        {'concept': topic, 'question': test_data['question'], 'expected_answer': test_data['answer']}
+        for topic, test_data in ((topic, next(remaining[topic], None)) for topic in topics)
+        if test_data is not None
+    ]
+    if not questions:
+        return "Sorry, I could not prepare quiz questions right now. Please try again."
+    quiz = {'questions': questions, 'answers': []}
+    session.set_pending_quiz(questions)
+    return (
+        f"Quiz time! Answer the {len(questions)} questions one message at a time; "
+        f"I'll grade them all together at the end.\n\n" + _quiz_question(quiz, 0)
+    )
+
+
+def _log_request(user_query: str):
+    current_span().set(request=user_query)
+    log(f"🤖 RootAgent: Received Request: '{user_query}'")
+
+
+def _lesson_concept(query: str):
+    """Returns the canonical concept for an 'explain'/'teach' request, or None for other requests."""
+    if "explain" in query or "teach" in query:
+        keyword = "explain" if "explain" in query else "teach"
+        return canonical_concept(query.split(keyword, 1)[-1]) or canonical_concept("Cloud Computing")
+    return None
+
+
+@with_request_deadline()
+@with_learner_routing
+def RootAgentStream(user_query: str, session: LearnerSession):
+    """
+    Streaming variant of RootAgent. Lessons are streamed chunk by chunk; every
+    other request (answers, tests, scheduling) is yielded as a single chunk.
+    """
+    concept = _lesson_concept(user_query.lower())
+    state = session.get_state()
+    if concept is None or state.get('pending_answer') is not None or state.get('pending_quiz') is not None:
+        yield RootAgent(user_query, session)
+        return
+    
+    with span("RootAgent"):
+        _log_request(user_query)
+        yield from OrchestrationAgentStream(concept, session)
+
+
+@traced("RootAgent")
+@with_request_deadline()
+@with_learner_routing
+def RootAgent(user_query: str, session: LearnerSession) -> str:
     """
     The main delegation agent. Directs user requests to the appropriate sub-agent 
-    or starts the full orchestration workflow.
+    or starts the full orchestration workflow. Everything it delegates shares one
+    request deadline (EDUINDIA_REQUEST_DEADLINE).
     """
-    print(f"\n=======================================================")
-    print(f"=== 🤖 RootAgent: Received Request: '{user_query}' ===")
-    print(f"=======================================================")
+    _log_request(user_query)
     
     query = user_query.lower()
     
     # 0. Check for Pending Answer State FIRST
-    active_user_state = get_active_state()
+    active_user_state = session.get_state()
+
+    # A running quiz collects one answer per message and grades them all in one batch at the end
+    if active_user_state.get('pending_quiz') is not None:
+        quiz = session.record_quiz_answer(user_query)
+        answered = len(quiz['answers']) if quiz is not None else 0
+        if quiz is not None and answered < len(quiz['questions']):
+            return _quiz_question(quiz, answered)
+        quiz = session.take_pending_quiz()
+        if quiz is None:
+            return "This quiz is already being graded."
+        log("🧠 RootAgent: Delegating completed quiz to QuizAgent")
+        return QuizAgent(quiz, session)
 
     # CRITICAL FIX: Explicitly check if the value is NOT None.
     if active_user_state.get('pending_answer') is not None: 
-        pending_data = active_user_state.get('pending_answer')
+        # Take (read and clear) the pending answer atomically, so a double submit is graded only once
+        pending_data = session.take_pending_answer()
         
         # Ensure the pending data is valid (concept and answer keys exist)
         if isinstance(pending_data, dict) and 'concept' in pending_data and 'expected_answer' in pending_data:
-            print("--- 🧠 RootAgent: Delegating to AnswerAgent (Waiting for response) ---")
+            log("🧠 RootAgent: Delegating to AnswerAgent (Waiting for response)")
             # Delegate to AnswerAgent with the user's response and the expected answer data
-            return AnswerAgent(user_query, pending_data)
+            return AnswerAgent(user_query, pending_data, session)
         else:
             # Fallback if state is corrupted, clear it and inform the user
-            print("--- ⚠️ RootAgent: Pending state corrupted, clearing state. ---")
-            clear_pending_answer()
+            log("⚠️ RootAgent: Pending state corrupted, clearing state.")
             return "There was an issue processing your test answer. Let's restart the test or ask me to explain a concept."
 
 
     # 1. Check for 'explain' or 'teach'
-    if "explain" in query or "teach" in query:
+    concept = _lesson_concept(query)
+    if concept is not None:
         # Delegation 1: Lesson Request -> OrchestrationAgent
-        keyword = "explain" if "explain" in query else "teach"
-        concept = query.split(keyword, 1)[-1].strip() or "Cloud Computing" 
-        return OrchestrationAgent(concept)
+        return OrchestrationAgent(concept, session)
+    
+    # 2. Check for a multi-question quiz ('quiz me on <topic>' or 'revision quiz')
+    elif (topics := _quiz_topics(query, session)) is not None:
+        if not topics:
+            return "Please specify a topic for the quiz, e.g., 'quiz me on Photosynthesis', or study a topic first."
+        # Delegation 2: Quiz Request -> TestAgent (one question per topic)
+        return start_quiz(topics, session)
     
-    # 2. Check for 'revise' or 'schedule'
+    # 3. Check for 'revise' or 'schedule'
     elif "revise" in query or "study next" in query or "schedule" in query:
-        # Delegation 2: Revision Request -> SchedulerAgent
-        return SchedulerAgent()
+        # Delegation 3: Revision Request -> SchedulerAgent
+        return SchedulerAgent(session)
         
-    # 3. Check for 'test me on' or 'quiz on' (This is where pending_answer is SET)
+    # 4. Check for 'test me on' or 'quiz on' (This is where pending_answer is SET)
     elif "test me on" in query or "quiz on" in query or "test me" in query:
-        # Delegation 3: Test Only Request -> TestAgent
+        # Delegation 4: Test Only Request -> TestAgent
         
         keyword = ""
         if "test me on" in query:
@@ -104,19 +364,20 @@ def RootAgent(user_query: str) -> str:
         elif "test me" in query:
             keyword = "test me"
             
-        topic = query.split(keyword, 1)[-1].strip()
+        topic = canonical_concept(query.split(keyword, 1)[-1])
         if not topic:
              return "Please specify a topic for the test, e.g., 'test me on Photosynthesis'."
         
-        test_data = TestAgent(topic)
+        test_data = TestAgent(topic, session)
         
         if isinstance(test_data, dict) and 'question' in test_data:
             # set_pending_answer is called to store the expected answer
-            set_pending_answer(topic, test_data['answer'])
+            session.set_pending_answer(topic, test_data['answer'])
+            _prefetch_next_steps(topic, session, next_lesson=False)
             return f"--- Active Recall Check ---\n**Question (from Test Agent):**\n> {test_data['question']}"
         else:
             return test_data # Returns generic error string if TestAgent fails
         
     else:
         # Fallback for conversational queries
-        return "I can help you! Ask me to 'explain <topic>', 'study next', or 'test me on <topic>'."
\ No newline at end of file
+        return "I can help you! Ask me to 'explain <topic>', 'study next', 'test me on <topic>', or 'quiz me on <topic>'."
\ No newline at end of file
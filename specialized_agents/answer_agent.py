@@ -1,19 +1,14 @@
 import json
-from google import genai
-from utils.state_manager import get_active_state, clear_pending_answer, increase_mastery
+from utils.state_manager import LearnerSession
+from utils.gemini_client import generate_content, DEFAULT_MODEL
+from utils.tracing import traced, log
+from utils.fast_grader import pre_grade
+from utils.prefetch import claim
 
-def AnswerAgent(user_answer: str, pending_data: dict) -> str:
-    """Grades the user's answer against the expected answer and updates mastery."""
-    print("--- 🧠 AnswerAgent: Grading User Response and Updating State ---")
-    active_state = get_active_state()
-    
-    concept = pending_data['concept']
-    expected_answer = pending_data['expected_answer']
-    
-    # 1. Clear the pending state immediately to prevent infinite loops
-    clear_pending_answer()
-    
-    # 2. Construct the prompt for the grading agent
+
+def _llm_grade(concept: str, expected_answer: str, user_answer: str) -> tuple:
+    """Grades an ambiguous answer with the LLM. Returns (grading_result, graded)."""
+    # Construct the prompt for the grading agent
     prompt = (
         f"Task: Grade the user's response for the concept '{concept}'. "
         f"The grading is on a scale of 0 (completely wrong) to 3 (excellent and comprehensive)."
@@ -28,6 +23,7 @@ def AnswerAgent(user_answer: str, pending_data: dict) -> str:
         f"mastery_increment (int): The score (0-3) to add to the user's mastery progress."
     )
     
+    graded = False
     grading_result = {
         "score": 0, 
         "feedback": "Grading failed due to an API error. Please try the test again.",
@@ -35,15 +31,13 @@ def AnswerAgent(user_answer: str, pending_data: dict) -> str:
     }
     
     try:
-        # Rely on genai.Client() to pick up the API key from the environment
-        client = genai.Client() 
-        
-        response = client.models.generate_content(
-            model='gemini-2.5-flash-preview-09-2025',
+        # Shared, pooled client (picks up the API key from the environment)
+        response = generate_content(
+            model=DEFAULT_MODEL,
             contents=prompt,
-            config=genai.types.GenerateContentConfig(
-                response_mime_type="application/json",
-                response_schema={
+            config={
+                "response_mime_type": "application/json",
+                "response_schema": {
                     "type": "OBJECT",
                     "properties": {
                         "score": {"type": "INTEGER"},
@@ -51,29 +45,60 @@ def AnswerAgent(user_answer: str, pending_data: dict) -> str:
                         "mastery_increment": {"type": "INTEGER"}
                     }
                 }
-            )
+            }
         )
         
         grading_result = json.loads(response.text)
+        graded = True
         
     except Exception as e:
-        print(f"Error in AnswerAgent API call: {e}")
+        log(f"⚠️ Error in AnswerAgent API call: {e}")
         grading_result['feedback'] = f"Grading failed due to an API error. Check API Key configuration. Error details: {e}"
 
+    return grading_result, graded
+
+
+@traced("AnswerAgent")
+def AnswerAgent(user_answer: str, pending_data: dict, session: LearnerSession) -> str:
+    """Grades the user's answer against the expected answer and updates mastery."""
+    log("🧠 AnswerAgent: Grading User Response and Updating State")
+    concept = pending_data['concept']
+    expected_answer = pending_data['expected_answer']
+    
+    # The caller has already taken (read and cleared) the pending answer from the session
+    # 1. Fast path: clear-cut answers (blank, "I don't know", near-verbatim) are scored locally
+    #    (the expected answer is usually tokenized ahead of time while the learner was reading)
+    expected_terms = claim(session.learner_key, "grading", expected_answer)
+    if expected_terms is not None:
+        log("⚡ AnswerAgent: Using prefetched grading context")
+    fast_result = pre_grade(user_answer, expected_answer, expected_terms)
+    if fast_result is not None:
+        log("⚡ AnswerAgent: Graded locally (fast path)")
+        grading_result, graded = fast_result, True
+    else:
+        grading_result, graded = _llm_grade(concept, expected_answer, user_answer)
+
 
-    # 3. Update Mastery State
+    # 2. Update Mastery State
     # Ensure increment is an integer, default to 0 if missing or invalid
     try:
         increment = int(grading_result.get('mastery_increment', 0)) 
     except (TypeError, ValueError):
         increment = 0
         
-    level_up = increase_mastery(increment)
+    level_up = session.increase_mastery(increment)
+    
+    # Move the concept's spaced-repetition schedule (only for real grades, not API failures)
+    if graded:
+        try:
+            session.record_grade(concept, int(grading_result.get('score', 0)))
+        except (TypeError, ValueError):
+            pass
     
     # Get current state again to display updated mastery score
-    current_state = get_active_state()
+    current_state = session.get_state()
     
-    # 4. Construct Final Response
+    # 3. Construct Final Response
     mastery_message = ""
     if level_up:
         mastery_message = f"**🌟 MASTERY LEVEL UP!** Your overall mastery score increased to {current_state['mastery_score']}/5! Keep up the great work!"
@@ -91,4 +116,120 @@ def AnswerAgent(user_answer: str, pending_data: dict) -> str:
         f"{mastery_message}"
     )
     
-    return final_response
\ No newline at end of file
+    return final_response
+
+def _llm_grade_batch(items: list) -> list:
+    """
+    Grades several ambiguous answers in one LLM call. `items` are dicts with 'concept',
+    'expected_answer' and 'answer'. Returns one (grading_result, graded) per item.
+    """
+    numbered = "".join(
+        f"\n\nQuestion {number} (concept: {item['concept']})"
+        f"\nExpected Answer: {item['expected_answer']}"
+        f"\nUser Response: {item['answer']}"
+        for number, item in enumerate(items, start=1)
+    )
+    prompt = (
+        f"Task: Grade each of the user's quiz responses below against its expected answer. "
+        f"The grading is on a scale of 0 (completely wrong) to 3 (excellent and comprehensive). "
+        f"Output strictly a JSON array with exactly one object per question, in the same order, "
+        f"each with the keys 'score', 'feedback' and 'mastery_increment'."
+        f"\n\n--- Data ---{numbered}"
+        f"\n\n--- JSON Structure ---"
+        f"score (int): 0-3."
+        f"feedback (string): Explain why the user received that score and what they missed."
+        f"mastery_increment (int): The score (0-3) to add to the user's mastery progress."
+    )
+    failed = {
+        "score": 0,
+        "feedback": "Grading failed due to an API error. Please try the quiz again.",
+        "mastery_increment": 0
+    }
+
+    try:
+        response = generate_content(
+            model=DEFAULT_MODEL,
+            contents=prompt,
+            config={
+                "response_mime_type": "application/json",
+                "response_schema": {
+                    "type": "ARRAY",
+                    "items": {
+                        "type": "OBJECT",
+                        "properties": {
+                            "score": {"type": "INTEGER"},
+                            "feedback": {"type": "STRING"},
+                            "mastery_increment": {"type": "INTEGER"}
+                        }
+                    }
+                }
+            }
+        )
+        results = json.loads(response.text)
+    except Exception as e:
+        log(f"⚠️ Error in QuizAgent API call: {e}")
+        return [(dict(failed), False) for _ in items]
+
+    graded = [(result, True) for result in results[:len(items)] if isinstance(result, dict)]
+    # Questions the response skipped are reported as failed rather than guessed
+    return graded + [(dict(failed), False) for _ in range(len(items) - len(graded))]
+
+
+def _as_int(value) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+@traced("QuizAgent")
+def QuizAgent(quiz: dict, session: LearnerSession) -> str:
+    """
+    Grades a completed multi-question quiz: clear-cut answers locally, all ambiguous ones
+    in a single batched LLM call. Applies one combined mastery update for the whole quiz.
+    """
+    questions = quiz['questions']
+    items = [dict(question, answer=answer) for question, answer in zip(questions, quiz['answers'])]
+    log(f"🧠 QuizAgent: Grading {len(items)} answers")
+
+    # 1. Fast path per answer; collect the ambiguous ones for one batched call
+    results = [pre_grade(item['answer'], item['expected_answer']) for item in items]
+    ambiguous = [index for index, result in enumerate(results) if result is None]
+    graded = [result is not None for result in results]
+    if ambiguous:
+        log(f"🧠 QuizAgent: Sending {len(ambiguous)} ambiguous answers to the LLM in one call")
+        for index, (result, ok) in zip(ambiguous, _llm_grade_batch([items[i] for i in ambiguous])):
+            results[index], graded[index] = result, ok
+
+    # 2. One combined mastery update: the quiz counts like one test, at its average increment
+    increments = [max(0, min(3, _as_int(result.get('mastery_increment', 0)))) for result in results]
+    combined_increment = round(sum(increments) / len(increments)) if increments else 0
+    level_up = session.increase_mastery(combined_increment)
+
+    # 3. Move each concept's spaced-repetition schedule once, by its average quiz score
+    scores_by_concept = {}
+    for item, result, ok in zip(items, results, graded):
+        if ok:
+            scores_by_concept.setdefault(item['concept'], []).append(_as_int(result.get('score', 0)))
+    for concept, scores in scores_by_concept.items():
+        session.record_grade(concept, round(sum(scores) / len(scores)))
+
+    current_state = session.get_state()
+    total_score = sum(_as_int(result.get('score', 0)) for result in results)
+    lines = [
+        f"**{number}. {item['question']}**\n"
+        f"Score: {_as_int(result.get('score', 0))}/3 - {result.get('feedback', 'No feedback provided.')}"
+        for number, (item, result) in enumerate(zip(items, results), start=1)
+    ]
+    if level_up:
+        mastery_message = f"**🌟 MASTERY LEVEL UP!** Your overall mastery score increased to {current_state['mastery_score']}/5! Keep up the great work!"
+    elif combined_increment > 0:
+        mastery_message = f"**Mastery Progress:** Gained {combined_increment} point(s). Current mastery progress is {current_state['mastery_increment']}/3 towards the next level."
+    else:
+        mastery_message = "No mastery progress gained this time. Don't worry, every review helps!"
+
+    return (
+        f"--- ✅ Quiz Graded: {total_score}/{3 * len(items)} ---\n\n"
+        + "\n\n".join(lines)
+        + f"\n\n***\n{mastery_message}"
+    )
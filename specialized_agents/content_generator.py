@@ -1,21 +1,14 @@
 import json
-import os
-from google import genai
-from utils.state_manager import get_active_state
+from utils.state_manager import LearnerSession
+from utils.gemini_client import generate_content, generate_content_stream, served_model, DEFAULT_MODEL
+from utils.model_router import cache_models
+from utils.response_cache import get_cached, put_cached
+from utils.tracing import traced, log
 
-# --- Helper function to get the initialized Gemini Client (API Key Check) ---
-def get_gemini_client():
-    """Initializes and returns the Gemini client using the environment variable."""
-    api_key = os.getenv('GEMINI_API_KEY')
-    if not api_key:
-        raise ValueError("GEMINI_API_KEY environment variable is not set.")
-    return genai.Client(api_key=api_key)
 
-
-def ContentGeneratorAgent(core_concept_explanation: str) -> str:
-    """Localizes the core explanation using the active user's profile."""
-    print("--- 🧠 ContentGeneratorAgent: Localizing Explanation ---")
-    active_state = get_active_state()
+def _localization_inputs(core_concept_explanation: str, session: LearnerSession) -> tuple:
+    """Returns the cache inputs and prompt for localizing an explanation for the session's learner."""
+    active_state = session.get_state()
     
     user_location = active_state['location']
     user_background = active_state['background']
@@ -31,17 +24,56 @@ def ContentGeneratorAgent(core_concept_explanation: str) -> str:
         f"{core_concept_explanation}"
     )
     
+    # The analogy depends only on the explanation and the learner's (background, location, language)
+    cache_inputs = (core_concept_explanation, user_background, user_location, user_language)
+    return cache_inputs, prompt
+
+
+@traced("ContentGeneratorAgent")
+def ContentGeneratorAgent(core_concept_explanation: str, session: LearnerSession) -> str:
+    """Localizes the core explanation using the learner's profile."""
+    log("🧠 ContentGeneratorAgent: Localizing Explanation")
+    cache_inputs, prompt = _localization_inputs(core_concept_explanation, session)
+    
+    cached = get_cached("ContentGeneratorAgent", cache_models("ContentGeneratorAgent"), *cache_inputs)
+    if cached is not None:
+        log("⚡ ContentGeneratorAgent: Served Localized Analogy from cache")
+        return cached
+    
     try:
-        # Use the robust client initialization
-        client = get_gemini_client()
-        
-        # Using gemini-2.5-flash-preview-09-2025 for robust localization and translation
-        response = client.models.generate_content(
-            model='gemini-2.5-flash-preview-09-2025',
+        # Shared, pooled client (raises ValueError if the API key is missing)
+        response = generate_content(
+            model=DEFAULT_MODEL,
             contents=prompt
         )
+        put_cached("ContentGeneratorAgent", served_model(), response.text, *cache_inputs)
         return response.text
     except ValueError as e:
         return f"Configuration Error in ContentGeneratorAgent: {e} Please set the GEMINI_API_KEY."
     except Exception as e:
-        return f"Error in ContentGeneratorAgent API call: {e}"
\ No newline at end of file
+        return f"Error in ContentGeneratorAgent API call: {e}"
+
+
+@traced("ContentGeneratorAgent")
+def ContentGeneratorAgentStream(core_concept_explanation: str, session: LearnerSession):
+    """Streaming variant of ContentGeneratorAgent: yields the localized analogy in chunks."""
+    log("🧠 ContentGeneratorAgent: Streaming Localized Explanation")
+    cache_inputs, prompt = _localization_inputs(core_concept_explanation, session)
+    
+    cached = get_cached("ContentGeneratorAgent", cache_models("ContentGeneratorAgent"), *cache_inputs)
+    if cached is not None:
+        log("⚡ ContentGeneratorAgent: Served Localized Analogy from cache")
+        yield cached
+        return
+    
+    chunks = []
+    try:
+        for chunk in generate_content_stream(model=DEFAULT_MODEL, contents=prompt):
+            if chunk.text:
+                chunks.append(chunk.text)
+                yield chunk.text
+        put_cached("ContentGeneratorAgent", served_model(), "".join(chunks), *cache_inputs)
+    except ValueError as e:
+        yield f"Configuration Error in ContentGeneratorAgent: {e} Please set the GEMINI_API_KEY."
+    except Exception as e:
+        yield f"Error in ContentGeneratorAgent API call: {e}"
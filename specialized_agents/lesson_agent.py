@@ -0,0 +1,111 @@
+import json
+from utils.state_manager import LearnerSession
+from specialized_agents.subject_test import TestAgent
+from utils.gemini_client import generate_content, served_model, DEFAULT_MODEL
+from utils.model_router import cache_models
+from utils.question_bank import get_question_bank, clamp_difficulty, BANK_DISABLED
+from utils.response_cache import get_cached, put_cached
+from utils.tracing import traced, log
+
+# The fused lesson returns everything the three lesson agents produce, in one response
+LESSON_FIELDS = ("core_explanation", "localized_analogy", "question", "answer")
+
+
+def _lesson_prompt(concept: str, active_state: dict) -> str:
+    return (
+        f"You are a master educator preparing a short lesson on '{concept}'.\n"
+        f"1. core_explanation: Explain the core concept clearly and concisely for a general audience, "
+        f"without localized analogies, cultural references, or advanced terms.\n"
+        f"2. localized_analogy: Adapt that explanation using a culturally relevant analogy specific to the "
+        f"learner's background and location: {active_state['background']} in {active_state['location']}. "
+        f"Start with the analogy in English, followed by the full analogy translated into {active_state['language']}.\n"
+        f"3. question: One simple, open-ended active recall question about '{concept}'.\n"
+        f"4. answer: The comprehensive expected answer to that question (a few sentences).\n"
+        f"Format the output strictly as a JSON object with the keys: {', '.join(LESSON_FIELDS)}."
+    )
+
+
+def _parse_lesson(text: str):
+    """Returns the lesson dict if the response matches the schema (all fields non-empty strings), else None."""
+    try:
+        lesson = json.loads(text)
+    except (TypeError, ValueError):
+        return None
+    if not isinstance(lesson, dict):
+        return None
+    if not all(isinstance(lesson.get(field), str) and lesson[field].strip() for field in LESSON_FIELDS):
+        return None
+    return {field: lesson[field].strip() for field in LESSON_FIELDS}
+
+
+def _cached_lesson(concept: str, session: LearnerSession, active_state: dict):
+    """Returns the lesson from the multi-agent caches and the question bank, or None if either text is missing."""
+    explanation = get_cached("SubjectAgent", cache_models("SubjectAgent"), concept)
+    if explanation is None:
+        return None
+    analogy = get_cached(
+        "ContentGeneratorAgent", cache_models("ContentGeneratorAgent"),
+        explanation, active_state['background'], active_state['location'], active_state['language']
+    )
+    if analogy is None:
+        return None
+    test_data = TestAgent(concept, session)
+    return {"core_explanation": explanation, "localized_analogy": analogy,
+            "question": test_data['question'], "answer": test_data['answer']}
+
+
+@traced("LessonAgent")
+def LessonAgent(concept: str, session: LearnerSession):
+    """
+    Fused lesson: generates the core explanation, the localized analogy and the recall
+    question/answer in one structured-JSON call. Repeat lessons are served from the
+    response cache and the question bank instead. Returns None if the call fails or the
+    response does not match the schema, so the caller can use the multi-agent path.
+    """
+    active_state = session.get_state()
+    lesson = _cached_lesson(concept, session, active_state)
+    if lesson is not None:
+        log("⚡ LessonAgent: Served the lesson from cache")
+        return lesson
+
+    log("🧠 LessonAgent: Generating the full lesson in one call")
+
+    try:
+        response = generate_content(
+            model=DEFAULT_MODEL,
+            contents=_lesson_prompt(concept, active_state),
+            config={
+                "response_mime_type": "application/json",
+                "response_schema": {
+                    "type": "OBJECT",
+                    "properties": {
+                        "core_explanation": {"type": "STRING", "description": "The general explanation."},
+                        "localized_analogy": {"type": "STRING", "description": "The localized, translated analogy."},
+                        "question": {"type": "STRING", "description": "The active recall question."},
+                        "answer": {"type": "STRING", "description": "The detailed expected answer."}
+                    },
+                    "required": list(LESSON_FIELDS),
+                }
+            }
+        )
+    except Exception as e:
+        log(f"⚠️ Error in LessonAgent API call: {e}")
+        return None
+
+    lesson = _parse_lesson(response.text)
+    if lesson is None:
+        log("⚠️ LessonAgent: Response did not match the lesson schema")
+        return None
+
+    # Keep the multi-agent caches and the question bank warm, so either mode can serve this lesson next time
+    model = served_model()
+    put_cached("SubjectAgent", model, lesson["core_explanation"], concept)
+    put_cached(
+        "ContentGeneratorAgent", model, lesson["localized_analogy"],
+        lesson["core_explanation"], active_state['background'], active_state['location'], active_state['language']
+    )
+    if not BANK_DISABLED:
+        item = {"question": lesson["question"], "answer": lesson["answer"],
+                "difficulty": clamp_difficulty(active_state.get('mastery_score'))}
+        get_question_bank().add(concept, model, [item], served_to=session.learner_key)
+    return lesson
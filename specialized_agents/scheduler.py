@@ -1,47 +1,76 @@
-import json
-from google import genai
-from utils.state_manager import get_active_state
+import os
+import time
+from utils.state_manager import LearnerSession
+from utils.gemini_client import generate_content, DEFAULT_MODEL
+from utils.tracing import traced, log
+from utils.revision_history import study_count
+from utils.spaced_repetition import get_due_queue
+from utils.revision_planner import get_plan_store
 from datetime import datetime
 
-def SchedulerAgent() -> str:
+# The next topic is chosen locally by the spaced-repetition engine (or read from the plan
+# precomputed by utils/revision_planner.py); the LLM is only asked (optionally) to write
+# the encouraging study-plan prose for the top candidates.
+SCHEDULER_TOP_K = int(os.getenv("EDUINDIA_SCHEDULER_TOP_K", "3"))
+SCHEDULER_PROSE = os.getenv("EDUINDIA_SCHEDULER_PROSE", "0") == "1"
+
+
+def _format_due(due: float, now: float) -> str:
+    if due <= now:
+        return "due now"
+    return f"due {datetime.fromtimestamp(due).strftime('%Y-%m-%d')}"
+
+
+@traced("SchedulerAgent")
+def SchedulerAgent(session: LearnerSession) -> str:
     """Determines the next best topic for the user to study based on revision history."""
-    print("--- 🧠 SchedulerAgent: Determining Next Revision Topic ---")
-    active_state = get_active_state()
-    
+    log("🧠 SchedulerAgent: Determining Next Revision Topic")
+    active_state = session.get_state()
+
     revision_history = active_state['revision_history']
     user_mastery = active_state['mastery_score']
-    
-    # Format history into a readable string for the LLM
-    formatted_history = "No revision history found."
-    if revision_history:
-        history_list = []
-        for concept, timestamps in revision_history.items():
-            # Get the date of the last study session
-            last_study_time = datetime.fromtimestamp(timestamps[-1]).strftime('%Y-%m-%d %H:%M')
-            study_count = len(timestamps)
-            history_list.append(f"- Concept: {concept}, Last Studied: {last_study_time}, Times Studied: {study_count}")
-        formatted_history = "\n".join(history_list)
-        
-    prompt = (
-        f"You are a study planner. Based on the user's revision history, recommend the single best concept "
-        f"for them to study next. The best concept should be one they haven't studied often or one studied long ago."
-        f"Then, suggest a brief, encouraging study schedule for the next week."
-        f"\n\n--- User Data ---"
-        f"Mastery Score: {user_mastery}/5"
-        f"Revision History:\n{formatted_history}"
-        f"\n\n--- Output Structure ---"
-        f"1. **Next Study Topic:** [Suggested Concept Name]"
-        f"2. **Study Plan:** [A short, encouraging weekly plan]"
+
+    if not revision_history:
+        return "No revision history found yet. Ask me to 'explain <topic>' to start your first lesson!"
+
+    # 1. Most overdue concepts from the precomputed plan if it is still current, else from
+    #    the learner's due queue (O(k log n)); no network call either way
+    now = time.time()
+    candidates = get_plan_store().candidates(session.learner_key, revision_history, SCHEDULER_TOP_K)
+    if candidates is None:
+        candidates = get_due_queue(session).top_k(SCHEDULER_TOP_K)
+    next_due, next_topic = candidates[0]
+    candidate_lines = "\n".join(
+        f"- {concept.title()} ({_format_due(due, now)}, studied {study_count(revision_history[concept])} time(s))"
+        for due, concept in candidates
+    )
+
+    study_plan = (
+        f"Review **{next_topic.title()}** today with 'test me on {next_topic}', then work through the "
+        f"topics below as they come due. Short, regular reviews build lasting memory - you've got this!\n"
+        f"{candidate_lines}"
     )
-    
-    try:
-        # Rely on genai.Client() to pick up the API key from the environment
-        client = genai.Client()
-        
-        response = client.models.generate_content(
-            model='gemini-2.5-flash-preview-09-2025',
-            contents=prompt
+
+    # 2. Optionally let the LLM turn the candidates into a friendlier weekly plan
+    if SCHEDULER_PROSE:
+        prompt = (
+            f"You are a study planner. The learner's next study topic has already been chosen: '{next_topic}'. "
+            f"Write a brief, encouraging study schedule for the next week covering these topics in order."
+            f"\n\n--- User Data ---"
+            f"Mastery Score: {user_mastery}/5"
+            f"Topics:\n{candidate_lines}"
         )
-        return response.text
-    except Exception as e:
-        return f"Error in SchedulerAgent: LLM call failed. Check API Key configuration. Error details: {e}"
\ No newline at end of file
+        try:
+            # Shared, pooled client (picks up the API key from the environment)
+            response = generate_content(
+                model=DEFAULT_MODEL,
+                contents=prompt
+            )
+            study_plan = response.text
+        except Exception as e:
+            log(f"⚠️ Error in SchedulerAgent prose call, using the local plan: {e}")
+
+    return (
+        f"1. **Next Study Topic:** {next_topic.title()} ({_format_due(next_due, now)})\n\n"
+        f"2. **Study Plan:** {study_plan}"
+    )
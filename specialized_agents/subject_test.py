@@ -1,35 +1,201 @@
 import json
-from google import genai
-from utils.state_manager import get_active_state
+from utils.gemini_client import generate_content, generate_content_stream, served_model, DEFAULT_MODEL
+from utils.model_router import cache_models
+from utils.response_cache import get_cached, put_cached, cache_key
+from utils.tracing import traced, log
+from utils.single_flight import get_single_flight
+from utils.state_manager import LearnerSession
+from utils.question_bank import (
+    get_question_bank, request_refill, clamp_difficulty,
+    BANK_DISABLED, BATCH_SIZE, LOW_WATERMARK, MIN_DIFFICULTY, MAX_DIFFICULTY,
+)
 
-def SubjectAgent(concept: str) -> str:
-    """Generates the core, general explanation of a concept."""
-    print("--- 🧠 SubjectAgent: Generating Core Explanation ---")
-    active_state = get_active_state()
-    
-    prompt = (
+# Identical concurrent calls share one in-flight LLM request (both agents are profile-independent)
+_SUBJECT_FLIGHT = get_single_flight("SubjectAgent")
+_TEST_FLIGHT = get_single_flight("TestAgent")
+
+def _subject_prompt(concept: str) -> str:
+    return (
         f"You are a master educator. Explain the core concept of '{concept}' clearly and concisely. "
         f"Do not use any localized analogies, cultural references, or advanced terms. "
         f"The explanation should be general and foundational, suitable for a general audience."
     )
+
+
+@traced("SubjectAgent")
+def SubjectAgent(concept: str) -> str:
+    """Generates the core, general explanation of a concept."""
+    log("🧠 SubjectAgent: Generating Core Explanation")
     
+    # The explanation depends only on the concept, so repeat lessons are served from cache
+    models = cache_models("SubjectAgent")
+    cached = get_cached("SubjectAgent", models, concept)
+    if cached is not None:
+        log("⚡ SubjectAgent: Served Core Explanation from cache")
+        return cached
+    
+    explanation, shared = _SUBJECT_FLIGHT.do(
+        cache_key("SubjectAgent", models[0], (concept,)), lambda: _generate_explanation(concept)
+    )
+    if shared:
+        log("⚡ SubjectAgent: Joined an identical in-flight request")
+    return explanation
+
+
+def _generate_explanation(concept: str) -> str:
     try:
-        # Rely on genai.Client() to pick up the API key from the environment
-        client = genai.Client()
-        response = client.models.generate_content(
-            model='gemini-2.5-flash-preview-09-2025',
-            contents=prompt
+        # Shared, pooled client (picks up the API key from the environment)
+        response = generate_content(
+            model=DEFAULT_MODEL,
+            contents=_subject_prompt(concept)
         )
+        put_cached("SubjectAgent", served_model(), response.text, concept)
         return response.text
     except Exception as e:
         return f"Error in SubjectAgent: LLM call failed. Check API Key configuration. Error details: {e}"
 
 
-def TestAgent(concept: str) -> dict:
-    """Generates an active recall question and the expected answer for a concept."""
-    print("--- 🧠 TestAgent: Generating Active Recall Question ---")
-    active_state = get_active_state()
+def _stream_explanation(concept: str):
+    chunks = []
+    for chunk in generate_content_stream(model=DEFAULT_MODEL, contents=_subject_prompt(concept)):
+        if chunk.text:
+            chunks.append(chunk.text)
+            yield chunk.text
+    put_cached("SubjectAgent", served_model(), "".join(chunks), concept)
+
+
+@traced("SubjectAgent")
+def SubjectAgentStream(concept: str):
+    """Streaming variant of SubjectAgent: yields the explanation in chunks as the model produces it."""
+    log("🧠 SubjectAgent: Streaming Core Explanation")
     
+    models = cache_models("SubjectAgent")
+    cached = get_cached("SubjectAgent", models, concept)
+    if cached is not None:
+        log("⚡ SubjectAgent: Served Core Explanation from cache")
+        yield cached
+        return
+    
+    try:
+        # Identical concurrent lessons share one streamed call (followers replay its chunks)
+        yield from _SUBJECT_FLIGHT.stream(
+            cache_key("SubjectAgent", models[0], (concept,)), lambda: _stream_explanation(concept),
+            on_join=lambda: log("⚡ SubjectAgent: Joined an identical in-flight request")
+        )
+    except Exception as e:
+        yield f"Error in SubjectAgent: LLM call failed. Check API Key configuration. Error details: {e}"
+
+
+@traced("TestAgent")
+def TestAgent(concept: str, session: LearnerSession = None) -> dict:
+    """
+    Returns an active recall question and the expected answer for a concept. Questions are
+    served from the pre-generated question bank, matched to the learner's mastery and not
+    repeated for the same learner until the concept's bank is exhausted.
+    """
+    models = cache_models("TestAgent")
+    if BANK_DISABLED:
+        log("🧠 TestAgent: Generating Active Recall Question")
+        test_data, shared = _TEST_FLIGHT.do(
+            cache_key("TestAgent", models[0], (concept,)), lambda: _generate_test(concept)
+        )
+        if shared:
+            log("⚡ TestAgent: Joined an identical in-flight request")
+        # Each caller gets its own copy, since callers may store or modify it
+        return dict(test_data)
+
+    bank = get_question_bank()
+    learner = session.learner_key if session is not None else ""
+    difficulty = clamp_difficulty(session.get_state().get('mastery_score')) if session is not None else 3
+
+    test_data, unseen = bank.take(concept, models, learner, difficulty)
+    if test_data is None:
+        # Nothing banked for this concept yet: generate the first batch now (identical
+        # concurrent requests share the one batch call), then serve from it
+        log("🧠 TestAgent: Generating a batch of Active Recall Questions")
+        _, shared = _TEST_FLIGHT.do(
+            cache_key("TestAgent", models[0], (concept,)), lambda: _fill_bank(concept)
+        )
+        if shared:
+            log("⚡ TestAgent: Joined an identical in-flight request")
+        test_data, unseen = bank.take(concept, models, learner, difficulty)
+    else:
+        log("⚡ TestAgent: Served Active Recall Question from the question bank")
+
+    if unseen < LOW_WATERMARK and request_refill(concept, models, _generate_batch):
+        log("📚 TestAgent: Question bank running low, refilling in the background")
+
+    if test_data is None:
+        # Return a dictionary even on failure to prevent downstream KeyErrors
+        return {"question": f"What is {concept}?", "answer": f"A brief explanation of {concept}."}
+    return test_data
+
+
+@traced("TestAgent")
+def TestQuestions(concept: str, count: int, session: LearnerSession = None) -> list:
+    """
+    Returns up to `count` distinct active recall questions for a concept (e.g. for a quiz).
+    From the question bank, each is a separate unseen question; without the bank, they are
+    generated together in one call, never shared with other callers or cached.
+    """
+    if not BANK_DISABLED:
+        questions = [TestAgent(concept, session) for _ in range(count)]
+    else:
+        log(f"🧠 TestAgent: Generating {count} Active Recall Questions")
+        try:
+            questions = _generate_batch(concept, count)
+        except Exception as e:
+            log(f"⚠️ Error in TestAgent: {e}")
+            questions = []
+
+    distinct = {}
+    for item in questions:
+        if isinstance(item, dict) and item.get('question') and item.get('answer'):
+            distinct.setdefault(item['question'].strip(), {'question': item['question'], 'answer': item['answer']})
+    return list(distinct.values())[:count]
+
+
+def _generate_batch(concept: str, size: int = BATCH_SIZE) -> list:
+    """Generates `size` question/answer pairs across difficulty levels in one LLM call."""
+    prompt = (
+        f"Generate {size} different, simple, open-ended active recall questions about '{concept}', "
+        f"ranging in difficulty from {MIN_DIFFICULTY} (basic recall) to {MAX_DIFFICULTY} (applying the idea). "
+        f"For each question, provide the comprehensive expected answer (a few sentences) and its difficulty. "
+        f"Format the output strictly as a JSON array of objects with three keys: 'question', 'answer' and 'difficulty'."
+    )
+    response = generate_content(
+        model=DEFAULT_MODEL,
+        contents=prompt,
+        config={
+            "response_mime_type": "application/json",
+            "response_schema": {
+                "type": "ARRAY",
+                "minItems": size,
+                "maxItems": size,
+                "items": {
+                    "type": "OBJECT",
+                    "properties": {
+                        "question": {"type": "STRING", "description": "The active recall question."},
+                        "answer": {"type": "STRING", "description": "The detailed expected answer."},
+                        "difficulty": {"type": "INTEGER", "description": f"{MIN_DIFFICULTY} (easiest) to {MAX_DIFFICULTY}."}
+                    },
+                }
+            }
+        }
+    )
+    return json.loads(response.text)
+
+
+def _fill_bank(concept: str) -> int:
+    try:
+        items = _generate_batch(concept)
+        return get_question_bank().add(concept, served_model(), items)
+    except Exception as e:
+        log(f"⚠️ Error in TestAgent: {e}")
+        return 0
+
+
+def _generate_test(concept: str) -> dict:
     prompt = (
         f"Generate one simple, open-ended active recall question about '{concept}'. "
         f"Then, provide the comprehensive expected answer (a few sentences) for that question. "
@@ -37,27 +203,26 @@ def TestAgent(concept: str) -> dict:
     )
     
     try:
-        # Rely on genai.Client() to pick up the API key from the environment
-        client = genai.Client()
-        response = client.models.generate_content(
-            model='gemini-2.5-flash-preview-09-2025',
+        # Shared, pooled client (picks up the API key from the environment)
+        response = generate_content(
+            model=DEFAULT_MODEL,
             contents=prompt,
-            config=genai.types.GenerateContentConfig(
-                response_mime_type="application/json",
-                response_schema={
+            config={
+                "response_mime_type": "application/json",
+                "response_schema": {
                     "type": "OBJECT",
                     "properties": {
                         "question": {"type": "STRING", "description": "The active recall question."},
                         "answer": {"type": "STRING", "description": "The detailed expected answer."}
                     },
                 }
-            )
+            }
         )
         
         test_data = json.loads(response.text)
         return test_data
         
     except Exception as e:
-        print(f"Error in TestAgent: {e}")
+        log(f"⚠️ Error in TestAgent: {e}")
         # Return a dictionary even on failure to prevent downstream KeyErrors
         return {"question": f"What is {concept}?", "answer": f"A brief explanation of {concept}."}
\ No newline at end of file
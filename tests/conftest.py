@@ -0,0 +1,23 @@
+import os
+import sys
+import tempfile
+
+# Every backend points at the fake Gemini client and throwaway files before any module is imported
+_WORKDIR = tempfile.mkdtemp(prefix="eduindia-tests-")
+os.environ.update({
+    "EDUINDIA_FAKE_GEMINI": "1",
+    "FAKE_GEMINI_LATENCY": "0.01",
+    "FAKE_GEMINI_JITTER": "0",
+    "FAKE_GEMINI_ERROR_RATE": "0",
+    "GEMINI_RPM": "60000",
+    "GEMINI_BURST": "1000",
+    "EDUINDIA_STATE_BACKEND": "memory",
+    "EDUINDIA_CACHE_PATH": os.path.join(_WORKDIR, "cache.sqlite3"),
+    "EDUINDIA_QUESTION_BANK_PATH": os.path.join(_WORKDIR, "question_bank.sqlite3"),
+    "EDUINDIA_CONCEPT_INDEX_PATH": os.path.join(_WORKDIR, "concepts.sqlite3"),
+    "EDUINDIA_PLAN_PATH": os.path.join(_WORKDIR, "plans.sqlite3"),
+    "EDUINDIA_REVISION_LOG": os.path.join(_WORKDIR, "revision_log.jsonl"),
+})
+os.environ.pop("EDUINDIA_TRACE_PATH", None)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
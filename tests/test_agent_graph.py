@@ -0,0 +1,30 @@
+import time
+
+from utils.agent_graph import AGENT_WORKERS, AgentStep, run_agent_graph
+from utils.resilience import request_deadline
+
+
+def test_time_spent_queued_does_not_count_against_a_step_timeout():
+    # Four rounds of 0.2 s steps on the shared pool: the later rounds wait longer than the timeout
+    steps = [AgentStep(f"step_{i}", lambda: time.sleep(0.2) or "ok", timeout=0.5, fallback="timed out")
+             for i in range(AGENT_WORKERS * 4)]
+    results, failures = run_agent_graph(steps)
+    assert failures == {}
+    assert all(result == "ok" for result in results.values())
+
+
+def test_a_step_that_runs_too_long_still_times_out():
+    steps = [AgentStep("slow", lambda: time.sleep(1) or "ok", timeout=0.1, fallback="timed out")]
+    results, failures = run_agent_graph(steps)
+    assert results["slow"] == "timed out"
+    assert isinstance(failures["slow"], TimeoutError)
+
+
+def test_the_request_deadline_applies_to_queued_steps():
+    steps = [AgentStep(f"step_{i}", lambda: time.sleep(0.2) or "ok", timeout=5, fallback="timed out")
+             for i in range(AGENT_WORKERS * 4)]
+    start = time.monotonic()
+    with request_deadline(0.3):
+        results, failures = run_agent_graph(steps)
+    assert time.monotonic() - start < 0.6
+    assert failures and all(isinstance(error, TimeoutError) for error in failures.values())
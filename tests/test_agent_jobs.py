@@ -0,0 +1,23 @@
+import time
+
+from utils.agent_jobs import submit
+from utils.tracing import log, span
+
+
+def _wait(job, timeout=5.0):
+    end = time.monotonic() + timeout
+    while not job.wait(timeout=0.1):
+        assert time.monotonic() < end, "job did not finish"
+
+
+def test_workflow_that_runs_eagerly_is_traced():
+    def workflow():
+        # Like a non-streaming agent: all the work happens before the iterator is returned
+        with span("EagerAgent"):
+            log("EagerAgent: working")
+        return iter(["done"])
+
+    job = submit("eager-learner", "eager request", workflow)
+    _wait(job)
+    assert job.text == "done"
+    assert "EagerAgent" in job.log
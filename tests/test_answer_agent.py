@@ -0,0 +1,15 @@
+from specialized_agents.answer_agent import AnswerAgent
+from utils.state_manager import InMemoryStateStore, LearnerSession
+
+
+def test_grading_keeps_a_question_asked_in_the_meantime():
+    store = InMemoryStateStore()
+    session = LearnerSession(store, store.learner_keys()[0])
+    session.set_pending_answer("inflation", "A general rise in prices.")
+    pending_data = session.take_pending_answer()
+
+    # Another request asks a new question before this answer is graded
+    session.set_pending_answer("gdp", "The value of everything a country produces.")
+    AnswerAgent("I don't know", pending_data, session)
+
+    assert session.get_state()["pending_answer"]["concept"] == "gdp"
@@ -0,0 +1,57 @@
+import os
+import time
+
+from streamlit.testing.v1 import AppTest
+
+from utils.state_manager import get_state_store
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+
+
+def _ask(at, query):
+    at.chat_input[0].set_value(query).run()
+    for _ in range(50):
+        if "pending_job" not in at.session_state:
+            break
+        time.sleep(0.1)
+        at.run()
+    return at
+
+
+def test_greeting_is_not_spilled_into_history(monkeypatch):
+    monkeypatch.setenv("EDUINDIA_CHAT_WINDOW", "2")
+    at = AppTest.from_file(APP, default_timeout=60).run()
+    assert not at.exception
+    for query in ("study next", "study next", "study next"):
+        _ask(at, query)
+    assert not at.exception
+
+    learner_key = at.session_state["active_learner"]
+    spilled = get_state_store().load_messages(learner_key, 0, 100)
+    assert spilled
+    assert not any("I am EduIndia" in message["content"] for message in spilled)
+
+
+def test_switching_learners_keeps_the_previous_learners_response():
+    at = AppTest.from_file(APP, default_timeout=60).run()
+    learner_key = at.session_state["active_learner"]
+    history = get_state_store().count_messages(learner_key)
+
+    # Switch away right after asking, while the job is still pending
+    at.chat_input[0].set_value("study next").run()
+    assert "pending_job" in at.session_state
+    selector = next(box for box in at.selectbox if box.label.startswith("Select Active Learner"))
+    other = next(option for option in selector.options if option != learner_key)
+    selector.set_value(other).run()
+    for _ in range(50):
+        if not at.session_state["background_jobs"]:
+            break
+        time.sleep(0.1)
+        at.run()
+    assert not at.exception
+
+    assert get_state_store().count_messages(learner_key) == history + 2
+    recorded = get_state_store().load_messages(learner_key, 0, 2)
+    assert [message["role"] for message in recorded] == ["user", "assistant"]
+    assert recorded[0]["content"] == "study next"
+    assert recorded[1]["content"]
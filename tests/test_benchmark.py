@@ -0,0 +1,42 @@
+import benchmark
+from core_agents import root_orchestrator
+from utils.agent_graph import AgentStep, run_agent_graph
+from utils.tracing import span, trace_request
+
+
+def _fail(error):
+    raise error
+
+
+def test_graph_failures_and_failed_llm_calls_are_recorded_on_the_trace():
+    with trace_request("explain gdp") as trace:
+        run_agent_graph([AgentStep("core_explanation", lambda: _fail(RuntimeError("boom")), fallback="partial")])
+        try:
+            with span("SubjectAgent.llm", kind="llm"):
+                _fail(ConnectionError("reset"))
+        except ConnectionError:
+            pass
+    assert trace.failures == [("core_explanation", "boom"), ("SubjectAgent.llm", "reset")]
+
+
+def test_benchmark_counts_fallbacks_not_words_in_the_response(monkeypatch):
+    def fake_root_agent(query, session):
+        if query.startswith("explain"):
+            # A lesson with a failed step still renders, with the step's fallback text
+            results, _ = run_agent_graph([AgentStep("localized_analogy", lambda: _fail(TimeoutError("slow")),
+                                                    fallback="Could not generate the analogy.")])
+            return results["localized_analogy"]
+        if query.startswith("test me on"):
+            raise RuntimeError("crashed")
+        # Text about failures and errors is not itself a failure
+        return "Error correction failed loans: the textbook example."
+
+    monkeypatch.setattr(root_orchestrator, "RootAgent", fake_root_agent)
+    results = benchmark.run_benchmark(benchmark.parse_args(["--sessions", "1", "--rounds", "1"]))
+
+    assert results["totals"]["requests"] == 4
+    assert results["totals"]["errors"] == 2
+    assert results["totals"]["failed_steps"] == {"RootAgent": 1, "localized_analogy": 1}
+    assert results["commands"]["explain"]["errors"] == 1
+    assert results["commands"]["test me on"]["errors"] == 1
+    assert results["commands"]["study next"]["errors"] == 0
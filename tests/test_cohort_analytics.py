@@ -0,0 +1,93 @@
+import time
+
+import pytest
+
+from benchmark import TOPICS, synthetic_history, synthetic_profiles
+from utils.cohort_analytics import MASTERY_LEVELS, CohortAnalytics
+from utils.revision_history import as_record
+from utils.state_manager import InMemoryStateStore, LearnerSession, SQLiteStateStore
+
+LEARNERS = 60
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    profiles = synthetic_profiles(LEARNERS)
+    synthetic_history(profiles, seed=7, now=time.time())
+    if request.param == "memory":
+        return InMemoryStateStore(profiles)
+    return SQLiteStateStore(str(tmp_path / "state.sqlite3"), profiles=profiles)
+
+
+def _states(store) -> list:
+    return [store.get_state(key) for key in store.learner_keys()]
+
+
+def _mastery_by_location(states) -> dict:
+    expected = {}
+    for state in states:
+        expected.setdefault(state["location"], [0] * MASTERY_LEVELS)[state["mastery_score"]] += 1
+    return expected
+
+
+def _weak_concepts(states, min_graded: int) -> dict:
+    grades = {}
+    for state in states:
+        for concept, entry in state["revision_history"].items():
+            score = as_record(entry).get("last_score")
+            if score is not None:
+                grades.setdefault(concept, []).append(score)
+    return {concept: (round(sum(s) / len(s), 2), len(s)) for concept, s in grades.items() if len(s) >= min_graded}
+
+
+def test_queries_match_a_walk_over_every_profile(store):
+    analytics = CohortAnalytics(store)
+    states = _states(store)
+
+    distribution = analytics.mastery_distribution(group_by="location")
+    assert {location: counts for location, counts in distribution.items() if any(counts)} == _mastery_by_location(states)
+    weak = analytics.weak_concepts(min_graded=3, limit=len(TOPICS))["all"]
+    assert {concept: (mean, graded) for concept, mean, graded in weak} == _weak_concepts(states, 3)
+    assert [mean for _, mean, _ in weak] == sorted(mean for _, mean, _ in weak)
+    assert analytics.summary()["learners"] == LEARNERS
+    assert set(analytics.mastery_distribution(group_by=("location", "language"))) == {
+        (state["location"], state["language"]) for state in states
+    }
+    with pytest.raises(ValueError):
+        analytics.mastery_distribution(group_by="email")
+
+
+def test_refresh_reloads_only_changed_learners(store):
+    analytics = CohortAnalytics(store)
+    assert analytics.refresh(force=True) == LEARNERS
+    analytics.weak_concepts()
+    assert analytics.refresh(force=True) == 0
+
+    # Rewriting the same learners many times leaves stale entries, which get compacted
+    changed = store.learner_keys()[:LEARNERS // 2]
+    for round_index in range(4):
+        for learner_key in changed:
+            session = LearnerSession(store, learner_key)
+            session.update_state("new concept")
+            session.record_grade("new concept", round_index % 4)
+        assert analytics.refresh(force=True) == len(changed)
+
+    assert analytics.stats()["compactions"] > 0
+    states = _states(store)
+    weak = analytics.weak_concepts(min_graded=1, limit=len(TOPICS) + 1)["all"]
+    assert {concept: (mean, graded) for concept, mean, graded in weak} == _weak_concepts(states, 1)
+    assert analytics.summary() == CohortAnalytics(store).summary()
+
+
+def test_query_results_are_cached_until_a_refresh_changes_something(store):
+    analytics = CohortAnalytics(store)
+    first = analytics.concept_coverage()
+    assert analytics.concept_coverage() is first
+    assert analytics.stats()["cache_hits"] == 1
+
+    analytics.refresh(force=True)
+    assert analytics.concept_coverage() is first
+    LearnerSession(store, store.learner_keys()[0]).update_state("brand new concept")
+    analytics.refresh(force=True)
+    coverage = analytics.concept_coverage(limit=len(TOPICS) + 1)["all"]
+    assert ("brand new concept", 1) in coverage
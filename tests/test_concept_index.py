@@ -0,0 +1,36 @@
+import pytest
+
+from utils.concept_index import ConceptIndex
+
+
+@pytest.fixture
+def index(tmp_path):
+    return ConceptIndex(str(tmp_path / "concepts.sqlite3"))
+
+
+@pytest.mark.parametrize("topic", ["cloud", "water", "photo", "interest", "compound", "crop", "supply", "digital"])
+def test_whole_words_are_not_completed_to_seed_concepts(index, topic):
+    assert index.resolve(topic) == topic
+
+
+def test_spelling_variants_share_one_concept(index):
+    for text in ("Inflation?", "inflation ", "the inflation", "inflaton"):
+        assert index.resolve(text) == "inflation"
+    assert index.resolve("Gross Domestic Product!") == "gdp"
+
+
+def test_resolution_does_not_depend_on_registration_order(index):
+    assert index.resolve("cloud") == "cloud"
+    index.resolve("cloud storage")
+    assert index.resolve("cloud") == "cloud"
+    assert index.resolve("cloud storage") == "cloud storage"
+
+
+def test_longer_topics_stay_separate(index):
+    assert index.resolve("inflation in india") == "inflation in india"
+
+
+def test_complete_suggests_known_concepts(index):
+    assert set(index.complete("cloud")) == {"cloud computing"}
+    index.resolve("cloud")
+    assert set(index.complete("cloud")) == {"cloud", "cloud computing"}
@@ -0,0 +1,45 @@
+from collections import Counter
+
+from utils import fast_grader
+from utils.fast_grader import content_terms, pre_grade
+
+GDP = "GDP is the total market value of all final goods and services produced within a country in a year."
+
+def test_short_correct_paraphrase_goes_to_the_llm_grader():
+    assert pre_grade("national output", GDP) is None
+
+
+def test_dont_know_is_still_fast_failed():
+    assert pre_grade("I don't know", GDP)["score"] == 0
+    assert pre_grade("", GDP)["score"] == 0
+
+
+def test_verbatim_answer_is_still_fast_passed():
+    assert pre_grade(GDP, GDP)["score"] == 3
+
+
+def test_indic_words_keep_their_vowel_signs():
+    assert content_terms("ಬೆಲೆ ಏರಿಕೆ") == Counter({"ಬೆಲೆ": 1, "ಏರಿಕೆ": 1})
+    assert content_terms("महागाई म्हणजे किमती वाढणे।") == Counter(
+        {"महागाई": 1, "म्हणजे": 1, "किमती": 1, "वाढणे": 1}
+    )
+
+
+def test_kannada_and_marathi_answers_are_not_fast_failed():
+    assert pre_grade("ಬೆಲೆ ಏರಿಕೆ", "Inflation is a general rise in prices.") is None
+    assert pre_grade("बेलेची वाढ", "Inflation is a general rise in prices.") is None
+    expected = "महागाई म्हणजे वस्तूंच्या किमतींमध्ये सतत होणारी वाढ"
+    assert pre_grade(expected, expected)["score"] == 3
+
+
+def test_text_without_words_is_escalated_not_failed():
+    assert pre_grade("★ ☆", GDP) is None
+
+
+def test_common_terms_weigh_less_than_distinctive_ones():
+    for topic in ("money", "trade", "tax", "bank"):
+        pre_grade("unsure", f"The value of {topic} in the economy.")
+    expected = "The value of output in the economy."
+    assert pre_grade("output", expected) is None  # not verbatim, so still escalated
+    idf = fast_grader._weights(content_terms(expected))
+    assert idf["output"] > idf["value"]
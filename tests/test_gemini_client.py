@@ -0,0 +1,57 @@
+import threading
+
+import pytest
+
+from utils import gemini_client
+from utils.gemini_client import get_gemini_client, get_pool_stats
+
+
+@pytest.fixture
+def real_clients(monkeypatch):
+    """Builds real (offline) SDK clients in a fresh registry instead of the fake backend."""
+    monkeypatch.setattr(gemini_client, "FAKE_GEMINI_ENABLED", False)
+    monkeypatch.setattr(gemini_client, "_CLIENTS", {})
+    monkeypatch.setattr(gemini_client, "_HTTP_CLIENTS", {})
+    monkeypatch.setenv("GEMINI_API_KEY", "test-key-1")
+    yield gemini_client._HTTP_CLIENTS
+    for http_client in gemini_client._HTTP_CLIENTS.values():
+        http_client.close()
+
+
+def test_concurrent_callers_share_one_client_per_key(real_clients, monkeypatch):
+    created = get_pool_stats()["clients_created"]
+    clients = []
+    threads = [threading.Thread(target=lambda: clients.append(get_gemini_client())) for _ in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len({id(client) for client in clients}) == 1
+    assert get_pool_stats()["clients_created"] == created + 1
+    pool = real_clients["test-key-1"]._transport._pool
+    assert pool._max_connections == gemini_client.GEMINI_POOL_SIZE
+    assert pool._keepalive_expiry == gemini_client.GEMINI_KEEPALIVE_SECONDS
+
+    monkeypatch.setenv("GEMINI_API_KEY", "test-key-2")
+    assert get_gemini_client() is not clients[0]
+    assert get_pool_stats()["clients_created"] == created + 2
+
+
+def test_a_missing_api_key_raises_before_creating_a_client(real_clients, monkeypatch):
+    monkeypatch.delenv("GEMINI_API_KEY")
+    with pytest.raises(ValueError):
+        get_gemini_client()
+    assert real_clients == {}
+
+
+def test_agent_calls_reuse_the_shared_client():
+    from specialized_agents.subject_test import SubjectAgent
+    get_gemini_client()
+    before = get_pool_stats()
+    SubjectAgent("pooled client reuse")
+    SubjectAgent("pooled client reuse again")
+    after = get_pool_stats()
+    assert after["clients_created"] == before["clients_created"]
+    assert after["acquisitions"] >= before["acquisitions"] + 2
+    assert after["reuse_rate"] > 0
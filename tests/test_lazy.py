@@ -0,0 +1,58 @@
+import os
+import subprocess
+import sys
+
+from utils import lazy as lazy_module
+from utils.lazy import get_import_stats, lazy, warm_up
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _write_module(path, name: str, source: str):
+    (path / f"{name}.py").write_text(source)
+
+
+def test_an_agent_module_is_imported_on_first_call(tmp_path, monkeypatch):
+    monkeypatch.syspath_prepend(str(tmp_path))
+    _write_module(tmp_path, "lazy_test_agent", "def Agent(x):\n    return x * 2\n")
+    Agent = lazy("lazy_test_agent", "Agent")
+
+    assert "lazy_test_agent" not in sys.modules
+    assert Agent(21) == 42
+    assert "lazy_test_agent" in sys.modules
+    assert "lazy_test_agent" in get_import_stats()
+    assert "lazy_test_agent" in lazy_module._REGISTERED
+
+
+def test_warm_up_imports_modules_registered_while_warming(tmp_path, monkeypatch):
+    monkeypatch.syspath_prepend(str(tmp_path))
+    _write_module(tmp_path, "lazy_test_sdk", "")
+    _write_module(tmp_path, "lazy_test_client", "from utils.lazy import register\nregister('lazy_test_sdk')\n")
+    monkeypatch.setattr(lazy_module, "_REGISTERED", ["lazy_test_missing", "lazy_test_client"])
+    monkeypatch.setattr(lazy_module, "_WARMUP_THREAD", None)
+    monkeypatch.setattr(lazy_module, "WARMUP_ENABLED", True)
+
+    # A module that fails to import is skipped; it raises again on first real use
+    warm_up(background=False)
+    assert "lazy_test_client" in sys.modules
+    assert "lazy_test_sdk" in sys.modules
+    assert "lazy_test_missing" not in sys.modules
+
+
+def test_requests_that_never_reach_an_agent_do_not_import_the_agents():
+    probe = (
+        "import sys\n"
+        "from core_agents.root_orchestrator import RootAgent\n"
+        "from utils.state_manager import InMemoryStateStore, LearnerSession\n"
+        "store = InMemoryStateStore()\n"
+        "session = LearnerSession(store, store.learner_keys()[0])\n"
+        "RootAgent('hello', session)\n"
+        "print('before', sorted(m for m in sys.modules if m.startswith(('specialized_agents.', 'google.genai'))))\n"
+        "RootAgent('explain gdp', session)\n"
+        "print('after', 'specialized_agents.subject_test' in sys.modules)\n"
+    )
+    completed = subprocess.run([sys.executable, "-c", probe], cwd=PROJECT_ROOT, capture_output=True,
+                               text=True, check=True, env=dict(os.environ, EDUINDIA_WARMUP="0"))
+    # Agents log to stdout outside a trace, so pick out the probe's own lines
+    lines = [line for line in completed.stdout.splitlines() if line.startswith(("before ", "after "))]
+    assert lines == ["before []", "after True"]
@@ -0,0 +1,77 @@
+import json
+
+import pytest
+
+from utils.learner_profiles import provision
+from utils.state_manager import InMemoryStateStore, LearnerSession, SQLiteStateStore
+
+ROWS = [
+    {"key": "asha-01", "name": "Asha Rao", "location": "Pune, Maharashtra", "background": "Textiles",
+     "language": "Marathi", "mastery_score": "2"},
+    {"key": "ravi-01", "name": "Ravi Kumar", "location": "Pune, Maharashtra", "background": "Construction",
+     "language": "Hindi"},
+    {"key": "meena-01", "name": "Meena Das", "location": "Kochi, Kerala", "background": "Fisheries",
+     "language": "Malayalam", "mastery_score": "9"},
+    {"name": "No Location", "background": "Textiles", "language": "Hindi"},
+    {"key": "bad-mastery", "name": "Bad Mastery", "location": "Kochi, Kerala", "background": "Fisheries",
+     "language": "Malayalam", "mastery_score": "high"},
+]
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return InMemoryStateStore({})
+    return SQLiteStateStore(str(tmp_path / "state.sqlite3"), profiles={})
+
+
+def _write_jsonl(path, rows):
+    path.write_text("\n".join(json.dumps(row) for row in rows) + "\nnot json\n")
+    return str(path)
+
+
+def _write_csv(path, rows):
+    fields = ["key", "name", "location", "background", "language", "mastery_score"]
+    lines = [",".join(fields)] + [",".join(f'"{row.get(field, "")}"' for field in fields) for row in rows]
+    path.write_text("\n".join(lines) + "\n")
+    return str(path)
+
+
+def test_provisioning_adds_valid_learners_and_keeps_existing_ones(store, tmp_path):
+    counts = provision(store, _write_jsonl(tmp_path / "learners.jsonl", ROWS), batch_size=2)
+    assert counts == {"added": 3, "existing": 0, "invalid": 3}
+    assert store.learner_keys() == ["asha-01", "ravi-01", "meena-01"]
+
+    state = store.get_state("meena-01")
+    assert state["mastery_score"] == 5
+    assert state["revision_history"] == {} and state["pending_answer"] is None
+    assert store.get_state("ravi-01")["mastery_score"] == 1
+
+    # A learner who has started learning keeps their progress when the file is provisioned again
+    LearnerSession(store, "asha-01").update_state("inflation")
+    counts = provision(store, _write_csv(tmp_path / "learners.csv", ROWS[:3]))
+    assert counts == {"added": 0, "existing": 3, "invalid": 0}
+    assert "inflation" in store.get_state("asha-01")["revision_history"]
+
+
+def test_the_directory_finds_learners_by_field_and_name(store, tmp_path):
+    provision(store, _write_jsonl(tmp_path / "learners.jsonl", ROWS))
+    directory = store.directory
+
+    assert directory.find(location="Pune, Maharashtra") == ["asha-01", "ravi-01"]
+    assert directory.find(location="Pune, Maharashtra", language="Hindi") == ["ravi-01"]
+    assert directory.find("meena") == ["meena-01"]
+    assert directory.find("KUMAR", location="Pune, Maharashtra") == ["ravi-01"]
+    assert directory.find(location="Pune, Maharashtra", limit=1) == ["asha-01"]
+    assert directory.find(location="Surat, Gujarat") == []
+    assert directory.values("location") == {"Kochi, Kerala": 1, "Pune, Maharashtra": 2}
+    with pytest.raises(ValueError):
+        directory.find(name="Asha Rao")
+
+
+def test_learners_added_through_another_connection_appear_in_the_directory(tmp_path):
+    path = str(tmp_path / "state.sqlite3")
+    reader = SQLiteStateStore(path, profiles={})
+    assert reader.learner_keys() == []
+    provision(SQLiteStateStore(path, profiles={}), _write_jsonl(tmp_path / "learners.jsonl", ROWS))
+    assert reader.learner_keys() == ["asha-01", "ravi-01", "meena-01"]
@@ -0,0 +1,82 @@
+import json
+
+from core_agents import root_orchestrator
+from core_agents.root_orchestrator import RootAgent
+from specialized_agents import lesson_agent
+from specialized_agents.lesson_agent import LessonAgent
+from utils.fake_gemini import FakeResponse
+from utils.model_router import cache_models
+from utils.question_bank import get_question_bank
+from utils.state_manager import InMemoryStateStore, LearnerSession
+from utils.tracing import trace_request
+
+
+def test_repeat_fused_lesson_is_served_from_the_caches(monkeypatch):
+    calls = []
+    generate = lesson_agent.generate_content
+    monkeypatch.setattr(lesson_agent, "generate_content", lambda **kwargs: calls.append(1) or generate(**kwargs))
+    store = InMemoryStateStore()
+    first = LearnerSession(store, store.learner_keys()[0])
+    second = LearnerSession(store, store.learner_keys()[1])
+
+    lesson = LessonAgent("volcanoes", first)
+    assert len(calls) == 1
+    assert get_question_bank().count("volcanoes", cache_models("TestAgent")) == 1
+
+    # Another learner with the same profile fields gets the same lesson without a new call
+    store.update(second.learner_key, lambda state: state.update(
+        {field: first.get_state()[field] for field in ("background", "location", "language")}
+    ))
+    repeat = LessonAgent("volcanoes", second)
+    assert len(calls) == 1
+    assert repeat["core_explanation"] == lesson["core_explanation"]
+    assert repeat["localized_analogy"] == lesson["localized_analogy"]
+    assert repeat["question"] == lesson["question"]
+
+
+def test_fused_question_counts_as_asked():
+    store = InMemoryStateStore()
+    session = LearnerSession(store, store.learner_keys()[0])
+    LessonAgent("glaciation", session)
+
+    bank = get_question_bank()
+    repeats = bank.stats["repeats"]
+    bank.take("glaciation", cache_models("TestAgent"), session.learner_key, 3)
+    assert bank.stats["repeats"] == repeats + 1
+
+
+def test_lesson_responses_must_match_the_schema():
+    lesson = {"core_explanation": " Core. ", "localized_analogy": "Analogy.", "question": "Why?", "answer": "Because."}
+    assert lesson_agent._parse_lesson(json.dumps(lesson))["core_explanation"] == "Core."
+    assert lesson_agent._parse_lesson(json.dumps(dict(lesson, answer=" "))) is None
+    assert lesson_agent._parse_lesson(json.dumps({"core_explanation": "Core."})) is None
+    assert lesson_agent._parse_lesson("not json") is None
+    assert lesson_agent._parse_lesson("[]") is None
+
+
+def test_fused_mode_makes_one_call_per_lesson(monkeypatch):
+    monkeypatch.setattr(root_orchestrator, "LESSON_MODE", "fused")
+    store = InMemoryStateStore()
+    session = LearnerSession(store, store.learner_keys()[0])
+    with trace_request("explain monsoon winds") as trace:
+        lesson = RootAgent("explain monsoon winds", session)
+
+    llm_calls = [s.name for s in trace.spans if s.kind == "llm"]
+    assert llm_calls == ["LessonAgent LLM call"]
+    assert "**Localized Analogy (from Content Generator Agent):**" in lesson
+    assert session.get_state()["pending_answer"]["concept"] == "monsoon winds"
+
+
+def test_a_response_that_does_not_match_falls_back_to_the_agents(monkeypatch):
+    monkeypatch.setattr(root_orchestrator, "LESSON_MODE", "fused")
+    monkeypatch.setattr(lesson_agent, "generate_content",
+                        lambda **kwargs: FakeResponse(json.dumps({"core_explanation": "Only one field."})))
+    store = InMemoryStateStore()
+    session = LearnerSession(store, store.learner_keys()[0])
+    with trace_request("explain sand dunes") as trace:
+        lesson = RootAgent("explain sand dunes", session)
+
+    assert "Only one field." not in lesson
+    assert {"SubjectAgent", "ContentGeneratorAgent", "TestAgent"} <= {s.name for s in trace.spans}
+    assert "falling back to the multi-agent path" in trace.format_log()
+    assert session.get_state()["pending_answer"]["concept"] == "sand dunes"
@@ -0,0 +1,40 @@
+import pytest
+
+from utils import model_router
+from utils.model_router import HEAVY, LIGHT, STANDARD, choose_tier, record_call
+
+
+@pytest.fixture(autouse=True)
+def fresh_router(monkeypatch):
+    monkeypatch.setattr(model_router, "_LATENCY", {})
+    monkeypatch.setattr(model_router, "_STATS", dict.fromkeys(model_router._STATS, 0))
+    monkeypatch.setattr(model_router, "PROBE_INTERVAL", 1000)
+
+
+@pytest.fixture
+def advanced_learner():
+    token = model_router._MASTERY.set(model_router.ADVANCED_MASTERY)
+    yield
+    model_router._MASTERY.reset(token)
+
+
+def test_slow_lessons_do_not_slow_down_grading_on_the_same_tier():
+    budget_ms = model_router.AGENT_POLICIES["AnswerAgent"][1] * 1000
+    for _ in range(model_router.MIN_SAMPLES + 2):
+        record_call(LIGHT, "SubjectAgent", budget_ms * 3, True)
+        record_call(LIGHT, "AnswerAgent", budget_ms / 10, True)
+    assert choose_tier("AnswerAgent") == LIGHT
+
+
+def test_upgrade_undone_by_latency_is_not_counted(advanced_learner):
+    budget_ms = model_router.AGENT_POLICIES["SubjectAgent"][1] * 1000
+    for _ in range(model_router.MIN_SAMPLES):
+        record_call(HEAVY, "SubjectAgent", budget_ms * 2, True)
+    assert choose_tier("SubjectAgent") == STANDARD
+    assert model_router._STATS["mastery_upgrades"] == 0
+    assert model_router._STATS["latency_downgrades"] == 1
+
+
+def test_upgrade_that_is_kept_is_counted(advanced_learner):
+    assert choose_tier("SubjectAgent") == HEAVY
+    assert model_router._STATS["mastery_upgrades"] == 1
@@ -0,0 +1,56 @@
+import time
+
+from core_agents.root_orchestrator import _prefetch_next_lesson
+from specialized_agents.content_generator import _localization_inputs
+from utils import model_router, prefetch, resilience
+from utils.model_router import ADVANCED_MASTERY, HEAVY, cache_models, learner_routing
+from utils.prefetch import PrefetchTask, get_prefetch_stats
+from utils.resilience import TokenBucket
+from utils.response_cache import get_cached
+from utils.state_manager import InMemoryStateStore, LearnerSession
+
+
+def test_budget_is_charged_per_llm_call(monkeypatch):
+    monkeypatch.setattr(prefetch, "_BUDGET", TokenBucket(rate=0.001, capacity=3))
+    task = PrefetchTask("learner", "lesson")
+    assert task.spend(2)
+    # One unit left: a second two-call prefetch must not start
+    assert not task.spend(2)
+    assert task.spend()
+
+
+def test_prefetch_leaves_the_quota_floor_to_learners(monkeypatch):
+    monkeypatch.setattr(prefetch, "_BUDGET", TokenBucket(rate=100, capacity=100))
+    monkeypatch.setattr(prefetch, "PREFETCH_QUOTA_FLOOR", 5)
+    monkeypatch.setattr(resilience, "_BUCKET", TokenBucket(rate=0.001, capacity=6))
+    task = PrefetchTask("learner", "lesson")
+    skipped = get_prefetch_stats()["quota_floor"]
+
+    assert not task.spend(2)
+    assert get_prefetch_stats()["quota_floor"] == skipped + 1
+    assert task.spend(1)
+    # The prefetch budget was charged, but the shared quota is untouched until the calls run
+    assert resilience._BUCKET.available() >= 6 - 1e-3
+
+
+def test_prefetched_lesson_is_served_to_an_advanced_learner(monkeypatch):
+    monkeypatch.setattr(prefetch, "_BUDGET", TokenBucket(rate=100, capacity=100))
+    monkeypatch.setitem(model_router.TIER_MODELS, HEAVY, "gemini-heavy-test")
+    store = InMemoryStateStore()
+    session = LearnerSession(store, store.learner_keys()[0])
+    store.update(session.learner_key, lambda state: state.update(mastery_score=ADVANCED_MASTERY))
+    session.update_state("monsoon")
+    session.update_state("rainfall")
+
+    assert prefetch.prefetch(session.learner_key, "lesson", _prefetch_next_lesson, "rainfall", session)
+    for _ in range(200):
+        if (session.learner_key, "lesson") in prefetch._RESULTS:
+            break
+        time.sleep(0.05)
+
+    with learner_routing(session):
+        assert cache_models("SubjectAgent") == ["gemini-heavy-test"]
+        explanation = get_cached("SubjectAgent", cache_models("SubjectAgent"), "monsoon")
+        assert explanation is not None
+        cache_inputs, _ = _localization_inputs(explanation, session)
+        assert get_cached("ContentGeneratorAgent", cache_models("ContentGeneratorAgent"), *cache_inputs) is not None
@@ -0,0 +1,79 @@
+import time
+
+from specialized_agents.subject_test import TestAgent, _generate_batch
+from utils import model_router
+from utils.model_router import ADVANCED_MASTERY, DEFAULT_MODEL, HEAVY, LIGHT, STANDARD, cache_models, mastery_routing
+from utils.question_bank import (BATCH_SIZE, QuestionBank, get_question_bank, get_question_bank_stats,
+                                 request_refill)
+from utils.state_manager import InMemoryStateStore, LearnerSession
+from utils.tracing import trace_request
+
+
+def _session():
+    store = InMemoryStateStore()
+    return LearnerSession(store, store.learner_keys()[0])
+
+
+def test_questions_are_banked_under_the_model_that_wrote_them(monkeypatch):
+    monkeypatch.setitem(model_router.TIER_MODELS, LIGHT, "gemini-lite-test")
+    TestAgent("tides", _session())
+
+    bank = get_question_bank()
+    assert bank.count("tides", "gemini-lite-test") > 0
+    assert bank.count("tides", DEFAULT_MODEL) == 0
+
+
+def test_questions_from_a_retired_model_are_not_served(monkeypatch):
+    bank = get_question_bank()
+    bank.add("erosion", "retired-model", [{"question": "Retired question?", "answer": "Old.", "difficulty": 3}])
+
+    question = TestAgent("erosion", _session())
+
+    assert question["question"] != "Retired question?"
+    assert bank.count("erosion", model_router.cache_models("TestAgent")) > 0
+
+
+def test_refill_is_routed_by_the_requesting_learner(monkeypatch):
+    monkeypatch.setitem(model_router.TIER_MODELS, STANDARD, "gemini-standard-test")
+    monkeypatch.setitem(model_router.TIER_MODELS, HEAVY, "gemini-standard-test")
+    with mastery_routing(ADVANCED_MASTERY):
+        models = cache_models("QuestionBankRefill")
+        assert request_refill("glaciers", models, _generate_batch)
+
+    for _ in range(200):
+        if not get_question_bank_stats()["pending_refills"]:
+            break
+        time.sleep(0.05)
+    assert get_question_bank().count("glaciers", "gemini-standard-test") > 0
+
+
+def test_learners_get_unseen_questions_closest_to_their_level(tmp_path):
+    bank = QuestionBank(str(tmp_path / "bank.sqlite3"))
+    items = [{"question": f"Question {d}?", "answer": f"Answer {d}.", "difficulty": d} for d in (1, 2, 5)]
+    assert bank.add("Photosynthesis ", "model-a", items) == 3
+    assert bank.add("photosynthesis", "model-a", items) == 0
+    assert bank.count("photosynthesis", ["model-a", "model-b"]) == 3
+
+    served = [bank.take("photosynthesis", "model-a", "asha", 4) for _ in range(3)]
+    assert [item["difficulty"] for item, _ in served] == [5, 2, 1]
+    assert [unseen for _, unseen in served] == [2, 1, 0]
+    assert bank.stats["repeats"] == 0
+
+    # Once every question has been asked, the least recently served one comes back
+    item, unseen = bank.take("photosynthesis", "model-a", "asha", 4)
+    assert item["difficulty"] == 5 and unseen == 0
+    assert bank.stats["repeats"] == 1
+    # Other learners, models and concepts are tracked separately
+    assert bank.take("photosynthesis", "model-a", "ravi", 4)[1] == 2
+    assert bank.take("photosynthesis", "model-b", "asha", 4) == (None, 0)
+
+
+def test_tests_are_served_from_one_batch_call():
+    session = _session()
+    with trace_request("test me on lagoons") as trace:
+        questions = [TestAgent("lagoons", session)["question"] for _ in range(BATCH_SIZE)]
+
+    assert [s.name for s in trace.spans if s.kind == "llm"] == ["TestAgent LLM call"]
+    assert len(set(questions)) == BATCH_SIZE
+    # Running low queued a refill for the next batch
+    assert "refilling in the background" in trace.format_log()
@@ -0,0 +1,17 @@
+import specialized_agents.subject_test as subject_test
+from core_agents.root_orchestrator import QUIZ_SIZE, RootAgent
+from utils.state_manager import InMemoryStateStore, LearnerSession
+
+
+def test_quiz_questions_are_distinct_without_the_question_bank(monkeypatch):
+    monkeypatch.setattr(subject_test, "BANK_DISABLED", True)
+    store = InMemoryStateStore()
+    session = LearnerSession(store, store.learner_keys()[0])
+
+    RootAgent("quiz me on photosynthesis", session)
+
+    quiz = session.get_state()["pending_quiz"]
+    questions = [item["question"] for item in quiz["questions"]]
+    assert len(questions) == QUIZ_SIZE
+    assert len(set(questions)) == QUIZ_SIZE
+    assert all(item["concept"] == "photosynthesis" for item in quiz["questions"])
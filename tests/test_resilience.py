@@ -0,0 +1,37 @@
+import time
+
+import pytest
+
+from utils import resilience
+from utils.resilience import CircuitBreaker, DeadlineExceeded, call_with_resilience, request_deadline
+
+
+@pytest.fixture
+def half_open_breaker(monkeypatch):
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=0.01)
+    breaker.record_failure()
+    time.sleep(0.02)
+    assert breaker.state == "half-open"
+    monkeypatch.setattr(resilience, "_BREAKER", breaker)
+    return breaker
+
+
+def test_trial_that_misses_its_deadline_releases_the_slot(half_open_breaker):
+    with request_deadline(0):
+        with pytest.raises(DeadlineExceeded):
+            call_with_resilience(lambda timeout: "never called")
+
+    # The next call is let through as the trial and closes the breaker
+    assert call_with_resilience(lambda timeout: "ok") == "ok"
+    assert half_open_breaker.state == "closed"
+
+
+def test_trial_that_times_out_on_the_rate_limit_releases_the_slot(half_open_breaker, monkeypatch):
+    monkeypatch.setattr(resilience, "_BUCKET", resilience.TokenBucket(rate=0.001, capacity=0))
+    with request_deadline(0.05):
+        with pytest.raises(DeadlineExceeded):
+            call_with_resilience(lambda timeout: "never called")
+
+    monkeypatch.setattr(resilience, "_BUCKET", resilience.TokenBucket(rate=100, capacity=10))
+    assert call_with_resilience(lambda timeout: "ok") == "ok"
+    assert half_open_breaker.state == "closed"
@@ -0,0 +1,32 @@
+import pytest
+
+from specialized_agents.subject_test import SubjectAgent
+from utils import model_router
+from utils.model_router import DEFAULT_MODEL, HEAVY, LIGHT, STANDARD, cache_models
+from utils.response_cache import get_cached, put_cached
+
+HEAVY_MODEL = "gemini-heavy-test"
+
+
+@pytest.fixture
+def heavy_tier(monkeypatch):
+    monkeypatch.setitem(model_router.TIER_MODELS, HEAVY, HEAVY_MODEL)
+
+
+def test_lesson_is_cached_under_the_model_that_served_it(heavy_tier, monkeypatch):
+    monkeypatch.setitem(model_router.AGENT_POLICIES, "SubjectAgent", (HEAVY, 20.0))
+    explanation = SubjectAgent("cached under heavy")
+
+    assert get_cached("SubjectAgent", HEAVY_MODEL, "cached under heavy") == explanation
+    assert get_cached("SubjectAgent", DEFAULT_MODEL, "cached under heavy") is None
+    assert get_cached("SubjectAgent", cache_models("SubjectAgent"), "cached under heavy") == explanation
+
+
+def test_lookups_accept_heavier_models_but_not_lighter_ones(heavy_tier):
+    assert cache_models("SubjectAgent") == [model_router.TIER_MODELS[STANDARD], HEAVY_MODEL]
+
+    put_cached("SubjectAgent", model_router.TIER_MODELS[LIGHT], "light answer", "downgraded")
+    assert get_cached("SubjectAgent", cache_models("SubjectAgent"), "downgraded") is None
+
+    put_cached("SubjectAgent", HEAVY_MODEL, "heavy answer", "upgraded")
+    assert get_cached("SubjectAgent", cache_models("SubjectAgent"), "upgraded") == "heavy answer"
@@ -0,0 +1,46 @@
+from utils import revision_history
+from utils.revision_history import (RECENT_REVIEWS, append_event, as_record, first_studied, last_studied,
+                                    read_events, recent_reviews, record_review, study_count)
+
+
+def test_recent_reviews_are_a_bounded_ring_buffer():
+    history = {}
+    total = RECENT_REVIEWS * 2 + 3
+    for timestamp in range(1, total + 1):
+        record_review(history, "gdp", float(timestamp))
+
+    record = history["gdp"]
+    assert len(record["recent"]) == RECENT_REVIEWS
+    assert recent_reviews(record) == [float(t) for t in range(total - RECENT_REVIEWS + 1, total + 1)]
+    assert study_count(record) == total
+    assert first_studied(record) == 1.0
+    assert last_studied(record) == float(total)
+    # The record keeps the same fields and buffer size however often the concept is studied
+    for timestamp in range(total + 1, total + 100):
+        record_review(history, "gdp", float(timestamp))
+    assert set(history["gdp"]) == {"count", "first", "last", "recent", "head"}
+    assert len(history["gdp"]["recent"]) == RECENT_REVIEWS
+
+
+def test_legacy_timestamp_lists_are_converted():
+    legacy = [float(t) for t in range(1, RECENT_REVIEWS + 4)]
+    record = as_record(legacy)
+    assert record["count"] == len(legacy)
+    assert record["first"] == 1.0 and record["last"] == legacy[-1]
+    assert recent_reviews(record) == legacy[-RECENT_REVIEWS:]
+
+    history = {"gdp": legacy}
+    record_review(history, "gdp", 100.0)
+    assert study_count(history["gdp"]) == len(legacy) + 1
+    assert recent_reviews(history["gdp"])[-1] == 100.0
+
+
+def test_full_history_goes_to_the_event_log(tmp_path, monkeypatch):
+    path = tmp_path / "revisions.jsonl"
+    monkeypatch.setattr(revision_history, "REVISION_LOG_PATH", str(path))
+    append_event("asha", "gdp", 1.0)
+    append_event("ravi", "gdp", 2.0)
+    append_event("asha", "inflation", 3.0, event="grade")
+
+    assert [e["concept"] for e in read_events("asha")] == ["gdp", "inflation"]
+    assert len(list(read_events())) == 3
@@ -0,0 +1,59 @@
+import threading
+import time
+import uuid
+
+import pytest
+
+import specialized_agents.subject_test as subject_test
+from utils.single_flight import SingleFlight
+
+
+def test_concurrent_streamed_lessons_share_one_call(monkeypatch):
+    calls = []
+    real_stream = subject_test.generate_content_stream
+
+    def counting_stream(**kwargs):
+        calls.append(kwargs)
+        time.sleep(0.2)  # long enough for every learner to arrive while the call is in flight
+        return real_stream(**kwargs)
+
+    monkeypatch.setattr(subject_test, "generate_content_stream", counting_stream)
+    concept = f"coalescing {uuid.uuid4().hex}"
+    learners = 10
+    start = threading.Barrier(learners)
+    texts = [None] * learners
+
+    def lesson(index):
+        start.wait()
+        texts[index] = "".join(subject_test.SubjectAgentStream(concept))
+
+    threads = [threading.Thread(target=lesson, args=(i,)) for i in range(learners)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+
+    assert len(calls) == 1
+    assert texts[0] and not texts[0].startswith("Error")
+    assert all(text == texts[0] for text in texts)
+
+
+def test_followers_replay_chunks_and_see_the_leaders_error():
+    flight = SingleFlight("test")
+    release = threading.Event()
+
+    def failing_stream():
+        yield "a"
+        release.wait(5)
+        raise ConnectionError("backend went away")
+
+    leader = flight.stream("key", failing_stream)
+    assert next(leader) == "a"
+    follower = flight.stream("key", lambda: iter(["never used"]))
+    assert next(follower) == "a"
+    release.set()
+    with pytest.raises(ConnectionError):
+        list(leader)
+    with pytest.raises(ConnectionError):
+        list(follower)
+    assert flight.stats()["collapsed"] == 1
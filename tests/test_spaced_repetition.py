@@ -0,0 +1,32 @@
+from utils.spaced_repetition import get_due_queue
+from utils.state_manager import LearnerSession, SQLiteStateStore
+
+
+def _sessions(tmp_path):
+    path = str(tmp_path / "state.sqlite3")
+    first, second = SQLiteStateStore(path), SQLiteStateStore(path)
+    learner_key = first.learner_keys()[0]
+    return LearnerSession(first, learner_key), LearnerSession(second, learner_key)
+
+
+def test_due_queue_sees_grades_saved_through_another_store(tmp_path):
+    here, elsewhere = _sessions(tmp_path)
+    here.update_state("rivers")
+    here.update_state("mountains")
+    assert get_due_queue(here).peek()[1] == "rivers"
+
+    # Another process grades "rivers", pushing it back; the number of concepts is unchanged
+    elsewhere.record_grade("rivers", 3)
+
+    assert get_due_queue(here).peek()[1] == "mountains"
+
+
+def test_due_queue_is_updated_in_place_by_its_own_store(tmp_path):
+    here, _ = _sessions(tmp_path)
+    here.update_state("rivers")
+    queue = get_due_queue(here)
+
+    here.update_state("mountains")
+
+    assert get_due_queue(here) is queue
+    assert [concept for _, concept in queue.top_k(2)] == ["rivers", "mountains"]
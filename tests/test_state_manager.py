@@ -0,0 +1,68 @@
+import threading
+import time
+
+import pytest
+
+from utils.state_manager import InMemoryStateStore, SQLiteStateStore
+
+THREADS = 8
+UPDATES = 25
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def stores(request, tmp_path):
+    """Two handles on one learner store: the same object in memory, two connections' worth of SQLite."""
+    if request.param == "memory":
+        store = InMemoryStateStore()
+        return store, store
+    path = str(tmp_path / "state.sqlite3")
+    return SQLiteStateStore(path), SQLiteStateStore(path)
+
+
+def _run_threads(targets):
+    threads = [threading.Thread(target=target) for target in targets]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def test_concurrent_updates_are_not_lost(stores):
+    learner_key = stores[0].learner_keys()[0]
+    stores[0].update(learner_key, lambda state: state.update(counter=0))
+
+    def bump(state):
+        counter = state["counter"]
+        time.sleep(0.001)  # widen the read-modify-write window
+        state["counter"] = counter + 1
+
+    def increment(store):
+        for _ in range(UPDATES):
+            store.update(learner_key, bump)
+
+    _run_threads([lambda store=stores[i % 2]: increment(store) for i in range(THREADS)])
+
+    assert stores[0].get_state(learner_key)["counter"] == THREADS * UPDATES
+    assert stores[1].get_state(learner_key)["counter"] == THREADS * UPDATES
+
+
+def test_pending_answer_is_taken_exactly_once(stores, monkeypatch):
+    learner_key = stores[0].learner_keys()[0]
+    stores[0].set_pending_answer(learner_key, "inflation", "A general rise in prices.")
+    for store in set(stores):
+        def slow_load(key, load=store._load_versioned):
+            state = load(key)
+            time.sleep(0.005)  # widen the read-modify-write window
+            return state
+        monkeypatch.setattr(store, "_load_versioned", slow_load)
+    taken = []
+    start = threading.Barrier(THREADS)
+
+    def take(store):
+        start.wait()
+        taken.append(store.take_pending_answer(learner_key))
+
+    _run_threads([lambda store=stores[i % 2]: take(store) for i in range(THREADS)])
+
+    assert [item["concept"] for item in taken if item is not None] == ["inflation"]
+    assert stores[1].get_state(learner_key)["pending_answer"] is None
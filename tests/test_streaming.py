@@ -0,0 +1,38 @@
+from core_agents.root_orchestrator import RootAgent, RootAgentStream
+from utils.fake_gemini import FAKE_STREAM_CHUNKS
+from utils.state_manager import InMemoryStateStore, LearnerSession
+
+
+def _session():
+    store = InMemoryStateStore()
+    return LearnerSession(store, store.learner_keys()[0])
+
+
+def test_a_lesson_streams_in_chunks_and_updates_state():
+    session = _session()
+    stream = RootAgentStream("explain tectonic plates", session)
+
+    # The header is shown before any agent has produced text
+    assert next(stream).startswith("**Subject: Tectonic Plates**")
+    chunks = list(stream)
+    lesson = "".join(chunks)
+
+    # Subject and Content Generator output arrive as separate streamed chunks
+    assert len(chunks) > 2 * FAKE_STREAM_CHUNKS
+    assert "**Localized Analogy (from Content Generator Agent):**" in lesson
+    assert "--- Active Recall Check ---" in lesson
+    state = session.get_state()
+    assert state["pending_answer"]["concept"] == "tectonic plates"
+    assert "tectonic plates" in state["revision_history"]
+
+
+def test_other_requests_are_yielded_as_one_chunk():
+    session = _session()
+    session.set_pending_answer("inflation", "A general rise in prices.")
+    chunks = list(RootAgentStream("explain photosynthesis", session))
+    assert len(chunks) == 1
+    # The answer was graded rather than a new lesson started
+    assert session.get_state()["pending_answer"] is None
+    assert "photosynthesis" not in session.get_state()["revision_history"]
+
+    assert list(RootAgentStream("hello", _session())) == [RootAgent("hello", _session())]
@@ -0,0 +1,75 @@
+import json
+import threading
+
+from utils import tracing
+from utils.agent_graph import AgentStep, run_agent_graph
+from utils.tracing import _percentile, latency_summary, log, span, trace_request, traced
+
+
+def test_percentiles_use_the_nearest_rank():
+    values = list(range(1, 101))
+    assert _percentile(values, 50) == 50
+    assert _percentile(values, 95) == 95
+    assert _percentile([7], 95) == 7
+    assert _percentile([1, 2, 3, 4], 50) == 2
+
+
+def test_latency_summary_reports_recent_span_durations():
+    for _ in range(20):
+        with span("tracing test span"):
+            pass
+    summary = latency_summary()["tracing test span"]
+    assert summary["count"] == 20
+    assert 0 <= summary["p50_ms"] <= summary["p95_ms"]
+
+
+def test_steps_on_the_worker_pool_record_into_the_callers_trace():
+    @traced("ChildAgent")
+    def child():
+        log("child ran")
+        return "ok"
+
+    with trace_request("explain gdp") as trace:
+        with span("RootAgent") as root:
+            run_agent_graph([AgentStep("a", child), AgentStep("b", child)])
+
+    children = [s for s in trace.spans if s.name == "ChildAgent"]
+    assert len(children) == 2
+    assert all(s.parent_id == root.span_id and s.depth == 1 for s in children)
+    assert all(s.messages == ["child ran"] for s in children)
+    assert "  ▶ ChildAgent" in trace.format_log()
+
+
+def test_concurrent_requests_keep_separate_traces():
+    traces = {}
+    barrier = threading.Barrier(2)
+
+    def handle(request):
+        with trace_request(request) as trace:
+            with span("RootAgent"):
+                barrier.wait()
+                log(request)
+        traces[request] = trace
+
+    threads = [threading.Thread(target=handle, args=(request,)) for request in ("first", "second")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for request, trace in traces.items():
+        assert [s.messages for s in trace.spans] == [[request]]
+
+
+def test_finished_traces_are_exported_as_json_lines(tmp_path, monkeypatch):
+    path = tmp_path / "traces.jsonl"
+    monkeypatch.setattr(tracing, "TRACE_EXPORT_PATH", str(path))
+    with trace_request("explain gdp") as trace:
+        with span("RootAgent"):
+            with span("SubjectAgent LLM call", kind="llm", model="gemini-2.5-flash"):
+                pass
+
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [r["name"] for r in records] == ["RootAgent", "SubjectAgent LLM call"]
+    assert {r["trace_id"] for r in records} == {trace.trace_id}
+    assert records[1]["parent_id"] == records[0]["span_id"]
+    assert records[1]["attributes"]["model"] == "gemini-2.5-flash"
@@ -0,0 +1,168 @@
+import contextvars
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from utils.resilience import remaining_time
+from utils.tracing import record_failure
+
+# --- Shared worker pool for agent steps ---
+# Agent steps are network-bound (Gemini round trips), so threads are enough.
+# The pool is process-wide so concurrent lessons share a bounded number of workers.
+AGENT_WORKERS = int(os.getenv("EDUINDIA_AGENT_WORKERS", "8"))
+DEFAULT_STEP_TIMEOUT = float(os.getenv("EDUINDIA_STEP_TIMEOUT", "60"))
+
+_EXECUTOR = ThreadPoolExecutor(max_workers=AGENT_WORKERS, thread_name_prefix="agent-step")
+
+
+def _submit(func, *args):
+    # Run in a copy of the caller's context so the request's trace follows the step
+    return _EXECUTOR.submit(contextvars.copy_context().run, func, *args)
+
+
+class AgentStep:
+    """A single node in an agent workflow graph.
+
+    `func` is called with the results of `depends_on` (in order) as positional
+    arguments. If the step fails, times out or one of its dependencies fails,
+    `fallback` is used as its result instead (called with the error if callable).
+    """
+
+    def __init__(self, name: str, func, depends_on=(), timeout: float = None, fallback=None):
+        self.name = name
+        self.func = func
+        self.depends_on = tuple(depends_on)
+        self.timeout = DEFAULT_STEP_TIMEOUT if timeout is None else timeout
+        self.fallback = fallback
+
+    def request_deadline(self):
+        """The current request's deadline as a time.monotonic() value, or None."""
+        remaining = remaining_time()
+        return None if remaining is None else time.monotonic() + remaining
+
+    def effective_timeout(self) -> float:
+        """The step's timeout, shortened to the current request's deadline if that is sooner."""
+        remaining = remaining_time()
+        return self.timeout if remaining is None else max(0.0, min(self.timeout, remaining))
+
+    def fallback_result(self, error):
+        if callable(self.fallback):
+            return self.fallback(error)
+        return self.fallback
+
+
+class _Running:
+    """A submitted step: its timeout starts when a worker picks it up, not while it waits in the queue."""
+    __slots__ = ("step", "request_deadline", "started")
+
+    def __init__(self, step: AgentStep):
+        self.step = step
+        self.request_deadline = step.request_deadline()
+        self.started = None
+
+    def run(self, *args):
+        self.started = time.monotonic()
+        return self.step.func(*args)
+
+    def deadline(self) -> float:
+        """When to give up on the step (inf while it is queued and the request has no deadline)."""
+        deadline = float("inf") if self.request_deadline is None else self.request_deadline
+        if self.started is not None:
+            deadline = min(deadline, self.started + self.step.timeout)
+        return deadline
+
+
+def run_agent_graph(steps: list) -> tuple:
+    """
+    Runs a dependency graph of agent steps, starting each step as soon as all of
+    its dependencies have finished. Independent chains run concurrently. A step's
+    timeout counts from when it starts running on the shared pool; the request deadline
+    (if any) applies from the start.
+
+    Returns (results, failures): `results` maps every step name to its result (or
+    fallback), `failures` maps the names of failed/timed-out/skipped steps to the error.
+    Failures are also recorded on the current trace.
+    """
+    pending = {step.name: step for step in steps}
+    unknown = {dep for step in steps for dep in step.depends_on if dep not in pending}
+    if unknown:
+        raise ValueError(f"Unknown step dependencies: {sorted(unknown)}")
+
+    results = {}
+    failures = {}
+    running = {}  # future -> _Running
+
+    while pending or running:
+        # 1. Resolve steps whose dependencies are settled (start them, or skip them)
+        progressed = True
+        while progressed:
+            progressed = False
+            for name, step in list(pending.items()):
+                failed_deps = [dep for dep in step.depends_on if dep in failures]
+                if failed_deps:
+                    error = RuntimeError(f"Skipped because '{failed_deps[0]}' failed.")
+                    failures[name] = error
+                    results[name] = step.fallback_result(error)
+                elif all(dep in results for dep in step.depends_on):
+                    args = [results[dep] for dep in step.depends_on]
+                    entry = _Running(step)
+                    running[_submit(entry.run, *args)] = entry
+                else:
+                    continue
+                del pending[name]
+                progressed = True
+
+        if not running:
+            if pending:
+                raise ValueError(f"Agent graph has a dependency cycle: {sorted(pending)}")
+            break
+
+        # 2. Wait for the next step to finish, or the nearest deadline to pass. Queued steps
+        #    get their deadline once they start, so look again within their shortest timeout.
+        now = time.monotonic()
+        next_deadline = min(entry.deadline() for entry in running.values())
+        queued = [entry.step.timeout for entry in running.values() if entry.started is None]
+        if queued:
+            next_deadline = min(next_deadline, now + min(queued))
+        done, _ = wait(list(running), timeout=max(0.0, next_deadline - now), return_when=FIRST_COMPLETED)
+
+        for future in done:
+            step = running.pop(future).step
+            try:
+                results[step.name] = future.result()
+            except Exception as e:
+                failures[step.name] = e
+                results[step.name] = step.fallback_result(e)
+
+        # 3. Give up on steps that ran past their timeout (the thread finishes in the background)
+        now = time.monotonic()
+        for future, entry in list(running.items()):
+            if entry.deadline() <= now:
+                step = entry.step
+                future.cancel()
+                del running[future]
+                error = TimeoutError(f"Step '{step.name}' timed out after {step.timeout:.0f}s.")
+                failures[step.name] = error
+                results[step.name] = step.fallback_result(error)
+
+    for name, error in failures.items():
+        record_failure(name, error)
+    return results, failures
+
+
+def start_step(step: AgentStep, *args):
+    """Starts a single step in the background (for workflows that interleave their own work)."""
+    return _submit(step.func, *args)
+
+
+def wait_step(step: AgentStep, future) -> tuple:
+    """Waits for a step started with start_step. Returns (result, error); error is None on success."""
+    try:
+        return future.result(timeout=step.effective_timeout()), None
+    except FutureTimeoutError:
+        future.cancel()
+        error = TimeoutError(f"Step '{step.name}' timed out after {step.timeout:.0f}s.")
+    except Exception as e:
+        error = e
+    record_failure(step.name, error)
+    return step.fallback_result(error), error
@@ -0,0 +1,156 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from utils.tracing import Trace
+
+# --- Background job pool for agent workflows ---
+# The Streamlit script thread only submits a job and polls it (app.py redraws the pending
+# job from a fragment that reruns on a timer); the agent workflow runs on a bounded worker
+# pool. A slow Gemini call therefore never holds a script run, a rerun (or a closed tab)
+# does not interrupt the workflow, and parallelism is capped process-wide.
+# Backpressure: once EDUINDIA_JOB_QUEUE_LIMIT jobs are waiting or running, submissions are
+# rejected with JobQueueFull; each learner may have one unfinished job at a time.
+JOB_WORKERS = int(os.getenv("EDUINDIA_JOB_WORKERS", "8"))
+JOB_QUEUE_LIMIT = int(os.getenv("EDUINDIA_JOB_QUEUE_LIMIT", "64"))
+JOB_RETENTION = int(os.getenv("EDUINDIA_JOB_RETENTION", "500"))  # finished jobs kept for polling
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+class JobQueueFull(RuntimeError):
+    """Too many agent jobs are waiting; the caller should ask the learner to retry shortly."""
+
+
+class LearnerBusy(RuntimeError):
+    """The learner already has an unfinished job."""
+
+
+class AgentJob:
+    """One submitted agent workflow: its status, the response chunks so far, and the delegation log."""
+
+    def __init__(self, learner_key: str, request: str):
+        self.job_id = uuid.uuid4().hex
+        self.learner_key = learner_key
+        self.request = request
+        self.status = QUEUED
+        self.chunks = []
+        self.log = ""
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._changed = threading.Condition()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (DONE, FAILED)
+
+    @property
+    def text(self) -> str:
+        with self._changed:
+            return "".join(self.chunks)
+
+    def _update(self, **fields):
+        with self._changed:
+            chunk = fields.pop("chunk", None)
+            if chunk:
+                self.chunks.append(chunk)
+            for name, value in fields.items():
+                setattr(self, name, value)
+            self._changed.notify_all()
+
+    def wait(self, seen_chunks: int = 0, timeout: float = None) -> bool:
+        """Blocks until there are more than `seen_chunks` chunks or the job finishes; returns finished."""
+        with self._changed:
+            self._changed.wait_for(lambda: self.finished or len(self.chunks) > seen_chunks, timeout)
+            return self.finished
+
+
+_EXECUTOR = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="agent-job")
+_LOCK = threading.Lock()
+_JOBS = OrderedDict()  # job id -> AgentJob (unfinished jobs plus the most recent finished ones)
+_ACTIVE = {}           # learner key -> job id of their unfinished job
+_STATS = {"submitted": 0, "rejected_full": 0, "rejected_busy": 0, "completed": 0, "failed": 0, "queue_wait_ms": 0.0}
+
+
+def submit(learner_key: str, request: str, make_generator) -> AgentJob:
+    """
+    Queues make_generator() -> iterator of response chunks (e.g. RootAgentStream) to run in
+    the background inside a request-scoped trace. Raises JobQueueFull or LearnerBusy.
+    """
+    with _LOCK:
+        if learner_key in _ACTIVE:
+            _STATS["rejected_busy"] += 1
+            raise LearnerBusy("Still working on your previous request. Please wait a moment.")
+        if sum(1 for job in _JOBS.values() if not job.finished) >= JOB_QUEUE_LIMIT:
+            _STATS["rejected_full"] += 1
+            raise JobQueueFull("EduIndia is busy with other learners right now. Please try again in a moment.")
+        job = AgentJob(learner_key, request)
+        _JOBS[job.job_id] = job
+        _ACTIVE[learner_key] = job.job_id
+        _STATS["submitted"] += 1
+    _EXECUTOR.submit(_run, job, make_generator)
+    return job
+
+
+def _chunks(make_generator):
+    # make_generator() runs on the first next(), i.e. inside the trace's context, so agents
+    # that do their work eagerly (not as a generator) are traced too
+    yield from make_generator()
+
+
+def _run(job: AgentJob, make_generator):
+    job._update(status=RUNNING, started_at=time.time())
+    trace = Trace(job.request)
+    status = DONE
+    try:
+        for chunk in trace.iterate(_chunks(make_generator)):
+            job._update(chunk=chunk)
+    except Exception as e:
+        status = FAILED
+        trace.add_message(f"UNHANDLED ERROR: {e}")
+        job._update(chunk=f"\n\nAn unhandled error occurred in the agent workflow: {e}", error=str(e))
+    finally:
+        trace.finish()
+        with _LOCK:
+            _ACTIVE.pop(job.learner_key, None)
+            _STATS["completed" if status == DONE else "failed"] += 1
+            _STATS["queue_wait_ms"] += (job.started_at - job.submitted_at) * 1000
+            _trim()
+        job._update(status=status, log=trace.format_log(), finished_at=time.time())
+
+
+def _trim():
+    """Drops the oldest finished jobs beyond the retention limit (must hold _LOCK)."""
+    finished = [job_id for job_id, job in _JOBS.items() if job.finished]
+    for job_id in finished[:max(0, len(finished) - JOB_RETENTION)]:
+        del _JOBS[job_id]
+
+
+def get_job(job_id: str):
+    """Returns the job with this id, or None if it is unknown or no longer retained."""
+    with _LOCK:
+        return _JOBS.get(job_id)
+
+
+def active_job(learner_key: str):
+    """Returns the learner's unfinished job, if any."""
+    with _LOCK:
+        job_id = _ACTIVE.get(learner_key)
+        return _JOBS.get(job_id) if job_id is not None else None
+
+
+def get_job_stats() -> dict:
+    """Returns queue depth, throughput counters and the mean time jobs spent waiting for a worker."""
+    with _LOCK:
+        stats = dict(_STATS)
+        statuses = [job.status for job in _JOBS.values()]
+    stats["queued"] = statuses.count(QUEUED)
+    stats["running"] = statuses.count(RUNNING)
+    started = stats["completed"] + stats["failed"]
+    stats["mean_queue_wait_ms"] = stats.pop("queue_wait_ms") / started if started else 0.0
+    stats["workers"] = JOB_WORKERS
+    return stats
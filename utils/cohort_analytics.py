@@ -0,0 +1,391 @@
+import os
+import threading
+import time
+import numpy as np
+from utils.revision_history import as_record
+from utils.spaced_repetition import due_time
+from utils.state_manager import get_state_store
+
+# --- Cohort analytics over all learners ---
+# Learner state is loaded into columnar NumPy arrays: one row per learner (mastery, the
+# location/language/background codes, last activity) and one entry per (learner, concept)
+# (times studied, last study, due time, last grade). Cohort questions ("which concepts
+# are weak in this district?") are then a few vectorized bincounts instead of a walk over
+# every profile dict.
+#   * Incremental: refresh() asks the state store for learners saved since the last
+#     version it saw and reloads only those rows. A learner's old concept entries are
+#     masked out and their new ones appended; the entry arrays are compacted once more
+#     than half of them are stale.
+#   * Cached: query results are kept until the next refresh that changes something, and
+#     refreshes run at most every EDUINDIA_ANALYTICS_REFRESH seconds.
+# Queries group by one of GROUP_FIELDS or a tuple of them (e.g. ("background", "language")).
+ANALYTICS_REFRESH_SECONDS = float(os.getenv("EDUINDIA_ANALYTICS_REFRESH", "10"))
+
+GROUP_FIELDS = ("location", "language", "background")
+MASTERY_LEVELS = 6   # mastery_score 0-5
+GRADE_LEVELS = 4     # AnswerAgent scores 0-3
+RECENCY_BUCKETS = (("today", 1), ("this week", 7), ("this month", 30))  # days since last study
+DAY = 24 * 60 * 60
+
+
+class _Codes:
+    """Maps category strings (locations, concepts, ...) to dense integer codes."""
+
+    def __init__(self):
+        self.codes = {}
+        self.names = []
+
+    def code(self, name) -> int:
+        code = self.codes.get(name)
+        if code is None:
+            code = self.codes[name] = len(self.names)
+            self.names.append(name)
+        return code
+
+
+def _grow(array: np.ndarray, size: int) -> np.ndarray:
+    """Returns `array` with room for at least `size` items (capacity doubles)."""
+    if size <= len(array):
+        return array
+    grown = np.zeros(max(size, 2 * len(array)), dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+
+class CohortAnalytics:
+    """Columnar, incrementally refreshed view of every learner in a state store."""
+
+    def __init__(self, store):
+        self.store = store
+        self._lock = threading.RLock()
+        self._version = None          # store version of the last refresh (None: nothing loaded)
+        self._refreshed_at = 0.0
+        self._cache = {}
+        self._stats = {"refreshes": 0, "learners_loaded": 0, "compactions": 0,
+                       "cache_hits": 0, "cache_misses": 0, "last_refresh_ms": 0.0}
+
+        self._rows = {}               # learner key -> row
+        self._keys = []               # row -> learner key
+        self._groups = {field: _Codes() for field in GROUP_FIELDS}
+        self._concepts = _Codes()
+        # Learner columns (first self._n rows are used)
+        self._n = 0
+        self._mastery = np.zeros(0, dtype=np.int8)
+        self._last_active = np.zeros(0, dtype=np.float64)  # 0: never studied
+        self._group_codes = {field: np.zeros(0, dtype=np.int32) for field in GROUP_FIELDS}
+        self._entry_start = np.zeros(0, dtype=np.int64)    # each learner's entries are contiguous
+        self._entry_end = np.zeros(0, dtype=np.int64)
+        # Concept entry columns (first self._m entries are used; stale ones have _valid False)
+        self._m = 0
+        self._stale = 0
+        self._entry_row = np.zeros(0, dtype=np.int32)
+        self._entry_concept = np.zeros(0, dtype=np.int32)
+        self._entry_count = np.zeros(0, dtype=np.int32)
+        self._entry_due = np.zeros(0, dtype=np.float64)
+        self._entry_score = np.zeros(0, dtype=np.int8)     # last grade 0-3, -1: never graded
+        self._valid = np.zeros(0, dtype=bool)
+
+    # --- Loading ---
+    def refresh(self, force: bool = False) -> int:
+        """Loads learners saved since the last refresh; returns how many were (re)loaded."""
+        with self._lock:
+            if not force and self._version is not None and time.time() - self._refreshed_at < ANALYTICS_REFRESH_SECONDS:
+                return 0
+            start = time.perf_counter()
+            version, changed = self.store.load_changed(self._version)
+            if changed:
+                self._apply(changed)
+                self._cache.clear()
+            self._version = version
+            self._refreshed_at = time.time()
+            self._stats["refreshes"] += 1
+            self._stats["learners_loaded"] += len(changed)
+            self._stats["last_refresh_ms"] = (time.perf_counter() - start) * 1000
+            return len(changed)
+
+    def _apply(self, states: dict):
+        rows, mastery, last_active, groups = [], [], [], {field: [] for field in GROUP_FIELDS}
+        entry_rows, concepts, counts, dues, scores = [], [], [], [], []
+        starts, ends = [], []
+        for learner_key, state in states.items():
+            row = self._rows.get(learner_key)
+            if row is None:
+                row = self._rows[learner_key] = self._n
+                self._keys.append(learner_key)
+                self._n += 1
+            else:
+                # The learner's previous entries are replaced by the ones appended below
+                start, end = self._entry_start[row], self._entry_end[row]
+                self._valid[start:end] = False
+                self._stale += int(end - start)
+            rows.append(row)
+            mastery.append(state.get('mastery_score', 0))
+            for field in GROUP_FIELDS:
+                groups[field].append(self._groups[field].code(state.get(field, "")))
+
+            starts.append(self._m + len(entry_rows))
+            latest = 0.0
+            for concept, entry in state.get('revision_history', {}).items():
+                record = as_record(entry)
+                entry_rows.append(row)
+                concepts.append(self._concepts.code(concept))
+                counts.append(record['count'])
+                dues.append(due_time(record))
+                scores.append(record.get('last_score', -1))
+                latest = max(latest, record['last'] or 0.0)
+            ends.append(self._m + len(entry_rows))
+            last_active.append(latest)
+
+        self._ensure_learner_capacity(self._n)
+        rows = np.array(rows, dtype=np.int64)
+        self._mastery[rows] = mastery
+        self._last_active[rows] = last_active
+        for field in GROUP_FIELDS:
+            self._group_codes[field][rows] = groups[field]
+        self._entry_start[rows] = starts
+        self._entry_end[rows] = ends
+
+        added = len(entry_rows)
+        self._ensure_entry_capacity(self._m + added)
+        new = slice(self._m, self._m + added)
+        self._entry_row[new] = entry_rows
+        self._entry_concept[new] = concepts
+        self._entry_count[new] = counts
+        self._entry_due[new] = dues
+        self._entry_score[new] = scores
+        self._valid[new] = True
+        self._m += added
+
+        if self._stale > self._m - self._stale:
+            self._compact()
+
+    def _ensure_learner_capacity(self, size: int):
+        self._mastery = _grow(self._mastery, size)
+        self._last_active = _grow(self._last_active, size)
+        self._entry_start = _grow(self._entry_start, size)
+        self._entry_end = _grow(self._entry_end, size)
+        for field in GROUP_FIELDS:
+            self._group_codes[field] = _grow(self._group_codes[field], size)
+
+    def _ensure_entry_capacity(self, size: int):
+        self._entry_row = _grow(self._entry_row, size)
+        self._entry_concept = _grow(self._entry_concept, size)
+        self._entry_count = _grow(self._entry_count, size)
+        self._entry_due = _grow(self._entry_due, size)
+        self._entry_score = _grow(self._entry_score, size)
+        self._valid = _grow(self._valid, size)
+
+    def _compact(self):
+        """Drops stale entries; each learner's block stays contiguous, so only its offsets move."""
+        keep = self._valid[:self._m]
+        new_offset = np.concatenate(([0], np.cumsum(keep)))
+        n = self._n
+        self._entry_start[:n] = new_offset[self._entry_start[:n]]
+        self._entry_end[:n] = new_offset[self._entry_end[:n]]
+        for name in ("_entry_row", "_entry_concept", "_entry_count", "_entry_due", "_entry_score"):
+            column = getattr(self, name)
+            setattr(self, name, column[:self._m][keep].copy())
+        self._m = int(new_offset[-1])
+        self._valid = np.ones(self._m, dtype=bool)
+        self._stale = 0
+        self._stats["compactions"] += 1
+
+    # --- Queries ---
+    def _cached(self, key, compute):
+        self.refresh()
+        with self._lock:
+            if key in self._cache:
+                self._stats["cache_hits"] += 1
+                return self._cache[key]
+            self._stats["cache_misses"] += 1
+            result = self._cache[key] = compute()
+            return result
+
+    def _learner_groups(self, group_by):
+        """
+        Returns (group code per learner row, group names) for a GROUP_FIELDS field, a tuple of
+        them (names are tuples of values; only combinations that occur are groups) or None (everyone).
+        """
+        if group_by is None:
+            return np.zeros(self._n, dtype=np.int32), ["all"]
+        fields = group_by if isinstance(group_by, tuple) else (group_by,)
+        unknown = [field for field in fields if field not in GROUP_FIELDS]
+        if unknown or not fields:
+            raise ValueError(f"Unknown cohort grouping: {group_by} (use one of {', '.join(GROUP_FIELDS)})")
+        if not isinstance(group_by, tuple):
+            return self._group_codes[group_by][:self._n], list(self._groups[group_by].names)
+        columns = np.stack([self._group_codes[field][:self._n] for field in fields], axis=1)
+        combinations, codes = np.unique(columns, axis=0, return_inverse=True)
+        names = [tuple(self._groups[field].names[code] for field, code in zip(fields, combination))
+                 for combination in combinations]
+        return codes.reshape(-1).astype(np.int32), names
+
+    def _entries(self):
+        """Returns the indices of the current (non-stale) concept entries."""
+        return np.flatnonzero(self._valid[:self._m])
+
+    def summary(self) -> dict:
+        """Returns cohort size: learners, tracked (learner, concept) pairs, distinct concepts and total studies."""
+        def compute():
+            entries = self._entries()
+            return {"learners": self._n, "concept_entries": len(entries),
+                    "concepts": len(self._concepts.names), "studies": int(self._entry_count[entries].sum())}
+        return self._cached(("summary",), compute)
+
+    def mastery_distribution(self, group_by: str = None) -> dict:
+        """Returns {group: [learners at mastery 0, 1, ..., 5]}."""
+        def compute():
+            codes, names = self._learner_groups(group_by)
+            mastery = np.clip(self._mastery[:self._n], 0, MASTERY_LEVELS - 1)
+            counts = np.bincount(codes * MASTERY_LEVELS + mastery, minlength=len(names) * MASTERY_LEVELS)
+            return {name: counts.reshape(len(names), MASTERY_LEVELS)[i].tolist() for i, name in enumerate(names)}
+        return self._cached(("mastery", group_by), compute)
+
+    def concept_coverage(self, group_by: str = None, limit: int = 10) -> dict:
+        """Returns {group: [(concept, learners who studied it), ...]}, most studied first."""
+        def compute():
+            codes, names = self._learner_groups(group_by)
+            entries = self._entries()
+            concepts = len(self._concepts.names)
+            counts = np.bincount(
+                codes[self._entry_row[entries]] * concepts + self._entry_concept[entries],
+                minlength=len(names) * concepts
+            ).reshape(len(names), concepts)
+            return {name: self._most_studied(counts[i], limit) for i, name in enumerate(names)}
+        return self._cached(("coverage", group_by, limit), compute)
+
+    def weak_concepts(self, group_by: str = None, min_graded: int = 3, limit: int = 5) -> dict:
+        """Returns {group: [(concept, mean last grade 0-3, learners graded), ...]}, weakest first."""
+        def compute():
+            codes, names = self._learner_groups(group_by)
+            entries = self._entries()
+            entries = entries[self._entry_score[entries] >= 0]
+            concepts = len(self._concepts.names)
+            cells = codes[self._entry_row[entries]] * concepts + self._entry_concept[entries]
+            size = len(names) * concepts
+            graded = np.bincount(cells, minlength=size).reshape(len(names), concepts)
+            totals = np.bincount(cells, weights=self._entry_score[entries], minlength=size).reshape(len(names), concepts)
+            means = np.divide(totals, graded, out=np.zeros(totals.shape), where=graded > 0)
+            result = {}
+            for i, name in enumerate(names):
+                eligible = graded[i] >= min_graded
+                order = np.flatnonzero(eligible)[np.argsort(means[i][eligible], kind="stable")][:limit]
+                result[name] = [(self._concepts.names[c], round(float(means[i][c]), 2), int(graded[i][c]))
+                                for c in order]
+            return result
+        return self._cached(("weak", group_by, min_graded, limit), compute)
+
+    def grade_histogram(self, group_by: str = None) -> dict:
+        """Returns {group: [concepts last graded 0, 1, 2, 3]} over every (learner, concept) pair."""
+        def compute():
+            codes, names = self._learner_groups(group_by)
+            entries = self._entries()
+            entries = entries[self._entry_score[entries] >= 0]
+            counts = np.bincount(
+                codes[self._entry_row[entries]] * GRADE_LEVELS + self._entry_score[entries],
+                minlength=len(names) * GRADE_LEVELS
+            )
+            return {name: counts.reshape(len(names), GRADE_LEVELS)[i].tolist() for i, name in enumerate(names)}
+        return self._cached(("grades", group_by), compute)
+
+    def review_recency(self, group_by: str = None, now: float = None) -> dict:
+        """
+        Returns {group: {"today": n, "this week": n, "this month": n, "older": n, "never": n,
+        "overdue_concepts": n}}: learners by time since their last study, plus how many
+        (learner, concept) reviews are past due.
+        """
+        now = time.time() if now is None else now
+        def compute():
+            codes, names = self._learner_groups(group_by)
+            last = self._last_active[:self._n]
+            edges = [now - days * DAY for _, days in RECENCY_BUCKETS]
+            # Bucket 0..len(RECENCY_BUCKETS): newest to oldest; one more for learners who never studied
+            bucket = np.searchsorted(-np.array(edges), -last, side="right")
+            bucket = np.where(last > 0, bucket, len(RECENCY_BUCKETS) + 1)
+            labels = [label for label, _ in RECENCY_BUCKETS] + ["older", "never"]
+            counts = np.bincount(codes * len(labels) + bucket, minlength=len(names) * len(labels))
+            counts = counts.reshape(len(names), len(labels))
+
+            entries = self._entries()
+            overdue = entries[self._entry_due[entries] <= now]
+            overdue_counts = np.bincount(codes[self._entry_row[overdue]], minlength=len(names))
+            return {name: dict(zip(labels, counts[i].tolist()), overdue_concepts=int(overdue_counts[i]))
+                    for i, name in enumerate(names)}
+        # Cached per hour of `now`, so repeated calls within the hour share one result
+        return self._cached(("recency", group_by, int(now // 3600)), compute)
+
+    def due_demand(self, until: float, group_by=None, limit: int = 10) -> dict:
+        """Returns {group: [(concept, learners it is due for by `until`), ...]}, most demanded first."""
+        def compute():
+            codes, names = self._learner_groups(group_by)
+            entries = self._entries()
+            entries = entries[self._entry_due[entries] <= until]
+            concepts = len(self._concepts.names)
+            counts = np.bincount(
+                codes[self._entry_row[entries]] * concepts + self._entry_concept[entries],
+                minlength=len(names) * concepts
+            ).reshape(len(names), concepts)
+            return {name: self._most_studied(counts[i], limit) for i, name in enumerate(names)}
+        # Cached per hour of `until`, like review_recency
+        return self._cached(("demand", group_by, int(until // 3600), limit), compute)
+
+    def due_plans(self, top_k: int) -> list:
+        """
+        Returns (learner key, concepts tracked, sum of their due times, [(due, concept), ...])
+        for every learner with a revision history: their `top_k` concepts in due order,
+        computed for all learners with one sort.
+        """
+        self.refresh()
+        with self._lock:
+            entries = self._entries()
+            rows = self._entry_row[entries]
+            dues = self._entry_due[entries]
+            counts = np.bincount(rows, minlength=self._n)
+            sums = np.bincount(rows, weights=dues, minlength=self._n)
+            order = np.lexsort((dues, rows))
+            rows, dues, concepts = rows[order], dues[order], self._entry_concept[entries][order]
+            # Position of each entry within its learner's block, then the first top_k of each block
+            first = np.concatenate(([0], np.cumsum(counts)[:-1]))
+            top = np.arange(len(rows)) - first[rows] < top_k
+            rows, dues, concepts = rows[top], dues[top], concepts[top]
+            starts = np.flatnonzero(np.concatenate(([True], rows[1:] != rows[:-1]))) if len(rows) else rows
+            learners = rows[starts].tolist()
+            bounds = starts.tolist() + [len(rows)]
+            names = np.array(self._concepts.names, dtype=object)
+            pairs = list(zip(dues.tolist(), names[concepts].tolist()))
+            counts, sums = counts.tolist(), sums.tolist()
+            plans = [(self._keys[row], counts[row], sums[row], pairs[start:end])
+                     for row, start, end in zip(learners, bounds, bounds[1:])]
+            return plans
+
+    def _most_studied(self, counts: np.ndarray, limit: int) -> list:
+        studied = np.flatnonzero(counts)
+        order = studied[np.argsort(-counts[studied], kind="stable")][:limit]
+        return [(self._concepts.names[c], int(counts[c])) for c in order]
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats, learners=self._n, concept_entries=self._m - self._stale)
+        lookups = stats["cache_hits"] + stats["cache_misses"]
+        stats["cache_hit_rate"] = stats["cache_hits"] / lookups if lookups else 0.0
+        return stats
+
+
+_ANALYTICS = None
+_ANALYTICS_LOCK = threading.Lock()
+
+
+def get_cohort_analytics(store=None) -> CohortAnalytics:
+    """Returns the process-wide cohort analytics over the shared state store."""
+    global _ANALYTICS
+    with _ANALYTICS_LOCK:
+        if _ANALYTICS is None:
+            _ANALYTICS = CohortAnalytics(store if store is not None else get_state_store())
+        return _ANALYTICS
+
+
+def get_cohort_stats() -> dict:
+    """Returns refresh, compaction and cache counters (empty if analytics have not been used)."""
+    with _ANALYTICS_LOCK:
+        analytics = _ANALYTICS
+    return analytics.stats() if analytics is not None else {}
@@ -0,0 +1,231 @@
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+
+# --- Canonical concept index ---
+# Learners name the same topic many ways ("Inflation?", "inflation ", "the inflation",
+# "inflaton"). Every concept entering the system (lessons, tests, quizzes, state updates)
+# is resolved to one canonical ID here, so revision history, pending answers, the
+# response cache and the question bank all use one key per topic. Resolution order:
+#   1. exact match of the folded text (case, punctuation, whitespace and leading filler
+#      words removed) against known concepts and their aliases - a dict lookup;
+#   2. the most similar known concept of about the same length by character trigrams
+#      ("inflaton" -> "inflation"), if the Dice similarity reaches
+#      EDUINDIA_CONCEPT_FUZZY_THRESHOLD. Only names sharing one of the query's rarest
+#      trigrams can reach the threshold, so only those are scored;
+#   3. otherwise the folded text becomes a new concept.
+# Prefixes are never resolved automatically: "cloud" or "water" are topics in their own
+# right, not "cloud computing" or "water cycle". The trie of known names only backs
+# complete(), for suggestions the learner picks from. Known concepts are kept in a small
+# SQLite file so every process resolves alike.
+INDEX_PATH = os.getenv(
+    "EDUINDIA_CONCEPT_INDEX_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "concepts.sqlite3")
+)
+FUZZY_THRESHOLD = float(os.getenv("EDUINDIA_CONCEPT_FUZZY_THRESHOLD", "0.7"))
+MIN_FUZZY = 5             # shortest text that may fuzzy-match (short names are too easy to confuse)
+FUZZY_LENGTH_RATIO = 0.8  # fuzzy matches differ by a typo or two, not by extra words
+
+# Common topics known from the start (so an early typo does not become the canonical spelling)
+SEED_CONCEPTS = {
+    "inflation": (), "photosynthesis": (), "gdp": ("gross domestic product",), "interest rates": ("interest rate",),
+    "cloud computing": (), "crop rotation": (), "supply and demand": ("demand and supply",),
+    "compound interest": (), "water cycle": (), "digital payments": ("upi", "digital payment"),
+}
+
+LEADING_FILLER = {"me", "about", "on", "the", "a", "an"}
+TRAILING_FILLER = {"please", "pls"}
+
+
+def fold(text) -> str:
+    """Case-, punctuation- and whitespace-folds a topic and drops leading/trailing filler words."""
+    words = re.sub(r"[^\w\s]|_", " ", str(text).lower()).split()
+    while words and words[0] in LEADING_FILLER:
+        words.pop(0)
+    while words and words[-1] in TRAILING_FILLER:
+        words.pop()
+    return " ".join(words)
+
+
+def _trigrams(text: str) -> set:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class _TrieNode:
+    __slots__ = ("children", "concept")
+
+    def __init__(self):
+        self.children = {}
+        self.concept = None  # concept ID if a known name ends here
+
+
+class ConceptIndex:
+    """Resolves free-text topics to canonical concept IDs; see the module comment for the order."""
+
+    def __init__(self, path: str = INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+        self._last_rowid = 0
+        self._names = {}          # folded name (canonical ID or alias) -> concept ID
+        self._trie = _TrieNode()
+        self._postings = {}       # trigram -> set of names containing it
+        self._name_trigrams = {}  # name -> its trigram set
+        self.stats = {"lookups": 0, "exact": 0, "fuzzy": 0, "new": 0, "lookup_us": 0.0}
+
+    def _db(self) -> sqlite3.Connection:
+        """Opens the database on first use, seeding it (must hold self._lock)."""
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("CREATE TABLE IF NOT EXISTS concept_names (name TEXT PRIMARY KEY, concept TEXT NOT NULL)")
+            for concept, aliases in SEED_CONCEPTS.items():
+                db.executemany("INSERT OR IGNORE INTO concept_names (name, concept) VALUES (?, ?)",
+                               [(concept, concept)] + [(fold(alias), concept) for alias in aliases])
+            self._conn = db
+        return self._conn
+
+    def _sync(self):
+        """Loads names added since the last sync, including by other processes (must hold self._lock)."""
+        rows = self._db().execute(
+            "SELECT rowid, name, concept FROM concept_names WHERE rowid > ? ORDER BY rowid", (self._last_rowid,)
+        ).fetchall()
+        for rowid, name, concept in rows:
+            self._index_name(name, concept)
+            self._last_rowid = rowid
+
+    def _index_name(self, name: str, concept: str):
+        if name in self._names:
+            return
+        self._names[name] = concept
+        node = self._trie
+        for char in name:
+            node = node.children.setdefault(char, _TrieNode())
+        node.concept = concept
+        grams = self._name_trigrams[name] = _trigrams(name)
+        for gram in grams:
+            self._postings.setdefault(gram, set()).add(name)
+
+    def _node(self, prefix: str):
+        node = self._trie
+        for char in prefix:
+            node = node.children.get(char)
+            if node is None:
+                return None
+        return node
+
+    def _subtree_concepts(self, node: _TrieNode, limit: int) -> list:
+        """Returns up to `limit` distinct concepts named in the subtree under `node`."""
+        found, stack = [], [node]
+        while stack and len(found) < limit:
+            node = stack.pop()
+            if node.concept is not None and node.concept not in found:
+                found.append(node.concept)
+            stack.extend(node.children.values())
+        return found
+
+    def _fuzzy(self, text: str):
+        """Returns the concept whose name is most similar to `text` by trigram Dice score, if close enough."""
+        if len(text) < MIN_FUZZY:
+            return None
+        grams = _trigrams(text)
+        # A name of at least FUZZY_LENGTH_RATIO times the length needs this many shared trigrams
+        # to reach the threshold, so it must contain one of the query's rarest `probe` trigrams
+        needed = math.floor(FUZZY_THRESHOLD * len(grams) * (1 + FUZZY_LENGTH_RATIO) / 2)
+        probe = max(1, len(grams) - needed + 1)
+        rarest = sorted(grams, key=lambda gram: len(self._postings.get(gram, ())))[:probe]
+        candidates = set().union(*(self._postings.get(gram, ()) for gram in rarest))
+
+        best, best_score = None, FUZZY_THRESHOLD
+        for name in candidates:
+            if min(len(name), len(text)) < FUZZY_LENGTH_RATIO * max(len(name), len(text)):
+                continue
+            name_grams = self._name_trigrams[name]
+            score = 2 * len(grams & name_grams) / (len(grams) + len(name_grams))
+            if score >= best_score:
+                best, best_score = name, score
+        return self._names[best] if best is not None else None
+
+    def _match(self, folded: str):
+        """Returns (concept, how) for a known concept, or (None, None)."""
+        concept = self._names.get(folded)
+        if concept is not None:
+            return concept, "exact"
+        concept = self._fuzzy(folded)
+        if concept is not None:
+            return concept, "fuzzy"
+        return None, None
+
+    def resolve(self, text) -> str:
+        """Returns the canonical concept ID for a free-text topic (registering it if new); '' for empty text."""
+        folded = fold(text)
+        if not folded:
+            return ""
+        with self._lock:
+            if self._last_rowid == 0:
+                self._sync()
+            start = time.perf_counter()
+            concept, how = self._match(folded)
+            if concept is None:
+                # Another process may have just added it
+                self._sync()
+                concept, how = self._match(folded)
+            if concept is None:
+                self._db().execute("INSERT OR IGNORE INTO concept_names (name, concept) VALUES (?, ?)",
+                                   (folded, folded))
+                self._sync()
+                concept, how = self._names.get(folded, folded), "new"
+            self.stats["lookups"] += 1
+            self.stats[how] += 1
+            self.stats["lookup_us"] += (time.perf_counter() - start) * 1e6
+        return concept
+
+    def add_alias(self, alias: str, concept: str):
+        """Makes `alias` resolve to `concept` (which is registered if new)."""
+        concept = self.resolve(concept)
+        with self._lock:
+            self._db().execute("INSERT OR IGNORE INTO concept_names (name, concept) VALUES (?, ?)",
+                               (fold(alias), concept))
+            self._sync()
+
+    def complete(self, prefix: str, limit: int = 10) -> list:
+        """Returns up to `limit` known concepts whose name starts with the folded prefix (for suggestions)."""
+        folded = fold(prefix)
+        with self._lock:
+            if self._last_rowid == 0:
+                self._sync()
+            node = self._node(folded)
+            return self._subtree_concepts(node, limit) if node is not None else []
+
+
+_INDEX = None
+_INDEX_LOCK = threading.Lock()
+
+
+def get_concept_index() -> ConceptIndex:
+    global _INDEX
+    with _INDEX_LOCK:
+        if _INDEX is None:
+            _INDEX = ConceptIndex()
+        return _INDEX
+
+
+def canonical_concept(text) -> str:
+    """Resolves a free-text topic to its canonical concept ID with the process-wide index."""
+    return get_concept_index().resolve(text)
+
+
+def get_concept_index_stats() -> dict:
+    """Returns how lookups were resolved, the number of known names and the mean lookup time."""
+    index = get_concept_index()
+    with index._lock:
+        stats = dict(index.stats, names=len(index._names))
+    lookups = stats["lookups"]
+    stats["mean_lookup_us"] = stats.pop("lookup_us") / lookups if lookups else 0.0
+    stats["hit_rate"] = (lookups - stats["new"]) / lookups if lookups else 0.0
+    return stats
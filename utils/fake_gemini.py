@@ -0,0 +1,146 @@
+import json
+import os
+import random
+import threading
+import time
+
+# --- Local stand-in for the Gemini backend ---
+# Mimics the parts of genai.Client the agents use (models.generate_content and
+# models.generate_content_stream) with configurable latency, jitter and error rate, and
+# returns canned JSON shaped by the request's response_schema. Enable it for benchmarks
+# and offline development with EDUINDIA_FAKE_GEMINI=1 (no API key or network needed).
+FAKE_GEMINI_ENABLED = os.getenv("EDUINDIA_FAKE_GEMINI", "0") == "1"
+FAKE_LATENCY = float(os.getenv("FAKE_GEMINI_LATENCY", "0.8"))       # seconds per call
+FAKE_JITTER = float(os.getenv("FAKE_GEMINI_JITTER", "0.3"))         # +/- uniform seconds
+FAKE_ERROR_RATE = float(os.getenv("FAKE_GEMINI_ERROR_RATE", "0.0"))  # share of calls that fail
+FAKE_STREAM_CHUNKS = int(os.getenv("FAKE_GEMINI_STREAM_CHUNKS", "8"))
+FAKE_SEED = os.getenv("FAKE_GEMINI_SEED")
+# Latency multipliers by model family, so model tiering shows up in benchmarks
+FAKE_MODEL_SPEED = {
+    "lite": float(os.getenv("FAKE_GEMINI_LITE_FACTOR", "0.4")),
+    "pro": float(os.getenv("FAKE_GEMINI_PRO_FACTOR", "2.0")),
+}
+
+_CANNED_TEXT = (
+    "This is a simulated explanation from the offline Gemini stand-in. It describes the concept "
+    "in simple terms, gives an everyday example, and ends with a short summary for revision."
+)
+_CANNED_STRINGS = {
+    "question": "In your own words, what is the main idea of this concept?",
+    "answer": "The main idea is explained simply with an everyday example and a short summary.",
+    "feedback": "Good attempt. You covered the main idea; add an example to make it complete.",
+}
+
+
+class FakeGeminiError(Exception):
+    """Simulated backend failure. `code` mirrors the HTTP status of genai API errors."""
+
+    def __init__(self, code: int, message: str):
+        super().__init__(f"{code} {message}")
+        self.code = code
+
+
+class FakeUsage:
+    def __init__(self, prompt_tokens: int, response_tokens: int):
+        self.prompt_token_count = prompt_tokens
+        self.candidates_token_count = response_tokens
+        self.total_token_count = prompt_tokens + response_tokens
+
+
+class FakeResponse:
+    def __init__(self, text: str, usage: FakeUsage = None):
+        self.text = text
+        self.usage_metadata = usage
+
+
+def _get(obj, key):
+    """Reads a field from a dict or an SDK object (configs and schemas may be either)."""
+    if obj is None:
+        return None
+    if isinstance(obj, dict):
+        return obj.get(key)
+    return getattr(obj, key, None)
+
+
+def _type_name(schema) -> str:
+    schema_type = _get(schema, "type")
+    return str(getattr(schema_type, "value", schema_type) or "STRING").upper()
+
+
+class FakeModels:
+    def __init__(self, latency: float, jitter: float, error_rate: float, rng: random.Random):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self._rng = rng
+        self._rng_lock = threading.Lock()
+        self.calls = 0
+
+    def _random(self):
+        with self._rng_lock:
+            return self._rng.random()
+
+    def _delay(self, model: str = "") -> float:
+        factor = next((speed for family, speed in FAKE_MODEL_SPEED.items() if family in (model or "")), 1.0)
+        return max(0.0, self.latency + (self._random() * 2 - 1) * self.jitter) * factor
+
+    def _maybe_fail(self):
+        if self.error_rate and self._random() < self.error_rate:
+            code = 429 if self._random() < 0.5 else 503
+            raise FakeGeminiError(code, "Simulated Gemini backend error.")
+
+    def _fake_value(self, schema, name: str = "", item: int = None):
+        type_name = _type_name(schema)
+        if type_name == "OBJECT":
+            properties = _get(schema, "properties") or {}
+            return {key: self._fake_value(value, key, item) for key, value in properties.items()}
+        if type_name == "ARRAY":
+            # As many items as the schema asks for (default 3), each with its own text
+            count = int(_get(schema, "minItems") or 3)
+            return [self._fake_value(_get(schema, "items"), name, i + 1) for i in range(count)]
+        if type_name in ("INTEGER", "NUMBER"):
+            return int(self._random() * 4)  # scores/increments are 0-3
+        if type_name == "BOOLEAN":
+            return self._random() < 0.5
+        text = _CANNED_STRINGS.get(name, _CANNED_TEXT)
+        return text if item is None else f"{text} ({item})"
+
+    def _response_text(self, contents, config) -> str:
+        schema = _get(config, "response_schema")
+        if schema is not None:
+            return json.dumps(self._fake_value(schema))
+        return f"{_CANNED_TEXT} (Prompt began: {str(contents)[:60]!r})"
+
+    def _usage(self, contents, text: str) -> FakeUsage:
+        # Roughly four characters per token
+        return FakeUsage(len(str(contents)) // 4 + 1, len(text) // 4 + 1)
+
+    def generate_content(self, model: str, contents, config=None):
+        self.calls += 1
+        time.sleep(self._delay(model))
+        self._maybe_fail()
+        text = self._response_text(contents, config)
+        return FakeResponse(text, self._usage(contents, text))
+
+    def generate_content_stream(self, model: str, contents, config=None):
+        self.calls += 1
+        delay = self._delay(model)
+        # Time to first chunk is about a third of the call; the rest is spread over the chunks
+        time.sleep(delay / 3)
+        self._maybe_fail()
+        text = self._response_text(contents, config)
+        step = max(1, len(text) // FAKE_STREAM_CHUNKS)
+        pieces = [text[i:i + step] for i in range(0, len(text), step)]
+        for index, piece in enumerate(pieces):
+            time.sleep(2 * delay / 3 / len(pieces))
+            usage = self._usage(contents, text) if index == len(pieces) - 1 else None
+            yield FakeResponse(piece, usage)
+
+
+class FakeGeminiClient:
+    """Drop-in replacement for genai.Client backed by FakeModels."""
+
+    def __init__(self, latency: float = FAKE_LATENCY, jitter: float = FAKE_JITTER,
+                 error_rate: float = FAKE_ERROR_RATE, seed=FAKE_SEED):
+        rng = random.Random(int(seed)) if seed is not None else random.Random()
+        self.models = FakeModels(latency, jitter, error_rate, rng)
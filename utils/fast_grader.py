@@ -0,0 +1,137 @@
+import math
+import os
+import re
+import threading
+from collections import Counter
+
+# --- Local fast-path pre-grader for AnswerAgent ---
+# Clear-cut answers are scored instantly from TF-IDF weighted overlap with the expected
+# answer (cosine similarity and weighted recall):
+#   * blank / "I don't know" / nothing but English filler -> score 0
+#   * near-verbatim restatement of the expected answer    -> score 3
+# Term weights come from the expected answers graded so far in this process (each is one
+# document), so words that appear in most answers ("value", "process") count for less
+# than the ones that carry the idea. Words are split on whitespace and punctuation only,
+# so Indic words keep their combining vowel signs; a non-empty answer the tokenizer finds
+# no words in is escalated rather than failed.
+# Everything in between is ambiguous and escalated to the LLM grader, including short
+# answers that share no words with the expected one ("national output" for GDP can be a
+# correct paraphrase). The thresholds are deliberately conservative: a false fast-fail
+# on a correct paraphrase is worse than an extra LLM call.
+FAST_GRADING_ENABLED = os.getenv("EDUINDIA_FAST_GRADING", "1") == "1"
+PASS_COSINE = float(os.getenv("EDUINDIA_FAST_PASS_COSINE", "0.85"))
+PASS_RECALL = float(os.getenv("EDUINDIA_FAST_PASS_RECALL", "0.8"))
+
+_STOPWORDS = frozenset(
+    "a an the and or but if of to in on at by for with from as is are was were be been being "
+    "it its this that these those there their they them he she his her we our you your i me my "
+    "so than then too very can will would should could do does did not no yes ok okay just also "
+    "which who whom what when where why how into about over under more most some any each".split()
+)
+_DONT_KNOW = re.compile(
+    r"^\s*(i\s*(do\s*not|don'?t|dont)\s*know|idk|no\s*idea|not\s*sure|pass|skip|\?+|-+|\.+|n/?a)\s*[.!?]*\s*$",
+    re.IGNORECASE
+)
+
+# Letters and digits plus the Indic blocks (Devanagari to Sinhala), whose vowel signs and
+# viramas are combining marks rather than word characters; the dandas end a word
+_WORD = re.compile(r"(?:[^\W_]|[\u0900-\u0963\u0966-\u0DFF])+")
+MAX_DOCUMENTS = 10000  # expected answers counted towards the term weights
+
+_LOCK = threading.Lock()
+_STATS = {"fast_pass": 0, "fast_fail": 0, "escalated": 0}
+_DOC_FREQ = Counter()  # term -> expected answers containing it
+_DOCUMENTS = set()     # expected answers already counted (by their terms)
+
+
+def _words(text: str) -> list:
+    return _WORD.findall((text or "").lower())
+
+
+def content_terms(text: str) -> Counter:
+    """Lower-cased word counts without stopwords or one-letter Latin tokens."""
+    return Counter(w for w in _words(text) if not (len(w) == 1 and w.isascii()) and w not in _STOPWORDS)
+
+
+def _weights(expected_terms: Counter, answer_terms: Counter = ()) -> dict:
+    """
+    Counts the expected answer as a document (once) and returns smoothed IDF weights for
+    its terms and the answer's.
+    """
+    document = frozenset(expected_terms)
+    with _LOCK:
+        if document not in _DOCUMENTS and len(_DOCUMENTS) < MAX_DOCUMENTS:
+            _DOCUMENTS.add(document)
+            _DOC_FREQ.update(document)
+        documents = len(_DOCUMENTS)
+        return {term: math.log((1 + documents) / (1 + _DOC_FREQ[term])) + 1
+                for term in document.union(answer_terms)}
+
+
+def _cosine(a: Counter, b: Counter, idf: dict) -> float:
+    dot = sum(count * b[term] * idf[term] ** 2 for term, count in a.items() if term in b)
+    norm_a = math.sqrt(sum((count * idf[term]) ** 2 for term, count in a.items()))
+    norm_b = math.sqrt(sum((count * idf[term]) ** 2 for term, count in b.items()))
+    return dot / (norm_a * norm_b) if norm_a and norm_b else 0.0
+
+
+def _count(outcome: str):
+    with _LOCK:
+        _STATS[outcome] += 1
+
+
+def pre_grade(user_answer: str, expected_answer: str, expected_terms: Counter = None):
+    """
+    Returns a grading result ({'score', 'feedback', 'mastery_increment'}) for clear-cut
+    answers, or None when the answer is ambiguous and needs the LLM grader.
+    `expected_terms` may be passed in if the expected answer was tokenized ahead of time.
+    """
+    if not FAST_GRADING_ENABLED:
+        return None
+
+    answer_terms = content_terms(user_answer)
+    expected_terms = content_terms(expected_answer) if expected_terms is None else expected_terms
+
+    # 1. Blank, "I don't know", or nothing but filler words
+    blank = not (user_answer or "").strip()
+    filler = not answer_terms and bool(_words(user_answer))
+    if blank or filler or _DONT_KNOW.match(user_answer or ""):
+        _count("fast_fail")
+        return {
+            "score": 0,
+            "feedback": "No answer was given this time. Here is what we were looking for: " + expected_answer,
+            "mastery_increment": 0,
+        }
+
+    if not answer_terms:
+        # Text the tokenizer finds no words in (another script, symbols): the LLM decides
+        _count("escalated")
+        return None
+
+    idf = _weights(expected_terms, answer_terms)
+    covered = sum(count * idf[term] for term, count in (answer_terms & expected_terms).items())
+    total = sum(count * idf[term] for term, count in expected_terms.items())
+    recall = covered / total if total else 0.0
+    cosine = _cosine(answer_terms, expected_terms, idf)
+
+    # 2. Near-verbatim coverage of the expected answer
+    if cosine >= PASS_COSINE and recall >= PASS_RECALL:
+        _count("fast_pass")
+        return {
+            "score": 3,
+            "feedback": "Excellent! Your answer covers all the key points of the expected answer.",
+            "mastery_increment": 3,
+        }
+
+    # 3. Ambiguous: let the LLM decide
+    _count("escalated")
+    return None
+
+
+def get_fast_grading_stats() -> dict:
+    """Returns fast-path counters and the share of answers graded without an LLM call."""
+    with _LOCK:
+        stats = dict(_STATS)
+    total = sum(stats.values())
+    stats["fast_path_rate"] = (stats["fast_pass"] + stats["fast_fail"]) / total if total else 0.0
+    return stats
@@ -0,0 +1,196 @@
+import contextvars
+import itertools
+import os
+import threading
+import time
+from utils.lazy import load_module, register
+from utils.tracing import span, current_span, record_usage
+from utils.fake_gemini import FAKE_GEMINI_ENABLED, FakeGeminiClient
+from utils.resilience import call_with_resilience
+from utils.model_router import DEFAULT_MODEL, route, record_call
+
+# --- Process-wide Gemini client registry ---
+# Building a genai.Client (and its HTTP connection/TLS setup) on every agent call is
+# expensive, so all agents share one client per API key. The underlying httpx client
+# keeps connections alive and is safe to use from multiple threads.
+# The SDK (and httpx) are imported on first use, not at import time (see utils/lazy.py).
+if not FAKE_GEMINI_ENABLED:
+    register("google.genai")
+
+GEMINI_POOL_SIZE = int(os.getenv("GEMINI_POOL_SIZE", "20"))
+GEMINI_KEEPALIVE_SECONDS = float(os.getenv("GEMINI_KEEPALIVE_SECONDS", "120"))
+
+_CLIENTS = {}       # api_key -> genai.Client
+_HTTP_CLIENTS = {}  # api_key -> httpx.Client backing that genai.Client
+_LOCK = threading.Lock()
+_SERVED_MODEL = contextvars.ContextVar("eduindia_served_model", default=DEFAULT_MODEL)
+_STATS = {
+    "acquisitions": 0,
+    "clients_created": 0,
+    "calls": 0,
+    "in_flight_calls": 0,
+}
+
+
+def _genai():
+    return load_module("google.genai")
+
+
+def get_gemini_client():
+    """Returns the shared Gemini client, creating it (and its connection pool) on first use."""
+    if FAKE_GEMINI_ENABLED:
+        # Offline stand-in for benchmarks and development (see utils/fake_gemini.py)
+        with _LOCK:
+            _STATS["acquisitions"] += 1
+            if "fake" not in _CLIENTS:
+                _CLIENTS["fake"] = FakeGeminiClient()
+                _STATS["clients_created"] += 1
+            return _CLIENTS["fake"]
+
+    api_key = os.getenv('GEMINI_API_KEY')
+    if not api_key:
+        raise ValueError("GEMINI_API_KEY environment variable is not set.")
+
+    with _LOCK:
+        _STATS["acquisitions"] += 1
+        client = _CLIENTS.get(api_key)
+        if client is None:
+            httpx = load_module("httpx")
+            genai = _genai()
+            http_client = httpx.Client(
+                limits=httpx.Limits(
+                    max_connections=GEMINI_POOL_SIZE,
+                    max_keepalive_connections=GEMINI_POOL_SIZE,
+                    keepalive_expiry=GEMINI_KEEPALIVE_SECONDS,
+                )
+            )
+            client = genai.Client(
+                api_key=api_key,
+                http_options=genai.types.HttpOptions(httpx_client=http_client)
+            )
+            _HTTP_CLIENTS[api_key] = http_client
+            _CLIENTS[api_key] = client
+            _STATS["clients_created"] += 1
+        return client
+
+
+def _route(kwargs: dict):
+    """Routes a DEFAULT_MODEL call to a model tier (utils/model_router.py); returns (kwargs, tier, agent name)."""
+    parent = current_span()
+    agent_name = parent.name if parent else None
+    kwargs, tier = route(kwargs, agent_name)
+    _SERVED_MODEL.set(kwargs.get("model", DEFAULT_MODEL))
+    return kwargs, tier, agent_name
+
+
+def served_model() -> str:
+    """The model the last Gemini call in this context was routed to (cache responses under it)."""
+    return _SERVED_MODEL.get()
+
+
+def _llm_span(kwargs: dict, tier: str, agent_name: str):
+    """Opens an LLM-call span named after the calling agent's span."""
+    name = f"{agent_name} LLM call" if agent_name else "LLM call"
+    return span(name, kind="llm", model=kwargs.get("model"), tier=tier,
+                prompt_chars=len(str(kwargs.get("contents", ""))))
+
+
+def _with_timeout(kwargs: dict, timeout) -> dict:
+    """Returns call kwargs whose per-request HTTP timeout fits within the request deadline."""
+    if timeout is None:
+        return kwargs
+    timeout_ms = max(1, int(timeout * 1000))
+    config = kwargs.get("config")
+    if config is None:
+        config = {"http_options": {"timeout": timeout_ms}}
+    elif isinstance(config, dict):
+        config = dict(config, http_options={"timeout": timeout_ms})
+    else:
+        config = config.model_copy(update={"http_options": _genai().types.HttpOptions(timeout=timeout_ms)})
+    return dict(kwargs, config=config)
+
+
+def generate_content(**kwargs):
+    """
+    Calls models.generate_content on the shared client under the resilient call layer
+    (rate limit, retries, request deadline, optional hedging, circuit breaker).
+    """
+    client = get_gemini_client()
+    kwargs, tier, agent_name = _route(kwargs)
+    with _LOCK:
+        _STATS["calls"] += 1
+        _STATS["in_flight_calls"] += 1
+    start = time.perf_counter()
+    response = None
+    try:
+        with _llm_span(kwargs, tier, agent_name) as llm_span:
+            response = call_with_resilience(
+                lambda timeout: client.models.generate_content(**_with_timeout(kwargs, timeout))
+            )
+            llm_span.set(response_chars=len(response.text or ""))
+            record_usage(llm_span, response)
+            return response
+    finally:
+        record_call(tier, agent_name, (time.perf_counter() - start) * 1000, response is not None,
+                    getattr(response, "usage_metadata", None))
+        with _LOCK:
+            _STATS["in_flight_calls"] -= 1
+
+
+def generate_content_stream(**kwargs):
+    """
+    Calls models.generate_content_stream on the shared client, yielding response chunks.
+    Retries (and the rest of the call layer) apply until the first chunk arrives; once
+    text has been shown to the learner the stream is not restarted.
+    """
+    client = get_gemini_client()
+    kwargs, tier, agent_name = _route(kwargs)
+    with _LOCK:
+        _STATS["calls"] += 1
+        _STATS["in_flight_calls"] += 1
+
+    def open_stream(timeout):
+        iterator = iter(client.models.generate_content_stream(**_with_timeout(kwargs, timeout)))
+        return next(iterator, None), iterator
+
+    start = time.perf_counter()
+    completed = False
+    usage = None
+    try:
+        with _llm_span(kwargs, tier, agent_name) as llm_span:
+            first_chunk, iterator = call_with_resilience(open_stream, hedge=False)
+            chunks = iterator if first_chunk is None else itertools.chain([first_chunk], iterator)
+            response_chars = 0
+            for chunk in chunks:
+                response_chars += len(chunk.text or "")
+                # Token usage arrives on the final chunk(s)
+                record_usage(llm_span, chunk)
+                usage = getattr(chunk, "usage_metadata", None) or usage
+                yield chunk
+            llm_span.set(response_chars=response_chars)
+            completed = True
+    finally:
+        record_call(tier, agent_name, (time.perf_counter() - start) * 1000, completed, usage)
+        with _LOCK:
+            _STATS["in_flight_calls"] -= 1
+
+
+def _open_connections() -> int:
+    """Counts the connections currently held by all shared HTTP pools."""
+    total = 0
+    for http_client in _HTTP_CLIENTS.values():
+        # httpx does not expose its pool publicly; fall back to 0 if internals change.
+        pool = getattr(getattr(http_client, "_transport", None), "_pool", None)
+        total += len(getattr(pool, "connections", []) or [])
+    return total
+
+
+def get_pool_stats() -> dict:
+    """Returns client reuse and connection pool statistics for monitoring."""
+    with _LOCK:
+        stats = dict(_STATS)
+        stats["open_connections"] = _open_connections()
+    acquisitions = stats["acquisitions"]
+    stats["pool_size"] = GEMINI_POOL_SIZE
+    stats["reuse_rate"] = (acquisitions - stats["clients_created"]) / acquisitions if acquisitions else 0.0
+    return stats
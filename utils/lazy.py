@@ -0,0 +1,96 @@
+import importlib
+import os
+import threading
+import time
+
+# --- Lazy loading of agents and the Gemini SDK ---
+# Importing google.genai (and every specialized agent with it) costs a noticeable part of
+# process start, and many requests never reach the LLM (help text, pending-answer checks,
+# "study next"). Modules registered here are imported on first use instead; warm_up()
+# imports them on a background thread once the app is serving, off the critical path.
+WARMUP_ENABLED = os.getenv("EDUINDIA_WARMUP", "1") == "1"
+
+_LOCK = threading.Lock()
+_REGISTERED = []      # module names warm_up() should import, in registration order
+_IMPORT_MS = {}       # module name -> time its first import took (ms)
+_WARMUP_THREAD = None
+
+
+def load_module(name: str):
+    """Imports a module, recording how long the first import took."""
+    with _LOCK:
+        loaded = name in _IMPORT_MS
+    if loaded:
+        return importlib.import_module(name)
+    # Python's import lock serializes concurrent first imports; _LOCK is not held here
+    # because the imported module may itself register() lazy modules
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    with _LOCK:
+        _IMPORT_MS.setdefault(name, (time.perf_counter() - start) * 1000)
+    return module
+
+
+def register(name: str):
+    """Adds a module to the set warm_up() pre-loads."""
+    with _LOCK:
+        if name not in _REGISTERED:
+            _REGISTERED.append(name)
+
+
+class LazyAttribute:
+    """Stands in for `module.attr` (e.g. an agent function) and imports the module on first call."""
+
+    def __init__(self, module: str, attr: str):
+        self.module = module
+        self.attr = attr
+        self._target = None
+        register(module)
+
+    def resolve(self):
+        if self._target is None:
+            self._target = getattr(load_module(self.module), self.attr)
+        return self._target
+
+    def __call__(self, *args, **kwargs):
+        return self.resolve()(*args, **kwargs)
+
+    def __repr__(self):
+        return f"<lazy {self.module}.{self.attr}>"
+
+
+def lazy(module: str, attr: str) -> LazyAttribute:
+    return LazyAttribute(module, attr)
+
+
+def warm_up(background: bool = True):
+    """Imports every registered module (at most once per process), by default on a daemon thread."""
+    global _WARMUP_THREAD
+    if not WARMUP_ENABLED:
+        return None
+
+    def run():
+        # Loading a module may register more (e.g. an agent registering the SDK), so walk by index
+        index = 0
+        while index < len(_REGISTERED):
+            try:
+                load_module(_REGISTERED[index])
+            except Exception:
+                pass  # the import error surfaces again on first real use
+            index += 1
+
+    with _LOCK:
+        if _WARMUP_THREAD is not None:
+            return _WARMUP_THREAD
+        _WARMUP_THREAD = threading.Thread(target=run, name="eduindia-warmup", daemon=True)
+    if background:
+        _WARMUP_THREAD.start()
+    else:
+        _WARMUP_THREAD.run()
+    return _WARMUP_THREAD
+
+
+def get_import_stats() -> dict:
+    """Returns how long each lazily loaded module took to import (ms)."""
+    with _LOCK:
+        return dict(_IMPORT_MS)
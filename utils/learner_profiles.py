@@ -0,0 +1,190 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import threading
+from collections import defaultdict
+
+# --- Learner directory and bulk provisioning ---
+# Every learner's static profile (name, location, background, language) is kept as a
+# small __slots__ record with interned category strings, so 100k learners cost a few
+# tens of MB instead of one full state dict each. The directory keeps secondary indexes
+# by location, language and background for O(1) lookup of a cohort, and backs the
+# searchable learner selector. Bulk provisioning streams profiles from CSV or JSON lines
+# into a state store in batches; a learner's full state dict is only created once they
+# start learning.
+PROVISION_BATCH = int(os.getenv("EDUINDIA_PROVISION_BATCH", "5000"))
+
+INDEXED_FIELDS = ("location", "language", "background")
+REQUIRED_FIELDS = ("name", "location", "background", "language")
+
+
+class LearnerProfile:
+    """One learner's static profile; `initial_state()` builds the state a new learner starts with."""
+
+    __slots__ = ("key", "name", "location", "background", "language", "mastery_score")
+
+    def __init__(self, key: str, name: str, location: str, background: str, language: str, mastery_score: int = 1):
+        self.key = key
+        self.name = name
+        # Category values repeat across many learners, so each distinct string is stored once
+        self.location = sys.intern(location)
+        self.background = sys.intern(background)
+        self.language = sys.intern(language)
+        self.mastery_score = mastery_score
+
+    @classmethod
+    def from_state(cls, key: str, state: dict) -> "LearnerProfile":
+        return cls(key, state['name'], state['location'], state['background'], state['language'],
+                   state.get('mastery_score', 1))
+
+    def initial_state(self) -> dict:
+        return {
+            "name": self.name,
+            "location": self.location,
+            "background": self.background,
+            "language": self.language,
+            "mastery_score": self.mastery_score,
+            "mastery_increment": 0,
+            "revision_history": {},
+            "pending_answer": None,
+            "pending_quiz": None,
+        }
+
+
+class ProfileDirectory:
+    """All learner profiles in insertion order, indexed by location, language and background."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._profiles = {}  # learner key -> LearnerProfile (insertion ordered)
+        self._index = {field: defaultdict(list) for field in INDEXED_FIELDS}  # field -> value -> keys
+
+    def add(self, profile: LearnerProfile) -> bool:
+        """Adds a profile; returns False if a learner with this key already exists."""
+        with self._lock:
+            if profile.key in self._profiles:
+                return False
+            self._profiles[profile.key] = profile
+            for field in INDEXED_FIELDS:
+                self._index[field][getattr(profile, field)].append(profile.key)
+            return True
+
+    def get(self, learner_key: str):
+        return self._profiles.get(learner_key)
+
+    def __contains__(self, learner_key: str) -> bool:
+        return learner_key in self._profiles
+
+    def __len__(self) -> int:
+        return len(self._profiles)
+
+    def keys(self) -> list:
+        with self._lock:
+            return list(self._profiles)
+
+    def values(self, field: str) -> dict:
+        """Returns {value: number of learners} for an indexed field, sorted by value."""
+        with self._lock:
+            return {value: len(keys) for value, keys in sorted(self._index[field].items())}
+
+    def find(self, text: str = None, limit: int = None, **filters) -> list:
+        """
+        Returns learner keys matching every given field filter (e.g. location="Pune, Maharashtra")
+        and, if `text` is given, containing it in the key or name (case-insensitive).
+        """
+        unknown = set(filters) - set(INDEXED_FIELDS)
+        if unknown:
+            raise ValueError(f"Cannot filter learners by: {', '.join(sorted(unknown))}")
+        filters = {field: value for field, value in filters.items() if value is not None}
+        with self._lock:
+            if filters:
+                # Start from the smallest index bucket and check the other filters per learner
+                field = min(filters, key=lambda f: len(self._index[f].get(filters[f], ())))
+                candidates = list(self._index[field].get(filters[field], ()))
+            else:
+                candidates = list(self._profiles)
+        needle = text.strip().lower() if text else ""
+        matches = []
+        for learner_key in candidates:
+            profile = self._profiles[learner_key]
+            if any(getattr(profile, field) != value for field, value in filters.items()):
+                continue
+            if needle and needle not in learner_key.lower() and needle not in profile.name.lower():
+                continue
+            matches.append(learner_key)
+            if limit is not None and len(matches) >= limit:
+                break
+        return matches
+
+
+def profile_from_row(row: dict):
+    """Builds a profile from a CSV/JSON row, or returns None if a required field is missing or invalid."""
+    if not all(isinstance(row.get(field), str) and row[field].strip() for field in REQUIRED_FIELDS):
+        return None
+    try:
+        mastery_score = min(5, max(0, int(row.get('mastery_score') or 1)))
+    except (TypeError, ValueError):
+        return None
+    name = row['name'].strip()
+    key = str(row.get('key') or '').strip() or name
+    return LearnerProfile(key, name, row['location'].strip(), row['background'].strip(),
+                          row['language'].strip(), mastery_score)
+
+
+def read_profiles(path: str):
+    """Streams rows from a .csv (header row) or .jsonl file; yields a LearnerProfile, or None for an invalid row."""
+    with open(path, encoding="utf-8", newline="") as f:
+        if path.lower().endswith(".csv"):
+            for row in csv.DictReader(f):
+                yield profile_from_row(row)
+            return
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                yield None
+                continue
+            yield profile_from_row(row) if isinstance(row, dict) else None
+
+
+def provision(store, path: str, batch_size: int = PROVISION_BATCH) -> dict:
+    """Adds every learner in a CSV/JSONL file to the state store; learners that already exist are kept."""
+    counts = {"added": 0, "existing": 0, "invalid": 0}
+    batch = []
+
+    def flush():
+        added = store.add_learners(batch)
+        counts["added"] += added
+        counts["existing"] += len(batch) - added
+        batch.clear()
+
+    for profile in read_profiles(path):
+        if profile is None:
+            counts["invalid"] += 1
+            continue
+        batch.append(profile)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Provision learners from CSV or JSON lines into the state store.")
+    parser.add_argument("paths", nargs="+", help="Files with name, location, background, language "
+                                                 "and optional key and mastery_score columns.")
+    args = parser.parse_args(argv)
+    from utils.state_manager import get_state_store
+    store = get_state_store()
+    for path in args.paths:
+        counts = provision(store, path)
+        print(f"{path}: {counts['added']} added, {counts['existing']} already existed, {counts['invalid']} invalid rows")
+
+
+if __name__ == "__main__":
+    main()
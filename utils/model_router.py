@@ -0,0 +1,239 @@
+import contextvars
+import functools
+import inspect
+import os
+import threading
+from contextlib import contextmanager
+from utils.resilience import remaining_time
+
+# --- Latency-aware model tiering ---
+# Agents ask for DEFAULT_MODEL; utils/gemini_client.py routes each such call to a model
+# tier instead, so short structured work (grading, recall questions, scheduling) runs on
+# a lighter, faster model while lessons stay on the standard one. Per call:
+#   1. the calling agent's default tier (AGENT_POLICIES, overridable with
+#      EDUINDIA_MODEL_TIERS="AnswerAgent=standard,SubjectAgent=heavy"),
+#   2. one tier heavier for advanced learners (mastery_score >= EDUINDIA_ROUTER_ADVANCED_MASTERY),
+#      whose answers and lessons need more nuance,
+#   3. lighter tiers while the observed latency (moving average) of this agent's calls on
+#      the tier does not fit the agent's latency budget or the time left before the request
+#      deadline. Latency is tracked per (agent, tier), since a long lesson and a short
+#      grading call on the same model take very different times. Every PROBE_INTERVAL-th
+#      call that would skip a slow tier uses it anyway, so the router notices when it has
+#      recovered.
+# Calls that name another model explicitly are not routed. Per-tier latency and token
+# totals are kept for the sidebar and benchmark.py. Cached responses are keyed on the
+# model that served them; cache_models() lists the models whose responses an agent may
+# reuse (its preferred tier's model, then heavier ones).
+DEFAULT_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash-preview-09-2025")
+ROUTING_ENABLED = os.getenv("EDUINDIA_MODEL_ROUTING", "1") == "1"
+ADVANCED_MASTERY = int(os.getenv("EDUINDIA_ROUTER_ADVANCED_MASTERY", "4"))
+LATENCY_SMOOTHING = 0.2  # weight of the newest call in each tier's moving average
+MIN_SAMPLES = 3          # calls observed on a tier before its latency is trusted
+PROBE_INTERVAL = int(os.getenv("EDUINDIA_ROUTER_PROBE_INTERVAL", "20"))
+
+LIGHT, STANDARD, HEAVY = "light", "standard", "heavy"
+TIERS = (LIGHT, STANDARD, HEAVY)
+TIER_MODELS = {
+    LIGHT: os.getenv("GEMINI_MODEL_LIGHT", "gemini-2.5-flash-lite"),
+    STANDARD: DEFAULT_MODEL,
+    HEAVY: os.getenv("GEMINI_MODEL_HEAVY", DEFAULT_MODEL),
+}
+
+# Agent span name -> (default tier, latency budget in seconds)
+AGENT_POLICIES = {
+    "AnswerAgent": (LIGHT, 4.0),
+    "QuizAgent": (LIGHT, 8.0),
+    "TestAgent": (LIGHT, 6.0),
+    "QuestionBankRefill": (LIGHT, 30.0),
+    "SchedulerAgent": (LIGHT, 4.0),
+    "SubjectAgent": (STANDARD, 20.0),
+    "ContentGeneratorAgent": (STANDARD, 20.0),
+    "LessonAgent": (STANDARD, 30.0),
+}
+DEFAULT_POLICY = (STANDARD, 30.0)
+
+
+def _parse_overrides(value: str) -> dict:
+    overrides = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        agent, _, tier = item.partition("=")
+        if tier.strip() not in TIERS:
+            raise ValueError(f"Unknown model tier in EDUINDIA_MODEL_TIERS: {item}")
+        overrides[agent.strip()] = tier.strip()
+    return overrides
+
+
+for _agent, _tier in _parse_overrides(os.getenv("EDUINDIA_MODEL_TIERS", "")).items():
+    AGENT_POLICIES[_agent] = (_tier, AGENT_POLICIES.get(_agent, DEFAULT_POLICY)[1])
+
+_MASTERY = contextvars.ContextVar("eduindia_mastery", default=None)
+
+_LOCK = threading.Lock()
+_TIER_STATS = {
+    tier: {"calls": 0, "errors": 0, "latency_ms": 0.0, "prompt_tokens": 0, "response_tokens": 0}
+    for tier in TIERS
+}
+_LATENCY = {}  # (agent name, tier) -> {"samples", "ewma_ms", "skipped"}
+_STATS = {"routed": 0, "pinned": 0, "mastery_upgrades": 0, "latency_downgrades": 0}
+
+
+def current_mastery():
+    """The mastery score the LLM calls in this context are routed by (None outside a learner's request)."""
+    return _MASTERY.get()
+
+
+@contextmanager
+def mastery_routing(mastery):
+    """Routes the LLM calls made in this context as for a learner with this mastery score."""
+    token = _MASTERY.set(mastery)
+    try:
+        yield
+    finally:
+        try:
+            _MASTERY.reset(token)
+        except ValueError:
+            # A streamed generator may be resumed in another context
+            pass
+
+
+@contextmanager
+def learner_routing(session):
+    """Routes the LLM calls made in this context by the session learner's mastery."""
+    try:
+        mastery = session.get_state().get('mastery_score')
+    except KeyError:
+        mastery = None
+    with mastery_routing(mastery):
+        yield
+
+
+def with_learner_routing(func):
+    """Decorator for agents taking (query, session): routes their LLM calls by the learner's mastery."""
+    if inspect.isgeneratorfunction(func):
+        @functools.wraps(func)
+        def generator_wrapper(user_query, session, *args, **kwargs):
+            with learner_routing(session):
+                yield from func(user_query, session, *args, **kwargs)
+        return generator_wrapper
+
+    @functools.wraps(func)
+    def wrapper(user_query, session, *args, **kwargs):
+        with learner_routing(session):
+            return func(user_query, session, *args, **kwargs)
+    return wrapper
+
+
+def _preferred_index(agent_name: str) -> int:
+    """Index in TIERS of the agent's default tier, one heavier for advanced learners."""
+    index = TIERS.index(AGENT_POLICIES.get(agent_name, DEFAULT_POLICY)[0])
+    mastery = _MASTERY.get()
+    if mastery is not None and mastery >= ADVANCED_MASTERY and index < len(TIERS) - 1:
+        index += 1
+    return index
+
+
+def choose_tier(agent_name: str) -> str:
+    """Picks the model tier for an LLM call made by `agent_name` in the current request."""
+    tier, budget = AGENT_POLICIES.get(agent_name, DEFAULT_POLICY)
+    default_index = TIERS.index(tier)
+    index = _preferred_index(agent_name)
+
+    remaining = remaining_time()
+    if remaining is not None:
+        budget = min(budget, remaining)
+    while index > 0 and _too_slow(agent_name, TIERS[index], budget * 1000):
+        index -= 1
+        _count("latency_downgrades")
+    # An upgrade only counts if the latency check kept it
+    if index > default_index:
+        _count("mastery_upgrades")
+    return TIERS[index]
+
+
+def cache_models(agent_name: str) -> list:
+    """
+    Models whose cached responses may answer `agent_name`'s call in the current request:
+    its preferred tier's model first, then heavier ones. Responses from a latency downgrade
+    are not reused once the preferred tier is fast enough again.
+    """
+    if not ROUTING_ENABLED:
+        return [DEFAULT_MODEL]
+    models = []
+    for tier in TIERS[_preferred_index(agent_name):]:
+        if TIER_MODELS[tier] not in models:
+            models.append(TIER_MODELS[tier])
+    return models
+
+
+def route(kwargs: dict, agent_name: str):
+    """Returns (call kwargs with the routed model, tier); tier is None for explicitly chosen models."""
+    if not ROUTING_ENABLED or kwargs.get("model", DEFAULT_MODEL) != DEFAULT_MODEL:
+        _count("pinned")
+        return kwargs, None
+    tier = choose_tier(agent_name)
+    _count("routed")
+    return dict(kwargs, model=TIER_MODELS[tier]), tier
+
+
+def _latency(agent_name: str, tier: str) -> dict:
+    """The agent's latency record on a tier (must hold _LOCK)."""
+    key = (agent_name, tier)
+    if key not in _LATENCY:
+        _LATENCY[key] = {"samples": 0, "ewma_ms": None, "skipped": 0}
+    return _LATENCY[key]
+
+
+def record_call(tier: str, agent_name: str, elapsed_ms: float, ok: bool, usage=None):
+    """Adds one routed call's latency (successful calls only) to its (agent, tier) and its token usage to its tier."""
+    if tier is None:
+        return
+    with _LOCK:
+        stats = _TIER_STATS[tier]
+        stats["calls"] += 1
+        if not ok:
+            stats["errors"] += 1
+            return
+        stats["latency_ms"] += elapsed_ms
+        latency = _latency(agent_name, tier)
+        latency["samples"] += 1
+        latency["ewma_ms"] = elapsed_ms if latency["ewma_ms"] is None else (
+            LATENCY_SMOOTHING * elapsed_ms + (1 - LATENCY_SMOOTHING) * latency["ewma_ms"]
+        )
+        if usage is not None:
+            stats["prompt_tokens"] += getattr(usage, "prompt_token_count", None) or 0
+            stats["response_tokens"] += getattr(usage, "candidates_token_count", None) or 0
+
+
+def _too_slow(agent_name: str, tier: str, budget_ms: float) -> bool:
+    """True if the agent's recent latency on the tier exceeds the budget (except for periodic probe calls)."""
+    with _LOCK:
+        latency = _latency(agent_name, tier)
+        if latency["samples"] < MIN_SAMPLES or latency["ewma_ms"] <= budget_ms:
+            return False
+        latency["skipped"] += 1
+        return latency["skipped"] % PROBE_INTERVAL != 0
+
+
+def _count(name: str):
+    with _LOCK:
+        _STATS[name] += 1
+
+
+def get_router_stats() -> dict:
+    """
+    Returns routing counters, per tier its model, calls, mean latency and tokens, and per
+    "agent/tier" the recent latency the router decides on.
+    """
+    with _LOCK:
+        stats = dict(_STATS)
+        tiers = {tier: dict(tier_stats) for tier, tier_stats in _TIER_STATS.items()}
+        latency = {f"{agent}/{tier}": round(record["ewma_ms"], 1)
+                   for (agent, tier), record in _LATENCY.items() if record["ewma_ms"] is not None}
+    for tier, tier_stats in tiers.items():
+        succeeded = tier_stats["calls"] - tier_stats["errors"]
+        tier_stats["model"] = TIER_MODELS[tier]
+        latency_ms = tier_stats.pop("latency_ms")
+        tier_stats["mean_ms"] = latency_ms / succeeded if succeeded else 0.0
+    stats["tiers"] = tiers
+    stats["recent_latency_ms"] = latency
+    return stats
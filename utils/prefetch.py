@@ -0,0 +1,158 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from utils.resilience import TokenBucket, quota_available, request_deadline
+from utils.tracing import trace_request
+
+# --- Speculative prefetch while the learner reads a lesson ---
+# After a lesson the learner's next request is predictable: an answer to the pending
+# question, or "study next" followed by the next lesson. Prefetch tasks warm that work
+# in the background (grading context, the next topic's lesson in the response cache)
+# and leave their result here for the real request to claim.
+#   * Cancellation: a new prefetch of the same kind for a learner replaces the old one,
+#     and cancel_prefetch() drops all of a learner's tasks (e.g. on a profile switch).
+#   * Budget: every LLM call a prefetch makes takes one unit from a process-wide token
+#     bucket (EDUINDIA_PREFETCH_BUDGET calls per minute). Speculative calls also share the
+#     Gemini rate limiter with the learners' own requests, so a prefetch is skipped unless
+#     at least EDUINDIA_PREFETCH_QUOTA_FLOOR calls' worth of that quota is free; learners
+#     never wait behind speculation for the last tokens.
+#   * Metrics: completed prefetches, hits (claimed by the next request), misses (the
+#     next request wanted something else), cancellations and budget skips.
+PREFETCH_ENABLED = os.getenv("EDUINDIA_PREFETCH", "1") == "1"
+PREFETCH_BUDGET = float(os.getenv("EDUINDIA_PREFETCH_BUDGET", "20"))   # speculative LLM calls per minute
+PREFETCH_QUOTA_FLOOR = float(os.getenv("EDUINDIA_PREFETCH_QUOTA_FLOOR", "5"))  # Gemini calls kept for learners
+PREFETCH_DEADLINE = float(os.getenv("EDUINDIA_PREFETCH_DEADLINE", "60"))  # seconds per task
+PREFETCH_WORKERS = int(os.getenv("EDUINDIA_PREFETCH_WORKERS", "2"))
+
+_EXECUTOR = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="prefetch")
+_BUDGET = TokenBucket(PREFETCH_BUDGET / 60.0, max(1, int(PREFETCH_BUDGET)))
+
+_LOCK = threading.Lock()
+_TASKS = {}    # (learner key, kind) -> PrefetchTask
+_RESULTS = {}  # (learner key, kind) -> (key, value)
+_STATS = {"scheduled": 0, "completed": 0, "hits": 0, "misses": 0, "wasted": 0,
+          "cancelled": 0, "over_budget": 0, "quota_floor": 0, "failed": 0}
+
+
+class PrefetchCancelled(Exception):
+    """Raised inside a prefetch task once it has been cancelled."""
+
+
+class PrefetchTask:
+    """Handle passed to a prefetch function; check() between steps to stop early."""
+
+    def __init__(self, learner_key: str, kind: str):
+        self.learner_key = learner_key
+        self.kind = kind
+        self._cancelled = threading.Event()
+        self.future = None
+
+    def cancel(self):
+        self._cancelled.set()
+        if self.future is not None:
+            self.future.cancel()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def check(self):
+        if self.cancelled:
+            raise PrefetchCancelled()
+
+    def spend(self, calls: int = 1) -> bool:
+        """
+        Takes one budget unit per LLM call the prefetch is about to make; returns False if
+        the budget is used up or the shared Gemini quota is down to the learners' reserve.
+        """
+        self.check()
+        if quota_available() < PREFETCH_QUOTA_FLOOR + calls:
+            skipped = "quota_floor"
+        elif _BUDGET.try_acquire(calls):
+            return True
+        else:
+            skipped = "over_budget"
+        with _LOCK:
+            _STATS[skipped] += 1
+        return False
+
+
+def prefetch(learner_key: str, kind: str, func, *args) -> bool:
+    """
+    Runs func(task, *args) in the background; it returns (key, value) to store for
+    claim() or None if there is nothing to store. Replaces the learner's pending
+    prefetch of the same kind. Returns False if prefetching is disabled.
+    """
+    if not PREFETCH_ENABLED:
+        return False
+    task = PrefetchTask(learner_key, kind)
+    with _LOCK:
+        previous = _TASKS.get((learner_key, kind))
+        _TASKS[(learner_key, kind)] = task
+        _STATS["scheduled"] += 1
+    if previous is not None and (previous.future is None or not previous.future.done()):
+        previous.cancel()
+        with _LOCK:
+            _STATS["cancelled"] += 1
+    task.future = _EXECUTOR.submit(_run, task, func, args)
+    return True
+
+
+def _run(task: PrefetchTask, func, args):
+    if task.cancelled:
+        return
+    try:
+        # Each task is traced as its own request, so its agent spans stay out of the learner's log
+        with trace_request(f"prefetch:{task.kind}"), request_deadline(PREFETCH_DEADLINE):
+            result = func(task, *args)
+    except PrefetchCancelled:
+        return
+    except Exception:
+        with _LOCK:
+            _STATS["failed"] += 1
+        return
+    with _LOCK:
+        if _TASKS.get((task.learner_key, task.kind)) is task:
+            del _TASKS[(task.learner_key, task.kind)]
+        if result is None or task.cancelled:
+            return
+        _STATS["completed"] += 1
+        if (task.learner_key, task.kind) in _RESULTS:
+            _STATS["wasted"] += 1
+        _RESULTS[(task.learner_key, task.kind)] = result
+
+
+def claim(learner_key: str, kind: str, key):
+    """Returns the prefetched value for `key` (counting a hit), or None (counting a miss if something else was prefetched)."""
+    with _LOCK:
+        entry = _RESULTS.pop((learner_key, kind), None)
+        if entry is None:
+            return None
+        stored_key, value = entry
+        if stored_key == key:
+            _STATS["hits"] += 1
+            return value
+        _STATS["misses"] += 1
+        return None
+
+
+def cancel_prefetch(learner_key: str):
+    """Cancels the learner's running prefetches and drops their unclaimed results."""
+    with _LOCK:
+        tasks = [task for (learner, _), task in _TASKS.items() if learner == learner_key]
+        for task in tasks:
+            del _TASKS[(task.learner_key, task.kind)]
+        for result_key in [k for k in _RESULTS if k[0] == learner_key]:
+            del _RESULTS[result_key]
+            _STATS["wasted"] += 1
+        _STATS["cancelled"] += len(tasks)
+    for task in tasks:
+        task.cancel()
+
+
+def get_prefetch_stats() -> dict:
+    """Returns prefetch counters and the share of completed prefetches that were used."""
+    with _LOCK:
+        stats = dict(_STATS, pending=len(_TASKS))
+    stats["hit_rate"] = stats["hits"] / stats["completed"] if stats["completed"] else 0.0
+    return stats
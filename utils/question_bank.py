@@ -0,0 +1,232 @@
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from utils.gemini_client import served_model
+from utils.model_router import current_mastery, mastery_routing
+from utils.response_cache import normalize_input
+from utils.tracing import log, span, trace_request
+
+# --- Pre-generated question bank for TestAgent ---
+# Questions are generated in batches (one LLM call per batch) and stored per concept and
+# difficulty in a local SQLite file. Tests are served from the bank with a local lookup,
+# skipping questions the learner has already been asked. When a concept runs low for a
+# learner, a background worker generates the next batch. Questions are stored under the
+# model that generated them; lookups name the models whose questions are acceptable
+# (utils/model_router.cache_models), like the response cache.
+BANK_DISABLED = os.getenv("EDUINDIA_QUESTION_BANK_DISABLED", "0") == "1"
+BANK_PATH = os.getenv(
+    "EDUINDIA_QUESTION_BANK_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "question_bank.sqlite3")
+)
+BATCH_SIZE = int(os.getenv("EDUINDIA_QUESTION_BATCH", "6"))        # questions per generation call
+LOW_WATERMARK = int(os.getenv("EDUINDIA_QUESTION_BANK_LOW", "2"))  # unseen questions that trigger a refill
+MAX_PER_CONCEPT = int(os.getenv("EDUINDIA_QUESTION_BANK_MAX", "60"))
+REFILL_WORKERS = int(os.getenv("EDUINDIA_QUESTION_REFILL_WORKERS", "2"))
+
+MIN_DIFFICULTY = 1
+MAX_DIFFICULTY = 5
+
+
+def _model_list(models) -> list:
+    return [models] if isinstance(models, str) else list(models)
+
+
+def clamp_difficulty(value) -> int:
+    try:
+        return max(MIN_DIFFICULTY, min(MAX_DIFFICULTY, int(value)))
+    except (TypeError, ValueError):
+        return (MIN_DIFFICULTY + MAX_DIFFICULTY) // 2
+
+
+class QuestionBank:
+    """
+    Question/answer pairs indexed by (concept, model, difficulty), plus which questions
+    each learner has been served. Concepts are normalized like response cache keys, so
+    "Photosynthesis" and "photosynthesis " share one bank.
+    """
+
+    def __init__(self, path: str = BANK_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+        self.stats = {"served": 0, "repeats": 0, "empty": 0, "stored": 0}
+
+    def _db(self) -> sqlite3.Connection:
+        """Opens the database on first use (must hold self._lock)."""
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS questions ("
+                " id INTEGER PRIMARY KEY, concept TEXT NOT NULL, model TEXT NOT NULL,"
+                " difficulty INTEGER NOT NULL, question TEXT NOT NULL, answer TEXT NOT NULL,"
+                " created_at REAL NOT NULL, UNIQUE (concept, model, question))"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS questions_lookup ON questions (concept, model, difficulty)")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS served ("
+                " learner TEXT NOT NULL, question_id INTEGER NOT NULL, served_at REAL NOT NULL,"
+                " PRIMARY KEY (learner, question_id))"
+            )
+            self._conn = db
+        return self._conn
+
+    def add(self, concept: str, model: str, items: list, served_to: str = None) -> int:
+        """
+        Stores generated {'question', 'answer', 'difficulty'} items; returns how many were new.
+        `served_to` names a learner who has already been asked them.
+        """
+        concept = normalize_input(concept)
+        now = time.time()
+        rows = [
+            (concept, model, clamp_difficulty(item.get("difficulty")), item["question"].strip(), item["answer"].strip(), now)
+            for item in items
+            if isinstance(item, dict) and item.get("question") and item.get("answer")
+        ]
+        with self._lock:
+            db = self._db()
+            before = db.total_changes
+            db.executemany(
+                "INSERT OR IGNORE INTO questions (concept, model, difficulty, question, answer, created_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)", rows
+            )
+            added = db.total_changes - before
+            if served_to is not None and rows:
+                db.executemany(
+                    "INSERT OR REPLACE INTO served (learner, question_id, served_at)"
+                    " SELECT ?, id, ? FROM questions WHERE concept = ? AND model = ? AND question = ?",
+                    [(served_to, now, concept, model, row[3]) for row in rows]
+                )
+            self.stats["stored"] += added
+            return added
+
+    def count(self, concept: str, models) -> int:
+        """Questions stored for the concept from `models` (a model name or a list of them)."""
+        models = _model_list(models)
+        with self._lock:
+            return self._db().execute(
+                f"SELECT COUNT(*) FROM questions WHERE concept = ? AND model IN ({', '.join('?' * len(models))})",
+                (normalize_input(concept), *models)
+            ).fetchone()[0]
+
+    def take(self, concept: str, models, learner: str, difficulty: int) -> tuple:
+        """
+        Serves the unseen question from `models` (a model name or a list of them) closest to
+        `difficulty` and marks it as served to the learner. Once the learner has seen every
+        question, the least recently served one is repeated. Returns (item or None if the
+        concept has no questions, unseen left).
+        """
+        concept = normalize_input(concept)
+        models = _model_list(models)
+        in_models = f"IN ({', '.join('?' * len(models))})"
+        with self._lock:
+            db = self._db()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                row = db.execute(
+                    "SELECT id, question, answer, difficulty FROM questions q"
+                    f" WHERE concept = ? AND model {in_models} AND NOT EXISTS"
+                    " (SELECT 1 FROM served s WHERE s.learner = ? AND s.question_id = q.id)"
+                    " ORDER BY ABS(difficulty - ?), RANDOM() LIMIT 1",
+                    (concept, *models, learner, difficulty)
+                ).fetchone()
+                repeated = row is None
+                if repeated:
+                    row = db.execute(
+                        "SELECT q.id, q.question, q.answer, q.difficulty FROM questions q"
+                        " JOIN served s ON s.question_id = q.id AND s.learner = ?"
+                        f" WHERE q.concept = ? AND q.model {in_models} ORDER BY s.served_at LIMIT 1",
+                        (learner, concept, *models)
+                    ).fetchone()
+                if row is None:
+                    self.stats["empty"] += 1
+                    db.execute("COMMIT")
+                    return None, 0
+
+                db.execute(
+                    "INSERT OR REPLACE INTO served (learner, question_id, served_at) VALUES (?, ?, ?)",
+                    (learner, row[0], time.time())
+                )
+                unseen = db.execute(
+                    f"SELECT COUNT(*) FROM questions q WHERE concept = ? AND model {in_models} AND NOT EXISTS"
+                    " (SELECT 1 FROM served s WHERE s.learner = ? AND s.question_id = q.id)",
+                    (concept, *models, learner)
+                ).fetchone()[0]
+                db.execute("COMMIT")
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+            self.stats["served"] += 1
+            if repeated:
+                self.stats["repeats"] += 1
+            return {"question": row[1], "answer": row[2], "difficulty": row[3]}, unseen
+
+
+_BANK = None
+_BANK_LOCK = threading.Lock()
+
+# --- Background refill ---
+# At most one refill per concept is queued or running at a time.
+_REFILL_EXECUTOR = ThreadPoolExecutor(max_workers=REFILL_WORKERS, thread_name_prefix="question-refill")
+_REFILLING = set()
+_REFILL_LOCK = threading.Lock()
+_REFILL_STATS = {"refills": 0, "refill_failures": 0}
+
+
+def get_question_bank() -> QuestionBank:
+    """Returns the process-wide question bank."""
+    global _BANK
+    with _BANK_LOCK:
+        if _BANK is None:
+            _BANK = QuestionBank()
+        return _BANK
+
+
+def request_refill(concept: str, models, generate) -> bool:
+    """
+    Queues generate(concept) -> list of items on the refill worker, unless a refill for the
+    concept is already pending or its bank of questions from `models` is full. The refill
+    is routed by the requesting learner's mastery, so it generates questions they accept.
+    Returns True if a refill was queued.
+    """
+    models = _model_list(models)
+    key = (normalize_input(concept), tuple(models))
+    with _REFILL_LOCK:
+        if key in _REFILLING or get_question_bank().count(concept, models) >= MAX_PER_CONCEPT:
+            return False
+        _REFILLING.add(key)
+    _REFILL_EXECUTOR.submit(_refill, key, concept, current_mastery(), generate)
+    return True
+
+
+def _refill(key: tuple, concept: str, mastery, generate):
+    # Traced as its own request; the span name also selects the refill's model tier (utils/model_router.py)
+    with trace_request(f"refill:{concept}"), span("QuestionBankRefill"), mastery_routing(mastery):
+        _run_refill(key, concept, generate)
+
+
+def _run_refill(key: tuple, concept: str, generate):
+    try:
+        items = generate(concept)
+        added = get_question_bank().add(concept, served_model(), items)
+        with _REFILL_LOCK:
+            _REFILL_STATS["refills"] += 1
+        log(f"📚 Question bank: Added {added} questions for '{concept}'")
+    except Exception as e:
+        with _REFILL_LOCK:
+            _REFILL_STATS["refill_failures"] += 1
+        log(f"⚠️ Question bank: Refill for '{concept}' failed: {e}")
+    finally:
+        with _REFILL_LOCK:
+            _REFILLING.discard(key)
+
+
+def get_question_bank_stats() -> dict:
+    """Returns serving and refill counters."""
+    with _REFILL_LOCK:
+        stats = dict(_REFILL_STATS, pending_refills=len(_REFILLING))
+    stats.update(get_question_bank().stats)
+    return stats
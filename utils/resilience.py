@@ -0,0 +1,307 @@
+import contextvars
+import functools
+import inspect
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from contextlib import contextmanager
+
+# --- Resilient LLM call layer: rate limiting, retries, deadlines, hedging, circuit breaking ---
+# Used by utils/gemini_client.py for every Gemini call made by the specialized agents.
+GEMINI_RPM = float(os.getenv("GEMINI_RPM", "60"))              # sustained requests per minute (our quota)
+GEMINI_BURST = int(os.getenv("GEMINI_BURST", "10"))            # requests allowed back to back
+GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "3"))
+GEMINI_BACKOFF_BASE = float(os.getenv("GEMINI_BACKOFF_BASE", "0.5"))  # seconds
+GEMINI_BACKOFF_MAX = float(os.getenv("GEMINI_BACKOFF_MAX", "8"))
+GEMINI_HEDGE_AFTER = float(os.getenv("GEMINI_HEDGE_AFTER", "0"))      # seconds; 0 disables hedging
+BREAKER_FAILURES = int(os.getenv("GEMINI_BREAKER_FAILURES", "5"))     # consecutive failures to open
+BREAKER_COOLDOWN = float(os.getenv("GEMINI_BREAKER_COOLDOWN", "30"))  # seconds before a trial call
+REQUEST_DEADLINE = float(os.getenv("EDUINDIA_REQUEST_DEADLINE", "90"))  # seconds per user request
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+_DEADLINE = contextvars.ContextVar("eduindia_deadline", default=None)  # time.monotonic() value
+
+_STATS_LOCK = threading.Lock()
+_STATS = {
+    "attempts": 0,
+    "retries": 0,
+    "rate_limited_waits": 0,
+    "hedges_fired": 0,
+    "hedges_won": 0,
+    "deadline_exceeded": 0,
+    "breaker_rejections": 0,
+}
+
+
+def _count(name: str, amount: int = 1):
+    with _STATS_LOCK:
+        _STATS[name] += amount
+
+
+class DeadlineExceeded(TimeoutError):
+    """The user request's deadline passed before the LLM call could complete."""
+
+
+class CircuitOpenError(RuntimeError):
+    """The backend is failing; calls fail fast until the cool-down has passed."""
+
+
+# --- Deadlines ---
+@contextmanager
+def request_deadline(seconds: float):
+    """Sets a deadline for everything in this context (an existing, earlier deadline wins)."""
+    new_deadline = time.monotonic() + seconds
+    current = _DEADLINE.get()
+    token = _DEADLINE.set(new_deadline if current is None else min(current, new_deadline))
+    try:
+        yield
+    finally:
+        try:
+            _DEADLINE.reset(token)
+        except ValueError:
+            _DEADLINE.set(current)
+
+
+def with_request_deadline(seconds: float = None):
+    """Decorator that runs an agent (or streaming generator) under a request deadline."""
+    def decorator(func):
+        if inspect.isgeneratorfunction(func):
+            @functools.wraps(func)
+            def generator_wrapper(*args, **kwargs):
+                with request_deadline(REQUEST_DEADLINE if seconds is None else seconds):
+                    yield from func(*args, **kwargs)
+            return generator_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with request_deadline(REQUEST_DEADLINE if seconds is None else seconds):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def remaining_time():
+    """Seconds left before the current request's deadline, or None if there is none."""
+    deadline = _DEADLINE.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def _check_deadline():
+    remaining = remaining_time()
+    if remaining is not None and remaining <= 0:
+        _count("deadline_exceeded")
+        raise DeadlineExceeded("The request deadline passed before the LLM call completed.")
+    return remaining
+
+
+# --- Client-side rate limiting ---
+class TokenBucket:
+    """Token-bucket rate limiter: `rate` tokens per second, up to `capacity` saved up."""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, amount: int = 1) -> bool:
+        """Takes `amount` tokens if they are all available now; never waits."""
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= amount:
+                self._tokens -= amount
+                return True
+            return False
+
+    def available(self) -> float:
+        """Tokens available right now."""
+        with self._lock:
+            self._refill(time.monotonic())
+            return self._tokens
+
+    def acquire(self, timeout: float = None) -> bool:
+        """Waits for a token; returns False if none is available within `timeout` seconds."""
+        end = None if timeout is None else time.monotonic() + timeout
+        waited = False
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    if waited:
+                        _count("rate_limited_waits")
+                    return True
+                sleep_for = (1 - self._tokens) / self.rate
+            if end is not None and now + sleep_for > end:
+                return False
+            waited = True
+            time.sleep(sleep_for)
+
+
+# --- Circuit breaker ---
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive retryable failures and rejects calls
+    for `cooldown` seconds; then lets one trial call through (half-open) and closes
+    again if it succeeds.
+    """
+
+    def __init__(self, failure_threshold: int, cooldown: float):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.cooldown:
+                return "half-open"
+            return "open"
+
+    def allow(self) -> bool:
+        """Raises CircuitOpenError if the call must fail fast; returns True if it is the half-open trial."""
+        with self._lock:
+            if self._opened_at is None:
+                return False
+            if time.monotonic() - self._opened_at >= self.cooldown and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+        _count("breaker_rejections")
+        raise CircuitOpenError("The Gemini backend is degraded; failing fast. Please try again shortly.")
+
+    def release_trial(self):
+        """Gives the trial slot back when the trial call never reached the backend."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+
+_BUCKET = TokenBucket(GEMINI_RPM / 60.0, GEMINI_BURST)
+_BREAKER = CircuitBreaker(BREAKER_FAILURES, BREAKER_COOLDOWN)
+_HEDGE_EXECUTOR = ThreadPoolExecutor(max_workers=int(os.getenv("GEMINI_HEDGE_WORKERS", "16")),
+                                     thread_name_prefix="gemini-hedge")
+
+
+def quota_available() -> float:
+    """Gemini calls that could start right now without waiting for the shared rate limiter."""
+    return _BUCKET.available()
+
+
+def is_retryable(error: Exception) -> bool:
+    """429s, 5xx responses, timeouts and connection errors are worth retrying."""
+    if isinstance(error, (DeadlineExceeded, CircuitOpenError)):
+        return False
+    code = getattr(error, "code", None)
+    if isinstance(code, int):
+        return code in RETRYABLE_STATUS
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    # httpx is only loaded once a real Gemini client exists, so check it lazily
+    httpx = sys.modules.get("httpx")
+    return httpx is not None and isinstance(error, (httpx.TimeoutException, httpx.TransportError))
+
+
+def backoff_delay(attempt: int) -> float:
+    """Exponential backoff with full jitter."""
+    return random.uniform(0, min(GEMINI_BACKOFF_MAX, GEMINI_BACKOFF_BASE * (2 ** attempt)))
+
+
+def _hedged(attempt_fn, timeout: float):
+    """Runs attempt_fn; if it is slow, fires one duplicate and returns whichever finishes first."""
+    primary = _HEDGE_EXECUTOR.submit(contextvars.copy_context().run, attempt_fn, timeout)
+    done, _ = wait([primary], timeout=GEMINI_HEDGE_AFTER)
+    if done or not _BUCKET.try_acquire():
+        return primary.result()
+
+    _count("hedges_fired")
+    hedge = _HEDGE_EXECUTOR.submit(contextvars.copy_context().run, attempt_fn, timeout)
+    pending = {primary, hedge}
+    first_error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                if future is hedge:
+                    _count("hedges_won")
+                return future.result()
+            first_error = first_error or future.exception()
+    raise first_error
+
+
+def call_with_resilience(attempt_fn, hedge: bool = True):
+    """
+    Calls attempt_fn(timeout_seconds) under the shared rate limiter and circuit breaker,
+    retrying retryable errors with jittered exponential backoff until the request deadline.
+    """
+    attempt = 0
+    while True:
+        trial = _BREAKER.allow()
+        try:
+            remaining = _check_deadline()
+            if not _BUCKET.acquire(timeout=remaining):
+                _count("deadline_exceeded")
+                raise DeadlineExceeded("The request deadline passed while waiting for the Gemini rate limit.")
+        except BaseException:
+            # The call never reached the backend, so it says nothing about its health
+            if trial:
+                _BREAKER.release_trial()
+            raise
+
+        _count("attempts")
+        try:
+            if hedge and GEMINI_HEDGE_AFTER > 0:
+                result = _hedged(attempt_fn, remaining_time())
+            else:
+                result = attempt_fn(remaining_time())
+        except Exception as e:
+            if not is_retryable(e):
+                # The backend answered (e.g. a 400), so it is not degraded
+                _BREAKER.record_success()
+                raise
+            _BREAKER.record_failure()
+            delay = backoff_delay(attempt)
+            remaining = remaining_time()
+            if attempt >= GEMINI_MAX_RETRIES or (remaining is not None and delay >= remaining):
+                raise
+            attempt += 1
+            _count("retries")
+            time.sleep(delay)
+            continue
+
+        _BREAKER.record_success()
+        return result
+
+
+def get_resilience_stats() -> dict:
+    """Returns retry, hedging, rate-limit and circuit-breaker counters."""
+    with _STATS_LOCK:
+        stats = dict(_STATS)
+    stats["breaker_state"] = _BREAKER.state
+    return stats
@@ -0,0 +1,196 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from utils.model_router import DEFAULT_MODEL, TIER_MODELS
+
+# --- Two-tier response cache for agent LLM calls ---
+# Tier 1: per-agent in-memory LRU with TTL (microseconds, per process).
+# Tier 2: local SQLite file shared across restarts/processes (milliseconds).
+# Keys are built from the agent name, the model that served the call and the normalized
+# prompt inputs, so only agents whose output depends solely on those inputs should use
+# the cache. Lookups name the models whose responses are acceptable for the current call
+# (utils/model_router.cache_models), since calls are routed across model tiers.
+CACHE_DISABLED = os.getenv("EDUINDIA_CACHE_DISABLED", "0") == "1"
+CACHE_PATH = os.getenv(
+    "EDUINDIA_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "agent_responses.sqlite3")
+)
+
+DAY = 24 * 60 * 60
+
+# Per-agent eviction policies: TTL in seconds, in-memory LRU size, on-disk row cap.
+CACHE_POLICIES = {
+    "SubjectAgent": {"ttl": 30 * DAY, "max_entries": 500, "max_disk_entries": 20000, "persist": True},
+    "ContentGeneratorAgent": {"ttl": 7 * DAY, "max_entries": 2000, "max_disk_entries": 100000, "persist": True},
+}
+PRUNE_EVERY = 100  # disk-tier pruning runs once per this many stores per agent
+DEFAULT_POLICY = {"ttl": 1 * DAY, "max_entries": 256, "max_disk_entries": 10000, "persist": False}
+
+_LOCK = threading.Lock()
+_MEMORY = {}          # agent -> OrderedDict(key -> (value, expires_at))
+_CHECKED = set()      # agents whose responses from retired models were dropped in this process
+_STATS = {}           # agent -> counters
+_DB = None
+
+
+def _policy(agent: str) -> dict:
+    return CACHE_POLICIES.get(agent, DEFAULT_POLICY)
+
+
+def _stats(agent: str) -> dict:
+    if agent not in _STATS:
+        _STATS[agent] = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+    return _STATS[agent]
+
+
+def normalize_input(value) -> str:
+    """Case- and whitespace-folds a prompt input so trivially different requests share a key."""
+    return re.sub(r"\s+", " ", str(value)).strip().lower()
+
+
+def cache_key(agent: str, model: str, inputs: tuple) -> str:
+    payload = json.dumps([agent, model, [normalize_input(v) for v in inputs]], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _get_db():
+    """Opens the SQLite tier on first use (WAL mode so readers never block the writer)."""
+    global _DB
+    if _DB is None:
+        os.makedirs(os.path.dirname(CACHE_PATH), exist_ok=True)
+        db = sqlite3.connect(CACHE_PATH, check_same_thread=False, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, agent TEXT NOT NULL, model TEXT NOT NULL,"
+            " value TEXT NOT NULL, created_at REAL NOT NULL, expires_at REAL NOT NULL)"
+        )
+        db.execute("CREATE INDEX IF NOT EXISTS responses_agent_created ON responses (agent, created_at)")
+        _DB = db
+    return _DB
+
+
+def _drop_retired_models(agent: str):
+    """Drops an agent's stored responses from models no tier uses any more, once per process (must hold _LOCK)."""
+    if agent in _CHECKED:
+        return
+    _CHECKED.add(agent)
+    if _policy(agent)["persist"]:
+        models = sorted(set(TIER_MODELS.values()) | {DEFAULT_MODEL})
+        _get_db().execute(
+            f"DELETE FROM responses WHERE agent = ? AND model NOT IN ({', '.join('?' * len(models))})",
+            (agent, *models)
+        )
+
+
+def get_cached(agent: str, models, *inputs):
+    """
+    Returns the cached response for these inputs, or None on a miss. `models` is a model
+    name or a list of model names whose responses are acceptable, in order of preference.
+    """
+    if CACHE_DISABLED:
+        return None
+    keys = [cache_key(agent, model, inputs) for model in ([models] if isinstance(models, str) else models)]
+    now = time.time()
+
+    with _LOCK:
+        _drop_retired_models(agent)
+        stats = _stats(agent)
+        memory = _MEMORY.setdefault(agent, OrderedDict())
+
+        # 1. Memory tier
+        for key in keys:
+            entry = memory.get(key)
+            if entry is None:
+                continue
+            value, expires_at = entry
+            if expires_at > now:
+                memory.move_to_end(key)
+                stats["memory_hits"] += 1
+                return value
+            del memory[key]
+
+        # 2. Disk tier (promote hits into memory)
+        if _policy(agent)["persist"]:
+            for key in keys:
+                row = _get_db().execute(
+                    "SELECT value, expires_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and row[1] > now:
+                    _remember(agent, key, row[0], row[1])
+                    stats["disk_hits"] += 1
+                    return row[0]
+
+        stats["misses"] += 1
+        return None
+
+
+def _remember(agent: str, key: str, value: str, expires_at: float):
+    """Inserts into the agent's memory LRU, evicting the oldest entries (must hold _LOCK)."""
+    memory = _MEMORY.setdefault(agent, OrderedDict())
+    memory[key] = (value, expires_at)
+    memory.move_to_end(key)
+    while len(memory) > _policy(agent)["max_entries"]:
+        memory.popitem(last=False)
+        _stats(agent)["evictions"] += 1
+
+
+def put_cached(agent: str, model: str, value: str, *inputs):
+    """Stores a successful response from `model` in both tiers according to the agent's policy."""
+    if CACHE_DISABLED:
+        return
+    policy = _policy(agent)
+    key = cache_key(agent, model, inputs)
+    now = time.time()
+    expires_at = now + policy["ttl"]
+
+    with _LOCK:
+        _drop_retired_models(agent)
+        _remember(agent, key, value, expires_at)
+        _stats(agent)["stores"] += 1
+        if policy["persist"]:
+            db = _get_db()
+            db.execute(
+                "INSERT OR REPLACE INTO responses (key, agent, model, value, created_at, expires_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (key, agent, model, value, now, expires_at)
+            )
+            # Keep the on-disk tier bounded: periodically drop expired rows, then the oldest beyond the cap
+            if _stats(agent)["stores"] % PRUNE_EVERY:
+                return
+            db.execute("DELETE FROM responses WHERE agent = ? AND expires_at <= ?", (agent, now))
+            db.execute(
+                "DELETE FROM responses WHERE agent = ? AND key NOT IN ("
+                " SELECT key FROM responses WHERE agent = ? ORDER BY created_at DESC LIMIT ?)",
+                (agent, agent, policy["max_disk_entries"])
+            )
+
+
+def invalidate(agent: str = None):
+    """Clears the cache for one agent, or for all agents if none is given."""
+    with _LOCK:
+        if agent is None:
+            _MEMORY.clear()
+        else:
+            _MEMORY.pop(agent, None)
+        if os.path.exists(CACHE_PATH):
+            if agent is None:
+                _get_db().execute("DELETE FROM responses")
+            else:
+                _get_db().execute("DELETE FROM responses WHERE agent = ?", (agent,))
+
+
+def get_cache_stats() -> dict:
+    """Returns hit/miss counters per agent, including the overall hit rate."""
+    with _LOCK:
+        result = {}
+        for agent, stats in _STATS.items():
+            lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+            hits = stats["memory_hits"] + stats["disk_hits"]
+            result[agent] = dict(stats, hit_rate=hits / lookups if lookups else 0.0)
+        return result
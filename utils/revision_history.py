@@ -0,0 +1,99 @@
+import json
+import os
+import threading
+import time
+
+# --- Compact, bounded revision history ---
+# Each concept in a learner's `revision_history` is a small fixed-size record:
+#   {"count": int, "first": float, "last": float, "recent": [float, ...], "head": int}
+# `recent` is a ring buffer of the last RECENT_REVIEWS timestamps (`head` is the slot
+# written next once it is full), so memory per concept is constant and the common
+# reads (times studied, first/last studied) are O(1). Full history, when needed, goes
+# to an optional append-only event log instead (EDUINDIA_REVISION_LOG).
+RECENT_REVIEWS = int(os.getenv("EDUINDIA_RECENT_REVIEWS", "8"))
+REVISION_LOG_PATH = os.getenv("EDUINDIA_REVISION_LOG")
+
+_LOG_LOCK = threading.Lock()
+
+
+def as_record(entry) -> dict:
+    """Returns the compact record for a history entry, converting the legacy list-of-timestamps format."""
+    if isinstance(entry, dict):
+        return entry
+    timestamps = list(entry or [])
+    recent = timestamps[-RECENT_REVIEWS:]
+    return {
+        "count": len(timestamps),
+        "first": timestamps[0] if timestamps else None,
+        "last": timestamps[-1] if timestamps else None,
+        "recent": recent,
+        "head": 0,
+    }
+
+
+def record_review(revision_history: dict, concept: str, timestamp: float = None) -> dict:
+    """Records one study of `concept` in place and returns its updated record."""
+    timestamp = time.time() if timestamp is None else timestamp
+    record = as_record(revision_history.get(concept, []))
+
+    record["count"] += 1
+    if record["first"] is None:
+        record["first"] = timestamp
+    record["last"] = timestamp
+
+    recent = record["recent"]
+    if len(recent) < RECENT_REVIEWS:
+        recent.append(timestamp)
+    else:
+        # Ring buffer is full: overwrite the oldest slot
+        head = record.get("head", 0) % len(recent)
+        recent[head] = timestamp
+        record["head"] = (head + 1) % len(recent)
+
+    revision_history[concept] = record
+    return record
+
+
+def study_count(entry) -> int:
+    return as_record(entry)["count"]
+
+
+def first_studied(entry):
+    return as_record(entry)["first"]
+
+
+def last_studied(entry):
+    return as_record(entry)["last"]
+
+
+def recent_reviews(entry) -> list:
+    """Returns the buffered recent review timestamps, oldest first."""
+    record = as_record(entry)
+    recent = record["recent"]
+    if len(recent) < RECENT_REVIEWS:
+        return list(recent)
+    head = record.get("head", 0) % len(recent)
+    return recent[head:] + recent[:head]
+
+
+def append_event(learner_key: str, concept: str, timestamp: float, event: str = "study"):
+    """Appends a review event to the full-history log, if EDUINDIA_REVISION_LOG is set."""
+    if not REVISION_LOG_PATH:
+        return
+    line = json.dumps({"learner": learner_key, "concept": concept, "event": event, "timestamp": timestamp},
+                      ensure_ascii=False)
+    with _LOG_LOCK:
+        with open(REVISION_LOG_PATH, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+def read_events(learner_key: str = None, path: str = None):
+    """Yields events from the full-history log, optionally for one learner only."""
+    path = path or REVISION_LOG_PATH
+    if not path or not os.path.exists(path):
+        return
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            event = json.loads(line)
+            if learner_key is None or event["learner"] == learner_key:
+                yield event
@@ -0,0 +1,227 @@
+import argparse
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+from utils.revision_history import as_record
+from utils.spaced_repetition import due_time
+from utils.tracing import log, span, trace_request
+
+# --- Fleet-wide revision planner (offline job) ---
+# Run ahead of the morning peak (e.g. nightly from cron) with `python -m utils.revision_planner`:
+#   1. every learner's revision history is loaded into the cohort analytics columns and
+#      each learner's next PLAN_TOP_K concepts are found with one vectorized sort; the
+#      plans are written to a SQLite file in one transaction;
+#   2. the concepts due for the most learners within EDUINDIA_PLAN_HORIZON_HOURS are found
+#      per (background, location, language) group, and their lessons (core explanation +
+#      localized analogy) are generated into the response cache, at most
+#      EDUINDIA_PLAN_WARM_BUDGET lessons per run.
+# SchedulerAgent answers "study next" from the stored plan while it still matches the
+# learner's history (same concepts and due times); after the learner studies or is
+# graded it falls back to their live due queue.
+PLAN_PATH = os.getenv(
+    "EDUINDIA_PLAN_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "revision_plans.sqlite3")
+)
+PLAN_TOP_K = int(os.getenv("EDUINDIA_PLAN_TOP_K", "5"))
+HORIZON_HOURS = float(os.getenv("EDUINDIA_PLAN_HORIZON_HOURS", "24"))
+WARM_PER_GROUP = int(os.getenv("EDUINDIA_PLAN_WARM_PER_GROUP", "3"))
+WARM_BUDGET = int(os.getenv("EDUINDIA_PLAN_WARM_BUDGET", "100"))
+
+# Localized lessons are cached per (background, location, language), so warming is too
+WARM_GROUP_BY = ("background", "location", "language")
+
+
+class PlanStore:
+    """Each learner's latest precomputed plan: their next concepts and a signature of the history it came from."""
+
+    def __init__(self, path: str = PLAN_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+        self.stats = {"served": 0, "stale": 0, "missing": 0}
+
+    def _db(self) -> sqlite3.Connection:
+        """Opens the database on first use (must hold self._lock)."""
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS plans ("
+                " learner TEXT PRIMARY KEY, planned_at REAL NOT NULL,"
+                " concepts INTEGER NOT NULL, due_sum REAL NOT NULL, plan TEXT NOT NULL)"
+            )
+            self._conn = db
+        return self._conn
+
+    def save(self, plans: list, planned_at: float):
+        """Replaces the stored plans with (learner key, concepts, due sum, [(due, concept), ...]) tuples."""
+        rows = ((learner_key, planned_at, concepts, due_sum, json.dumps(plan))
+                for learner_key, concepts, due_sum, plan in plans)
+        with self._lock:
+            db = self._db()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                db.execute("DELETE FROM plans")
+                db.executemany(
+                    "INSERT INTO plans (learner, planned_at, concepts, due_sum, plan) VALUES (?, ?, ?, ?, ?)", rows
+                )
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+
+    def candidates(self, learner_key: str, revision_history: dict, k: int):
+        """
+        Returns the learner's planned next `k` (due, concept) pairs, or None if there is no
+        plan or their history changed since it was made (so the caller uses the live queue).
+        """
+        with self._lock:
+            row = self._db().execute(
+                "SELECT concepts, due_sum, plan FROM plans WHERE learner = ?", (learner_key,)
+            ).fetchone()
+        if row is None:
+            self._count("missing")
+            return None
+        concepts, due_sum, plan = row
+        # Every study or grade moves a due time, so the count and sum of due times identify the history
+        current_sum = sum(due_time(as_record(entry)) for entry in revision_history.values())
+        if len(revision_history) != concepts or not math.isclose(current_sum, due_sum, rel_tol=0, abs_tol=1e-3):
+            self._count("stale")
+            return None
+        plan = [(due, concept) for due, concept in json.loads(plan)]
+        if len(plan) < min(k, concepts):
+            self._count("stale")
+            return None
+        self._count("served")
+        return plan[:k]
+
+    def _count(self, name: str):
+        with self._lock:
+            self.stats[name] += 1
+
+
+_PLANS = None
+_PLANS_LOCK = threading.Lock()
+_LAST_RUN = {}
+
+
+def get_plan_store() -> PlanStore:
+    global _PLANS
+    with _PLANS_LOCK:
+        if _PLANS is None:
+            _PLANS = PlanStore()
+        return _PLANS
+
+
+def _warm_lessons(demand: dict, directory, store, budget: int) -> tuple:
+    """
+    Generates the lessons in `demand` ({group: [(concept, learners), ...]}) into the response
+    cache; returns (lessons warmed, steps that timed out).
+    """
+    # Imported here so the planner's plan-only runs never load the agents or the SDK
+    from specialized_agents.subject_test import SubjectAgent
+    from specialized_agents.content_generator import ContentGeneratorAgent
+    from utils.agent_graph import AgentStep, run_agent_graph
+    from utils.model_router import cache_models
+    from utils.response_cache import get_cached
+    from utils.state_manager import LearnerSession
+
+    # The most demanded (group, concept) pairs across the fleet, within the budget
+    wanted = sorted(
+        ((learners, group, concept) for group, concepts in demand.items() for concept, learners in concepts),
+        key=lambda item: -item[0]
+    )[:budget]
+
+    def explain(concept):
+        explanation = SubjectAgent(concept)
+        # Only explanations that made it into the cache are worth localizing
+        return explanation if get_cached("SubjectAgent", cache_models("SubjectAgent"), concept) is not None else None
+
+    def localize(group, explanation):
+        if explanation is None:
+            return False
+        background, location, language = group
+        learner_key = directory.find(limit=1, background=background, location=location, language=language)
+        if not learner_key:
+            return False
+        ContentGeneratorAgent(explanation, LearnerSession(store, learner_key[0]))
+        return True
+
+    concepts = sorted({concept for _, _, concept in wanted})
+    steps = [AgentStep(f"explain:{concept}", lambda concept=concept: explain(concept), fallback=None)
+             for concept in concepts]
+    steps += [AgentStep(f"localize:{i}", lambda explanation, group=group: localize(group, explanation),
+                        depends_on=(f"explain:{concept}",), fallback=False)
+              for i, (_, group, concept) in enumerate(wanted)]
+    results, failures = run_agent_graph(steps)
+    timed_out = sum(1 for error in failures.values() if isinstance(error, TimeoutError))
+    return sum(1 for i in range(len(wanted)) if results[f"localize:{i}"]), timed_out
+
+
+def plan_fleet(store=None, now: float = None, warm: bool = True, warm_budget: int = WARM_BUDGET) -> dict:
+    """Plans every learner's next revisions and (optionally) warms the most demanded lessons; returns a summary."""
+    from utils.cohort_analytics import get_cohort_analytics
+    from utils.state_manager import get_state_store
+    store = get_state_store() if store is None else store
+    now = time.time() if now is None else now
+    analytics = get_cohort_analytics(store)
+    summary = {"planned_at": now}
+
+    with trace_request("revision planner"), span("RevisionPlanner"):
+        start = time.perf_counter()
+        analytics.refresh(force=True)
+        plans = analytics.due_plans(PLAN_TOP_K)
+        summary["plan_ms"] = (time.perf_counter() - start) * 1000
+        summary["learners"] = len(store.directory)
+        summary["planned"] = len(plans)
+        summary["due_now"] = sum(1 for _, _, _, plan in plans if plan[0][0] <= now)
+
+        start = time.perf_counter()
+        get_plan_store().save(plans, now)
+        summary["save_ms"] = (time.perf_counter() - start) * 1000
+
+        demand = analytics.due_demand(now + HORIZON_HOURS * 3600, group_by=WARM_GROUP_BY, limit=WARM_PER_GROUP)
+        summary["groups"] = sum(1 for concepts in demand.values() if concepts)
+        summary["warmed"] = summary["warm_timeouts"] = 0
+        if warm and warm_budget > 0:
+            start = time.perf_counter()
+            summary["warmed"], summary["warm_timeouts"] = _warm_lessons(demand, store.directory, store, warm_budget)
+            summary["warm_ms"] = (time.perf_counter() - start) * 1000
+
+    log(f"🗓️ RevisionPlanner: Planned {summary['planned']} learners, warmed {summary['warmed']} lessons "
+        f"({summary['warm_timeouts']} steps timed out)")
+    with _PLANS_LOCK:
+        _LAST_RUN.clear()
+        _LAST_RUN.update(summary)
+    return summary
+
+
+def get_planner_stats() -> dict:
+    """Returns how "study next" requests were served (plan / stale / missing) and this process's last run."""
+    with _PLANS_LOCK:
+        plans, last_run = _PLANS, dict(_LAST_RUN)
+    stats = dict(plans.stats) if plans is not None else {"served": 0, "stale": 0, "missing": 0}
+    lookups = sum(stats.values())
+    stats["plan_hit_rate"] = stats["served"] / lookups if lookups else 0.0
+    stats["last_run"] = last_run
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precompute revision plans for every learner and warm the "
+                                                 "most demanded lessons.")
+    parser.add_argument("--no-warm", action="store_true", help="Only compute and store the plans.")
+    parser.add_argument("--warm-budget", type=int, default=WARM_BUDGET, help="Most lessons to generate.")
+    args = parser.parse_args(argv)
+    summary = plan_fleet(warm=not args.no_warm, warm_budget=args.warm_budget)
+    print(f"Planned {summary['planned']} of {summary['learners']} learners ({summary['due_now']} with a review due now) "
+          f"in {summary['plan_ms'] + summary['save_ms']:.0f} ms; warmed {summary['warmed']} lessons "
+          f"for {summary['groups']} groups ({summary['warm_timeouts']} warming steps timed out).")
+
+
+if __name__ == "__main__":
+    main()
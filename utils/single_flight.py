@@ -0,0 +1,151 @@
+import threading
+
+# --- Single-flight coalescing of identical in-flight agent calls ---
+# When many learners ask for the same thing at the same time (a classroom typing
+# "explain photosynthesis"), only the first call goes to the LLM; identical calls that
+# arrive while it is in flight wait for it and share its result. Streamed calls are
+# coalesced too: followers replay the chunks the leader has produced so far, then receive
+# the rest as they arrive.
+
+
+class _Call:
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class _Stream:
+    __slots__ = ("changed", "chunks", "done", "error")
+
+    def __init__(self):
+        self.changed = threading.Condition()
+        self.chunks = []
+        self.done = False
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one execution."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._streams = {}
+        self.calls = 0
+        self.collapsed = 0
+
+    def do(self, key: str, fn) -> tuple:
+        """Runs fn() unless an identical call is in flight. Returns (result, shared)."""
+        with self._lock:
+            self.calls += 1
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._inflight[key] = call
+            else:
+                self.collapsed += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            call.event.set()
+        return call.result, False
+
+    def stream(self, key: str, make_iterator, on_join=None):
+        """
+        Generator variant of do(): yields the chunks of make_iterator() unless an identical
+        streamed call is in flight, in which case it calls on_join() and yields that call's chunks.
+        """
+        with self._lock:
+            self.calls += 1
+            call = self._streams.get(key)
+            leader = call is None
+            if leader:
+                call = self._streams[key] = _Stream()
+            else:
+                self.collapsed += 1
+
+        if not leader:
+            if on_join is not None:
+                on_join()
+            yield from self._follow(call)
+            return
+
+        finished = False
+        try:
+            for chunk in make_iterator():
+                with call.changed:
+                    call.chunks.append(chunk)
+                    call.changed.notify_all()
+                yield chunk
+            finished = True
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            if not finished and call.error is None:
+                call.error = RuntimeError(f"The shared {self.name} call was abandoned before it finished.")
+            with self._lock:
+                del self._streams[key]
+            with call.changed:
+                call.done = True
+                call.changed.notify_all()
+
+    @staticmethod
+    def _follow(call: _Stream):
+        seen = 0
+        while True:
+            with call.changed:
+                call.changed.wait_for(lambda: call.done or len(call.chunks) > seen)
+                chunks = call.chunks[seen:]
+                done, error = call.done, call.error
+            yield from chunks
+            seen += len(chunks)
+            if done and seen == len(call.chunks):
+                if error is not None:
+                    raise error
+                return
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "executions": self.calls - self.collapsed,
+                "collapsed": self.collapsed,
+                "in_flight": len(self._inflight) + len(self._streams),
+            }
+
+
+_GROUPS = {}
+_GROUPS_LOCK = threading.Lock()
+
+
+def get_single_flight(name: str) -> SingleFlight:
+    """Returns the process-wide single-flight group for an agent."""
+    with _GROUPS_LOCK:
+        if name not in _GROUPS:
+            _GROUPS[name] = SingleFlight(name)
+        return _GROUPS[name]
+
+
+def get_single_flight_stats() -> dict:
+    """Returns per-agent call counts, including how many calls were collapsed."""
+    with _GROUPS_LOCK:
+        groups = list(_GROUPS.values())
+    return {group.name: group.stats() for group in groups}
@@ -0,0 +1,153 @@
+import heapq
+import threading
+import time
+import weakref
+from utils.revision_history import as_record
+
+# --- Local SM-2 spaced-repetition engine ---
+# Scheduling fields live in each concept's revision record (see utils/revision_history.py):
+#   ease (float), interval (days), reps (consecutive successful reviews), due (timestamp).
+# Lessons start a concept's schedule; graded answers move it with the SM-2 update rule.
+DAY = 24 * 60 * 60
+DEFAULT_EASE = 2.5
+MIN_EASE = 1.3
+
+# AnswerAgent scores (0-3) mapped to SM-2 response quality (0-5)
+SCORE_TO_QUALITY = {0: 1, 1: 3, 2: 4, 3: 5}
+
+
+def due_time(entry) -> float:
+    """When the concept is next due; concepts without a schedule are due a day after their last study."""
+    record = as_record(entry)
+    if record.get("due") is not None:
+        return record["due"]
+    return (record["last"] or 0) + DAY
+
+
+def schedule_after_study(record: dict, now: float = None):
+    """Starts the schedule for a newly studied concept (already scheduled concepts are unchanged)."""
+    now = time.time() if now is None else now
+    if record.get("due") is None:
+        record.update(ease=DEFAULT_EASE, interval=1, reps=0, due=now + DAY)
+
+
+def review(record: dict, quality: int, now: float = None):
+    """Applies one SM-2 review with response quality 0-5 to a concept record, in place."""
+    now = time.time() if now is None else now
+    quality = max(0, min(5, quality))
+    ease = record.get("ease", DEFAULT_EASE)
+    reps = record.get("reps", 0)
+    interval = record.get("interval", 1)
+
+    if quality < 3:
+        # Failed recall: start the repetition sequence again
+        reps = 0
+        interval = 1
+    else:
+        reps += 1
+        if reps == 1:
+            interval = 1
+        elif reps == 2:
+            interval = 6
+        else:
+            interval = round(interval * ease)
+    ease = max(MIN_EASE, ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+
+    record.update(ease=ease, interval=interval, reps=reps, due=now + interval * DAY)
+
+
+class DueQueue:
+    """
+    Min-heap of (due time, concept) for one learner. Rescheduling pushes a new entry
+    and leaves the old one in place; stale entries are skipped when they reach the top,
+    so updates and "what's next" are both O(log n).
+    """
+
+    def __init__(self, revision_history: dict = None, version: int = 0):
+        self.version = version  # state version of the history the queue reflects
+        self._due = {}
+        self._heap = []
+        self._lock = threading.Lock()
+        for concept, entry in (revision_history or {}).items():
+            self._due[concept] = due_time(entry)
+        self._heap = [(due, concept) for concept, due in self._due.items()]
+        heapq.heapify(self._heap)
+
+    def __len__(self):
+        return len(self._due)
+
+    def reschedule(self, concept: str, due: float):
+        with self._lock:
+            self._due[concept] = due
+            heapq.heappush(self._heap, (due, concept))
+            # Compact when stale entries dominate, so the heap stays O(number of concepts)
+            if len(self._heap) > 4 * len(self._due) + 16:
+                self._heap = [(d, c) for c, d in self._due.items()]
+                heapq.heapify(self._heap)
+
+    def _drop_stale(self):
+        while self._heap and self._due.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+
+    def peek(self):
+        """Returns (due, concept) for the most overdue concept, or None."""
+        with self._lock:
+            self._drop_stale()
+            return self._heap[0] if self._heap else None
+
+    def top_k(self, k: int) -> list:
+        """Returns up to k (due, concept) pairs in due order, without removing them."""
+        with self._lock:
+            taken, popped = [], []
+            while len(taken) < k:
+                self._drop_stale()
+                if not self._heap:
+                    break
+                item = heapq.heappop(self._heap)
+                popped.append(item)
+                if item[1] not in {concept for _, concept in taken}:
+                    taken.append(item)
+            for item in popped:
+                heapq.heappush(self._heap, item)
+            return taken
+
+
+# Per-process index: state store -> {learner key: DueQueue}. Each queue records the state
+# version it was built from and is rebuilt when the learner's state has been saved since
+# by anything else (another process or store instance sharing the same SQLite file).
+_QUEUES = weakref.WeakKeyDictionary()
+_QUEUES_LOCK = threading.Lock()
+
+
+def get_due_queue(session) -> DueQueue:
+    """Returns the session learner's due queue, rebuilding it if their state changed elsewhere."""
+    store, learner_key = session.store, session.learner_key
+    version = store.version(learner_key)
+    with _QUEUES_LOCK:
+        queue = _QUEUES.get(store, {}).get(learner_key)
+    if queue is not None and queue.version == version:
+        return queue
+    # Build from a state and version read together, so the queue never claims a newer version
+    state, version = store.get_state_versioned(learner_key)
+    queue = DueQueue(state['revision_history'], version)
+    with _QUEUES_LOCK:
+        _QUEUES.setdefault(store, {})[learner_key] = queue
+    return queue
+
+
+def reschedule(store, learner_key: str, concept: str, due: float, previous: int, version: int):
+    """
+    Updates the learner's due queue after a study or review that moved their state from
+    version `previous` to `version`. A queue that missed other saves in between is dropped
+    and rebuilt on next use.
+    """
+    with _QUEUES_LOCK:
+        queues = _QUEUES.get(store, {})
+        queue = queues.get(learner_key)
+        if queue is None:
+            return
+        if queue.version != previous:
+            del queues[learner_key]
+            return
+        queue.version = version
+        queue.reschedule(concept, due)
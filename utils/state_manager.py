@@ -1,9 +1,17 @@
-import uuid
+import copy
+import json
 import os
+import sqlite3
+import threading
 import time
+from collections import defaultdict, deque
+from utils.revision_history import record_review, as_record, append_event
+from utils.learner_profiles import LearnerProfile, ProfileDirectory
+from utils import spaced_repetition
 
-# --- Global State Variables ---
-# Use a global dictionary to hold all user profiles and their dynamic state.
+# --- Seed Learner Profiles ---
+# Every store starts with these profiles; each learner's dynamic state is kept by the store.
+# More learners are added in bulk with utils/learner_profiles.py (python -m utils.learner_profiles learners.csv).
 ALL_USER_STATES = {
     "Urban Service Worker (Bengaluru)": {
         "name": "Urban Service Worker",
@@ -13,7 +21,8 @@ ALL_USER_STATES = {
         "mastery_score": 1,
         "mastery_increment": 0,
         "revision_history": {},
-        "pending_answer": None # Will store {'concept': str, 'expected_answer': str}
+        "pending_answer": None, # Will store {'concept': str, 'expected_answer': str}
+        "pending_quiz": None # Will store {'questions': [...], 'answers': [...]}
     },
     "Rural Farmer (Maharashtra)": {
         "name": "Rural Farmer",
@@ -23,58 +32,474 @@ ALL_USER_STATES = {
         "mastery_score": 3,
         "mastery_increment": 0,
         "revision_history": {},
-        "pending_answer": None
+        "pending_answer": None,
+        "pending_quiz": None
     }
 }
 
-# --- CRITICAL FIX: Global variable to hold the currently selected state key ---
-# This ensures all modules know which profile is active.
-ACTIVE_USER_KEY = list(ALL_USER_STATES.keys())[0] # Default to the first profile
-
-def get_active_state() -> dict:
-    """Retrieves the current user's profile and dynamic state."""
-    # Returns the state for the key, or the default state if the key is missing
-    return ALL_USER_STATES.get(ACTIVE_USER_KEY, ALL_USER_STATES[list(ALL_USER_STATES.keys())[0]])
-
-def set_active_state(user_key: str):
-    """Sets the globally active user profile by its key."""
-    global ACTIVE_USER_KEY
-    if user_key in ALL_USER_STATES:
-        ACTIVE_USER_KEY = user_key
-
-def set_pending_answer(concept: str, expected_answer: str):
-    """Sets the state to wait for a user response to a test question."""
-    active_state = get_active_state()
-    # Store the expected data structure
-    active_state['pending_answer'] = {
-        'concept': concept,
-        'expected_answer': expected_answer
-    }
+STATE_BACKEND = os.getenv("EDUINDIA_STATE_BACKEND", "sqlite")  # "sqlite" or "memory"
+CHAT_HISTORY_MAX = int(os.getenv("EDUINDIA_CHAT_HISTORY_MAX", "2000"))  # spilled chat messages kept per learner
+STATE_PATH = os.getenv(
+    "EDUINDIA_STATE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "learner_state.sqlite3")
+)
+
+
+class StateStore:
+    """
+    Holds every learner's profile and dynamic state. All writes go through `update`,
+    which runs a read-modify-write atomically under a per-learner lock, so concurrent
+    sessions for different learners never block each other and sessions for the same
+    learner never lose updates. Backends implement `_load_versioned`, `_save`, `version`,
+    `add_learners` and `load_changed`, and keep every learner's profile in `directory`
+    (a ProfileDirectory). Every save gives the learner a new, higher version number.
+    """
+
+    def __init__(self):
+        self._locks = defaultdict(threading.Lock)
+        self._locks_guard = threading.Lock()
+        self._directory = ProfileDirectory()
+
+    def _lock_for(self, learner_key: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks[learner_key]
+
+    @property
+    def directory(self) -> ProfileDirectory:
+        """Every learner's profile, indexed by location, language and background."""
+        return self._directory
+
+    def learner_keys(self) -> list:
+        return self.directory.keys()
+
+    def add_learners(self, profiles: list) -> int:
+        """Adds new learners (LearnerProfile records); existing ones are kept. Returns how many were added."""
+        raise NotImplementedError
+
+    def _load_versioned(self, learner_key: str) -> tuple:
+        """Returns (state or None, version of its last save), read together."""
+        raise NotImplementedError
+
+    def _save(self, learner_key: str, state: dict) -> int:
+        """Saves the state and returns its new version."""
+        raise NotImplementedError
+
+    def version(self, learner_key: str) -> int:
+        """The version of the learner's last save (0 if never saved), without loading their state."""
+        raise NotImplementedError
+
+    def _transaction(self):
+        """Backend hook wrapping a read-modify-write (e.g. a database transaction)."""
+        return _NO_TRANSACTION
+
+    def load_changed(self, since: int = None):
+        """
+        Returns (version, {learner key: state}) for every learner saved after version `since`
+        (all learners if None); pass the returned version next time to get only newer changes.
+        The states are read-only snapshots.
+        """
+        raise NotImplementedError
+
+    # --- Spilled chat history (older messages the UI no longer keeps in session memory) ---
+    def append_messages(self, learner_key: str, messages: list):
+        """Appends chat messages ({'role', 'content'}) to the learner's spilled history."""
+        raise NotImplementedError
+
+    def count_messages(self, learner_key: str) -> int:
+        raise NotImplementedError
+
+    def load_messages(self, learner_key: str, offset: int, limit: int) -> list:
+        """Returns up to `limit` spilled messages, oldest first, ending `offset` messages before the newest."""
+        raise NotImplementedError
+
+    def get_state(self, learner_key: str) -> dict:
+        """Returns a snapshot of the learner's state (changes must go through update)."""
+        return self.get_state_versioned(learner_key)[0]
+
+    def get_state_versioned(self, learner_key: str) -> tuple:
+        """Returns (snapshot of the learner's state, its version)."""
+        state, version = self._load_versioned(learner_key)
+        if state is None:
+            raise KeyError(f"Unknown learner: {learner_key}")
+        return state, version
+
+    def update(self, learner_key: str, mutate):
+        """Atomically applies mutate(state) to the learner's state and returns its result."""
+        return self._update(learner_key, mutate)[0]
+
+    def _update(self, learner_key: str, mutate) -> tuple:
+        """Like update, but returns (result, version before, version after)."""
+        with self._lock_for(learner_key), self._transaction():
+            state, previous = self.get_state_versioned(learner_key)
+            result = mutate(state)
+            return result, previous, self._save(learner_key, state)
+
+    # --- Atomic learner operations ---
+    def set_pending_answer(self, learner_key: str, concept: str, expected_answer: str):
+        """Sets the state to wait for a user response to a test question."""
+        def mutate(state):
+            # Store the expected data structure
+            state['pending_answer'] = {
+                'concept': concept,
+                'expected_answer': expected_answer
+            }
+        self.update(learner_key, mutate)
+
+    def clear_pending_answer(self, learner_key: str):
+        """Clears the pending answer state after grading is complete."""
+        def mutate(state):
+            state['pending_answer'] = None
+        self.update(learner_key, mutate)
+
+    def take_pending_answer(self, learner_key: str):
+        """Atomically returns and clears the pending answer, so an answer is graded only once."""
+        def mutate(state):
+            pending_data = state.get('pending_answer')
+            state['pending_answer'] = None
+            return pending_data
+        return self.update(learner_key, mutate)
+
+    def set_pending_quiz(self, learner_key: str, questions: list):
+        """Starts a quiz: a list of {'concept', 'question', 'expected_answer'} answered one by one."""
+        def mutate(state):
+            state['pending_quiz'] = {'questions': questions, 'answers': []}
+        self.update(learner_key, mutate)
+
+    def record_quiz_answer(self, learner_key: str, answer: str):
+        """Adds the learner's answer to the next open quiz question and returns the updated quiz."""
+        def mutate(state):
+            quiz = state.get('pending_quiz')
+            if quiz is None or len(quiz['answers']) >= len(quiz['questions']):
+                return quiz
+            quiz['answers'].append(answer)
+            return quiz
+        return self.update(learner_key, mutate)
+
+    def take_pending_quiz(self, learner_key: str):
+        """Atomically returns and clears a fully answered quiz, so it is graded only once."""
+        def mutate(state):
+            quiz = state.get('pending_quiz')
+            if quiz is None or len(quiz['answers']) < len(quiz['questions']):
+                return None
+            state['pending_quiz'] = None
+            return quiz
+        return self.update(learner_key, mutate)
+
+    def update_state(self, learner_key: str, concept: str):
+        """Updates the user's revision history after a lesson."""
+        timestamp = time.time()
+        def mutate(state):
+            # Bounded per-concept record (count, first/last, recent ring buffer)
+            record = record_review(state['revision_history'], concept, timestamp)
+            spaced_repetition.schedule_after_study(record, timestamp)
+            return record['due']
+        due, previous, version = self._update(learner_key, mutate)
+        spaced_repetition.reschedule(self, learner_key, concept, due, previous, version)
+        append_event(learner_key, concept, timestamp)
+
+    def record_grade(self, learner_key: str, concept: str, score: int):
+        """Applies a graded answer (score 0-3) to the concept's spaced-repetition schedule."""
+        timestamp = time.time()
+        quality = spaced_repetition.SCORE_TO_QUALITY.get(score, 0)
+        def mutate(state):
+            record = as_record(state['revision_history'].get(concept, []))
+            if record['last'] is None:
+                # Tested without a lesson first: the test counts as the first study
+                record = record_review(state['revision_history'], concept, timestamp)
+            spaced_repetition.review(record, quality, timestamp)
+            record['last_score'] = score
+            state['revision_history'][concept] = record
+            return record['due']
+        due, previous, version = self._update(learner_key, mutate)
+        spaced_repetition.reschedule(self, learner_key, concept, due, previous, version)
+        append_event(learner_key, concept, timestamp, event=f"grade:{score}")
+
+    def increase_mastery(self, learner_key: str, increment: int) -> bool:
+        """Increments the mastery score and potentially levels up the user."""
+        def mutate(state):
+            state['mastery_increment'] += increment
+
+            if state['mastery_increment'] >= 3:
+                # Increase score, but cap it at 5
+                state['mastery_score'] = min(5, state['mastery_score'] + 1)
+                state['mastery_increment'] = 0 # Reset increment
+                return True # Indicate level up happened
+
+            return False # No level up
+        return self.update(learner_key, mutate)
+
+
+class _NoTransaction:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_TRANSACTION = _NoTransaction()
+
+
+class InMemoryStateStore(StateStore):
+    """Keeps all learner state in this process (lost on restart)."""
+
+    def __init__(self, profiles: dict = None):
+        super().__init__()
+        # Full state dicts only for learners that have one; provisioned learners start from their profile
+        self._states = copy.deepcopy(ALL_USER_STATES if profiles is None else profiles)
+        self._messages = defaultdict(lambda: deque(maxlen=CHAT_HISTORY_MAX))
+        self._version = 0
+        self._versions = {}  # learner key -> version of their last save
+        self._version_lock = threading.Lock()
+        for learner_key, state in self._states.items():
+            self._directory.add(LearnerProfile.from_state(learner_key, state))
+
+    def _load_versioned(self, learner_key: str) -> tuple:
+        with self._version_lock:
+            state = self._states.get(learner_key)
+            version = self._versions.get(learner_key, 0)
+        if state is not None:
+            # Saved states are replaced, never mutated, so copying outside the lock is safe
+            return copy.deepcopy(state), version
+        profile = self._directory.get(learner_key)
+        return (profile.initial_state() if profile is not None else None), version
+
+    def version(self, learner_key: str) -> int:
+        with self._version_lock:
+            return self._versions.get(learner_key, 0)
+
+    def add_learners(self, profiles: list) -> int:
+        with self._version_lock:
+            added = [profile.key for profile in profiles if self._directory.add(profile)]
+            if added:
+                self._version += 1
+                self._versions.update(dict.fromkeys(added, self._version))
+            return len(added)
+
+    def _save(self, learner_key: str, state: dict) -> int:
+        with self._version_lock:
+            self._states[learner_key] = state
+            self._version += 1
+            self._versions[learner_key] = self._version
+            return self._version
+
+    def load_changed(self, since: int = None):
+        with self._version_lock:
+            keys = self._directory.keys() if since is None else [
+                key for key, version in self._versions.items() if version > since
+            ]
+            # Saved states are replaced, never mutated, so they can be shared without copying
+            return self._version, {
+                key: self._states[key] if key in self._states else self._directory.get(key).initial_state()
+                for key in keys
+            }
+
+    def append_messages(self, learner_key: str, messages: list):
+        with self._lock_for(learner_key):
+            self._messages[learner_key].extend(dict(message) for message in messages)
+
+    def count_messages(self, learner_key: str) -> int:
+        return len(self._messages.get(learner_key, ()))
+
+    def load_messages(self, learner_key: str, offset: int, limit: int) -> list:
+        with self._lock_for(learner_key):
+            history = list(self._messages.get(learner_key, ()))
+        end = max(0, len(history) - offset)
+        return history[max(0, end - limit):end]
+
+
+class SQLiteStateStore(StateStore):
+    """
+    Keeps learner state in a SQLite file in WAL mode, so progress survives restarts and
+    readers never block the writer. Each thread gets its own connection; updates run in
+    BEGIN IMMEDIATE transactions so they are also atomic across processes.
+    """
+
+    def __init__(self, path: str = STATE_PATH, profiles: dict = None):
+        super().__init__()
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        db = self._db()
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("CREATE TABLE IF NOT EXISTS learners (key TEXT PRIMARY KEY, state TEXT NOT NULL)")
+        # Every save stamps the learner with the next version, so readers can load only what changed
+        if "version" not in [row[1] for row in db.execute("PRAGMA table_info(learners)")]:
+            db.execute("ALTER TABLE learners ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+        db.execute("CREATE INDEX IF NOT EXISTS learners_version ON learners (version)")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS chat_messages (id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " learner TEXT NOT NULL, role TEXT NOT NULL, content TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        db.execute("CREATE INDEX IF NOT EXISTS chat_messages_learner ON chat_messages (learner, id)")
+        # Seed profiles that are not in the database yet (existing progress is kept)
+        for learner_key, state in (ALL_USER_STATES if profiles is None else profiles).items():
+            db.execute("INSERT OR IGNORE INTO learners (key, state) VALUES (?, ?)",
+                       (learner_key, json.dumps(state)))
+        self._directory_rowid = 0  # last learners rowid loaded into the directory
+        self._directory_lock = threading.Lock()
+
+    def _db(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, isolation_level=None, timeout=30)
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def _transaction(self):
+        return _SQLiteTransaction(self._db())
+
+    @property
+    def directory(self) -> ProfileDirectory:
+        # Picks up learners added since the last look (also by other processes); only profile fields are read
+        with self._directory_lock:
+            rows = self._db().execute(
+                "SELECT rowid, key, json_extract(state, '$.name'), json_extract(state, '$.location'),"
+                " json_extract(state, '$.background'), json_extract(state, '$.language'),"
+                " json_extract(state, '$.mastery_score') FROM learners WHERE rowid > ? ORDER BY rowid",
+                (self._directory_rowid,)
+            ).fetchall()
+            for rowid, learner_key, *fields in rows:
+                self._directory.add(LearnerProfile(learner_key, *fields))
+                self._directory_rowid = rowid
+        return self._directory
+
+    def add_learners(self, profiles: list) -> int:
+        with self._transaction():
+            db = self._db()
+            before = db.total_changes
+            db.executemany(
+                "INSERT OR IGNORE INTO learners (key, state, version)"
+                " VALUES (?, ?, (SELECT COALESCE(MAX(version), 0) + 1 FROM learners))",
+                [(profile.key, json.dumps(profile.initial_state())) for profile in profiles]
+            )
+            return db.total_changes - before
+
+    def _load_versioned(self, learner_key: str) -> tuple:
+        row = self._db().execute("SELECT state, version FROM learners WHERE key = ?", (learner_key,)).fetchone()
+        return (json.loads(row[0]), row[1]) if row is not None else (None, 0)
+
+    def version(self, learner_key: str) -> int:
+        row = self._db().execute("SELECT version FROM learners WHERE key = ?", (learner_key,)).fetchone()
+        return row[0] if row is not None else 0
+
+    def _save(self, learner_key: str, state: dict) -> int:
+        db = self._db()
+        db.execute(
+            "UPDATE learners SET state = ?, version = (SELECT COALESCE(MAX(version), 0) + 1 FROM learners)"
+            " WHERE key = ?",
+            (json.dumps(state), learner_key)
+        )
+        return db.execute("SELECT version FROM learners WHERE key = ?", (learner_key,)).fetchone()[0]
+
+    def load_changed(self, since: int = None):
+        db = self._db()
+        version = db.execute("SELECT COALESCE(MAX(version), 0) FROM learners").fetchone()[0]
+        rows = db.execute(
+            "SELECT key, state FROM learners WHERE version > ? AND version <= ?",
+            (-1 if since is None else since, version)
+        ).fetchall()
+        return version, {key: json.loads(state) for key, state in rows}
+
+    def append_messages(self, learner_key: str, messages: list):
+        now = time.time()
+        with self._transaction():
+            db = self._db()
+            db.executemany(
+                "INSERT INTO chat_messages (learner, role, content, created_at) VALUES (?, ?, ?, ?)",
+                [(learner_key, m["role"], m["content"], now) for m in messages]
+            )
+            # Keep each learner's spilled history bounded
+            db.execute(
+                "DELETE FROM chat_messages WHERE learner = ? AND id <= ("
+                " SELECT id FROM chat_messages WHERE learner = ? ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                (learner_key, learner_key, CHAT_HISTORY_MAX)
+            )
+
+    def count_messages(self, learner_key: str) -> int:
+        return self._db().execute(
+            "SELECT COUNT(*) FROM chat_messages WHERE learner = ?", (learner_key,)
+        ).fetchone()[0]
+
+    def load_messages(self, learner_key: str, offset: int, limit: int) -> list:
+        rows = self._db().execute(
+            "SELECT role, content FROM chat_messages WHERE learner = ? ORDER BY id DESC LIMIT ? OFFSET ?",
+            (learner_key, limit, offset)
+        ).fetchall()
+        return [{"role": role, "content": content} for role, content in reversed(rows)]
+
+
+class _SQLiteTransaction:
+    def __init__(self, db: sqlite3.Connection):
+        self.db = db
+
+    def __enter__(self):
+        self.db.execute("BEGIN IMMEDIATE")
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.db.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+
+class LearnerSession:
+    """
+    One learner's view of a state store. A session is created per request (or per
+    browser session) and passed explicitly to the agents that read or change state.
+    """
+
+    def __init__(self, store: StateStore, learner_key: str):
+        self.store = store
+        self.learner_key = learner_key
+
+    def get_state(self) -> dict:
+        """Retrieves the learner's profile and dynamic state (a snapshot)."""
+        return self.store.get_state(self.learner_key)
+
+    def set_pending_answer(self, concept: str, expected_answer: str):
+        self.store.set_pending_answer(self.learner_key, concept, expected_answer)
+
+    def clear_pending_answer(self):
+        self.store.clear_pending_answer(self.learner_key)
+
+    def take_pending_answer(self):
+        return self.store.take_pending_answer(self.learner_key)
+
+    def set_pending_quiz(self, questions: list):
+        self.store.set_pending_quiz(self.learner_key, questions)
+
+    def record_quiz_answer(self, answer: str):
+        return self.store.record_quiz_answer(self.learner_key, answer)
+
+    def take_pending_quiz(self):
+        return self.store.take_pending_quiz(self.learner_key)
+
+    def update_state(self, concept: str):
+        self.store.update_state(self.learner_key, concept)
+
+    def record_grade(self, concept: str, score: int):
+        self.store.record_grade(self.learner_key, concept, score)
+
+    def increase_mastery(self, increment: int) -> bool:
+        return self.store.increase_mastery(self.learner_key, increment)
+
+
+_STORE = None
+_STORE_LOCK = threading.Lock()
+
 
-def clear_pending_answer():
-    """Clears the pending answer state after grading is complete."""
-    active_state = get_active_state()
-    active_state['pending_answer'] = None
-
-def update_state(concept: str):
-    """Updates the user's revision history after a lesson."""
-    active_state = get_active_state()
-    if concept not in active_state['revision_history']:
-        active_state['revision_history'][concept] = []
-        
-    # Log current time as a simple timestamp
-    active_state['revision_history'][concept].append(time.time())
-
-def increase_mastery(increment: int):
-    """Increments the mastery score and potentially levels up the user."""
-    active_state = get_active_state()
-    
-    active_state['mastery_increment'] += increment
-    
-    if active_state['mastery_increment'] >= 3:
-        # Increase score, but cap it at 5
-        active_state['mastery_score'] = min(5, active_state['mastery_score'] + 1)
-        active_state['mastery_increment'] = 0 # Reset increment
-        return True # Indicate level up happened
-    
-    return False # No level up
\ No newline at end of file
+def get_state_store() -> StateStore:
+    """Returns the process-wide state store for the configured backend."""
+    global _STORE
+    with _STORE_LOCK:
+        if _STORE is None:
+            if STATE_BACKEND == "memory":
+                _STORE = InMemoryStateStore()
+            elif STATE_BACKEND == "sqlite":
+                _STORE = SQLiteStateStore()
+            else:
+                raise ValueError(f"Unknown EDUINDIA_STATE_BACKEND: {STATE_BACKEND}")
+        return _STORE
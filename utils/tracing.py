@@ -0,0 +1,268 @@
+import contextvars
+import functools
+import inspect
+import json
+import math
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+# --- Request-scoped tracing for RootAgent, the specialized agents and LLM calls ---
+# The active trace and span live in context variables, so concurrent Streamlit sessions
+# (and the worker threads they fan out to) each record into their own trace.
+TRACE_EXPORT_PATH = os.getenv("EDUINDIA_TRACE_PATH")  # append finished traces here as JSON lines
+RECENT_SPAN_LIMIT = int(os.getenv("EDUINDIA_TRACE_HISTORY", "5000"))
+
+_CURRENT_TRACE = contextvars.ContextVar("eduindia_trace", default=None)
+_CURRENT_SPAN = contextvars.ContextVar("eduindia_span", default=None)
+
+_RECENT_LOCK = threading.Lock()
+_RECENT_DURATIONS = defaultdict(lambda: deque(maxlen=RECENT_SPAN_LIMIT))  # span name -> durations (ms)
+_TOKEN_TOTALS = defaultdict(lambda: {"calls": 0, "prompt_tokens": 0, "response_tokens": 0, "total_tokens": 0})
+_EXPORT_LOCK = threading.Lock()
+
+
+class Span:
+    """One timed unit of work (RootAgent, an agent, or an LLM call) inside a trace."""
+
+    def __init__(self, name: str, kind: str, parent=None, attributes=None):
+        self.span_id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.kind = kind
+        self.parent_id = parent.span_id if parent else None
+        self.depth = parent.depth + 1 if parent else 0
+        self.attributes = dict(attributes or {})
+        self.messages = []
+        self.start_time = time.time()
+        self._start = time.perf_counter()
+        self.duration_ms = None
+        self.error = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def finish(self):
+        self.duration_ms = (time.perf_counter() - self._start) * 1000
+
+    def to_dict(self, trace_id: str = None) -> dict:
+        return {
+            "trace_id": trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start_time": self.start_time,
+            "duration_ms": self.duration_ms,
+            "attributes": self.attributes,
+            "messages": self.messages,
+            "error": self.error,
+        }
+
+
+class Trace:
+    """All spans recorded while handling one user request."""
+
+    def __init__(self, request: str = ""):
+        self.trace_id = uuid.uuid4().hex
+        self.request = request
+        self.spans = []
+        self.messages = []  # log lines recorded outside any span
+        self.failures = []  # (step or LLM call name, error) for work that failed or fell back
+        self._lock = threading.Lock()
+
+    def add_span(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+
+    def add_message(self, message: str):
+        with self._lock:
+            self.messages.append(message)
+
+    def add_failure(self, name: str, error):
+        with self._lock:
+            self.failures.append((name, str(error)))
+
+    def iterate(self, generator):
+        """Drives a generator inside this trace's context, so streamed work is traced too."""
+        ctx = contextvars.copy_context()
+        ctx.run(_CURRENT_TRACE.set, self)
+        while True:
+            try:
+                chunk = ctx.run(next, generator)
+            except StopIteration:
+                return
+            yield chunk
+
+    def finish(self):
+        """Exports the trace as JSON lines if EDUINDIA_TRACE_PATH is set."""
+        if TRACE_EXPORT_PATH:
+            export_jsonl(self.to_records(), TRACE_EXPORT_PATH)
+
+    def to_records(self) -> list:
+        with self._lock:
+            return [span.to_dict(self.trace_id) for span in self.spans]
+
+    def format_log(self) -> str:
+        """Renders the delegation log shown in the sidebar: one line per span plus its messages."""
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s.start_time)
+            lines = list(self.messages)
+        # Depth-first, so each span's children are listed under it even when they ran concurrently
+        children = defaultdict(list)
+        for span in spans:
+            children[span.parent_id].append(span)
+        known_ids = {span.span_id for span in spans}
+        stack = [s for s in reversed(spans) if s.parent_id is None or s.parent_id not in known_ids]
+        while stack:
+            span = stack.pop()
+            stack.extend(reversed(children[span.span_id]))
+            indent = "  " * span.depth
+            duration = f"{span.duration_ms:.0f} ms" if span.duration_ms is not None else "running"
+            details = ""
+            if span.kind == "llm":
+                details = (
+                    f" | prompt {span.attributes.get('prompt_chars', 0)} chars,"
+                    f" response {span.attributes.get('response_chars', 0)} chars,"
+                    f" tokens {span.attributes.get('total_tokens', '?')}"
+                )
+            lines.append(f"{indent}▶ {span.name} ({duration}){details}")
+            for message in span.messages:
+                lines.append(f"{indent}  {message}")
+            if span.error:
+                lines.append(f"{indent}  ⚠️ {span.error}")
+        return "\n".join(lines) if lines else "No agent activity recorded."
+
+
+@contextmanager
+def trace_request(request: str):
+    """Starts a new trace for one user request in the current context."""
+    trace = Trace(request)
+    token = _CURRENT_TRACE.set(trace)
+    try:
+        yield trace
+    finally:
+        _CURRENT_TRACE.reset(token)
+        trace.finish()
+
+
+@contextmanager
+def span(name: str, kind: str = "agent", **attributes):
+    """Records a timed span under the current span (if any) of the current trace (if any)."""
+    parent = _CURRENT_SPAN.get()
+    current = Span(name, kind, parent, attributes)
+    trace = _CURRENT_TRACE.get()
+    if trace is not None:
+        trace.add_span(current)
+    token = _CURRENT_SPAN.set(current)
+    try:
+        yield current
+    except Exception as e:
+        current.error = str(e)
+        if kind == "llm":
+            # Agents catch failed LLM calls and answer with a fallback, so note the failure here
+            record_failure(name, e)
+        raise
+    finally:
+        current.finish()
+        try:
+            _CURRENT_SPAN.reset(token)
+        except ValueError:
+            # A generator span closed from a different context; just restore the parent
+            _CURRENT_SPAN.set(parent)
+        with _RECENT_LOCK:
+            _RECENT_DURATIONS[name].append(current.duration_ms)
+
+
+def traced(name: str, kind: str = "agent"):
+    """Decorator that wraps an agent function (or streaming generator) in a span."""
+    def decorator(func):
+        if inspect.isgeneratorfunction(func):
+            @functools.wraps(func)
+            def generator_wrapper(*args, **kwargs):
+                with span(name, kind):
+                    yield from func(*args, **kwargs)
+            return generator_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name, kind):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def current_span():
+    return _CURRENT_SPAN.get()
+
+
+def log(message: str):
+    """Adds a line to the delegation log of the current span (printed if no trace is active)."""
+    current = _CURRENT_SPAN.get()
+    trace = _CURRENT_TRACE.get()
+    if trace is None:
+        print(message)
+    elif current is not None:
+        current.messages.append(message)
+    else:
+        trace.add_message(message)
+
+
+def record_failure(name: str, error):
+    """Notes on the current trace (if any) that a step or LLM call failed and a fallback was used."""
+    trace = _CURRENT_TRACE.get()
+    if trace is not None:
+        trace.add_failure(name, error)
+
+
+def record_usage(llm_span: Span, response):
+    """Copies token usage from a Gemini response (or final stream chunk) onto an LLM span."""
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return
+    tokens = {
+        "prompt_tokens": getattr(usage, "prompt_token_count", None),
+        "response_tokens": getattr(usage, "candidates_token_count", None),
+        "total_tokens": getattr(usage, "total_token_count", None),
+    }
+    llm_span.set(**tokens)
+    with _RECENT_LOCK:
+        totals = _TOKEN_TOTALS[llm_span.name]
+        totals["calls"] += 1
+        for key, value in tokens.items():
+            totals[key] += value or 0
+
+
+def export_jsonl(records: list, path: str):
+    """Appends span records to a JSON lines file."""
+    if not records:
+        return
+    with _EXPORT_LOCK:
+        with open(path, "a", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def _percentile(sorted_values: list, pct: float) -> float:
+    # Nearest-rank percentile
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def latency_summary() -> dict:
+    """Returns count, p50 and p95 wall time (ms) per span name over recent requests."""
+    with _RECENT_LOCK:
+        snapshot = {name: sorted(d for d in durations if d is not None)
+                    for name, durations in _RECENT_DURATIONS.items()}
+    return {
+        name: {"count": len(values), "p50_ms": _percentile(values, 50), "p95_ms": _percentile(values, 95)}
+        for name, values in snapshot.items() if values
+    }
+
+
+def token_summary() -> dict:
+    """Returns LLM calls and summed token usage per LLM span name since the process started."""
+    with _RECENT_LOCK:
+        return {name: dict(totals) for name, totals in _TOKEN_TOTALS.items()}